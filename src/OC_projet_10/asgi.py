@@ -16,5 +16,9 @@ os.environ.setdefault(
     key='DJANGO_SETTINGS_MODULE',
     value='OC_projet_10.settings'
 )
+os.environ.setdefault(
+    key='ASYNC_READ_VIEWS',
+    value='1'
+)
 
 application = get_asgi_application()
@@ -0,0 +1,180 @@
+"""
+Batch endpoint of the SoftDesk API: a list of sub-requests is sent in
+one HTTP request, authenticated once, and dispatched in-process to the
+views of the API.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+logger = logging.getLogger('django.request')
+
+SAFE_SUB_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS']
+    )
+    path = serializers.RegexField(r'^/api/v1/')
+    body = serializers.JSONField(required=False, allow_null=True)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=SubRequestSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS
+    )
+    parallel = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs['parallel'] and any(
+                sub['method'] not in SAFE_SUB_METHODS
+                for sub in attrs['requests']):
+            raise serializers.ValidationError(
+                {'parallel': f"Seules les requêtes "
+                             f"{', '.join(SAFE_SUB_METHODS)} peuvent être "
+                             f"exécutées en parallèle."}
+            )
+        return attrs
+
+
+class BatchView(APIView):
+    """
+    Dispatch a list of sub-requests to the API endpoints and return
+    their responses, in the same order:
+
+        POST /api/v1/batch/
+        {"requests": [{"method": "GET", "path": "/api/v1/projects/1/"},
+                      {"method": "POST",
+                       "path": "/api/v1/projects/1/issues/",
+                       "body": {"title": "..."}}],
+         "parallel": false}
+
+    The user is authenticated once, for every sub-request. The
+    sub-requests are run one after the other, a write seeing the
+    effects of the previous ones; with "parallel", a list of reads is
+    run by a pool of threads.
+    """
+    permission_classes = [IsAuthenticated]
+    # The sub-requests run the same queries with different parameters.
+    detect_n_plus_one = False
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+
+        if serializer.validated_data['parallel'] and len(sub_requests) > 1:
+            with ThreadPoolExecutor(
+                    max_workers=settings.BATCH_MAX_WORKERS) as executor:
+                responses = list(executor.map(
+                    lambda sub: self.dispatch_in_thread(request, sub),
+                    sub_requests
+                ))
+        else:
+            responses = [
+                self.dispatch_sub_request(request, sub)
+                for sub in sub_requests
+            ]
+        return Response({'responses': responses})
+
+    def dispatch_in_thread(self, request, sub):
+        try:
+            return self.dispatch_sub_request(request, sub)
+        finally:
+            # The connections opened by the thread would stay open.
+            connections.close_all()
+
+    def dispatch_sub_request(self, request, sub):
+        """
+        Resolve and run a sub-request, return its status and body.
+        """
+        path, _, query_string = sub['path'].partition('?')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return {'status': 404, 'body': {'detail': "Page non trouvée."}}
+        if getattr(match.func, 'cls', None) is type(self):
+            return {'status': 400,
+                    'body': {'detail': "Un batch ne peut pas en contenir "
+                                       "un autre."}}
+
+        sub_request = self.build_sub_request(
+            request, sub['method'], path, query_string, sub.get('body')
+        )
+        sub_request.resolver_match = match
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        try:
+            response = view(sub_request, *match.args, **match.kwargs)
+            body = self.get_body(response)
+        except Exception:
+            logger.exception("Error in the batch sub-request %s %s",
+                             sub['method'], sub['path'])
+            return {'status': 500, 'body': {'detail': "Erreur du serveur."}}
+        return {'status': response.status_code, 'body': body}
+
+    @staticmethod
+    def build_sub_request(request, method, path, query_string, body):
+        """
+        Build the request of a sub-request from the headers of the batch
+        request. The user of the batch request is given to the view,
+        which does not authenticate it again.
+        """
+        content = b'' if body is None else orjson.dumps(body)
+        environ = {
+            key: value for key, value in request.META.items()
+            if key.startswith(('HTTP_', 'SERVER_', 'REMOTE_'))
+            and key != 'HTTP_ACCEPT_ENCODING'
+        }
+        environ.update({
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query_string,
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+            'wsgi.input': io.BytesIO(content),
+            'wsgi.url_scheme': request.scheme,
+        })
+        sub_request = WSGIRequest(environ)
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    @staticmethod
+    def get_body(response):
+        """
+        Give the data of a DRF response, or the decoded content of the
+        other responses.
+        """
+        if hasattr(response, 'data'):
+            return response.data
+        if hasattr(response, 'render'):
+            response.render()
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        if not content:
+            return None
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return content.decode(response.charset, errors='replace')
@@ -0,0 +1,133 @@
+"""
+Database routers of the SoftDesk API.
+
+The routers are declared in settings.DATABASE_ROUTERS and consulted by
+the ORM for every query. The views decide, per request, whether the
+reads may be served by a read replica (see
+softdesk.utils.mixins.ReplicaRoutingMixin) and which shard holds the
+data of the project they target (see
+softdesk.utils.mixins.ShardRoutingMixin).
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from softdesk import sharding
+
+
+# Set by the views for the duration of a request whose reads can be
+# served by a replica. Default to False so that management commands,
+# signals and the admin always read from the primary.
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def set_replica_reads(enabled):
+    """
+    Allow (or not) the reads of the current context to be sent to a
+    replica. Return a token to give back to reset_replica_reads().
+    """
+    return _replica_reads.set(enabled)
+
+
+def reset_replica_reads(token):
+    """
+    Restore the routing of the reads as it was before
+    set_replica_reads() was called.
+    """
+    _replica_reads.reset(token)
+
+
+def replica_reads_enabled():
+    """
+    Check if the reads of the current context may be sent to a replica.
+    """
+    return bool(settings.DATABASE_REPLICAS) and _replica_reads.get()
+
+
+def _pin_key(user_id):
+    return f'softdesk:pin-primary:{user_id}'
+
+
+def pin_to_primary(user):
+    """
+    Send the reads of a user to the primary for
+    settings.REPLICA_PIN_SECONDS, so that what they just wrote is
+    visible to them even if the replicas lag behind.
+    """
+    if user and user.is_authenticated and settings.DATABASE_REPLICAS:
+        cache.set(_pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    """
+    Check if a user wrote recently and must read from the primary.
+    """
+    if not (user and user.is_authenticated):
+        return False
+    return cache.get(_pin_key(user.pk), False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send the writes to the primary ('default') and, when the current
+    request allows it, the reads to a randomly chosen replica among
+    settings.DATABASE_REPLICAS.
+    """
+    def db_for_read(self, model, **hints):
+        if replica_reads_enabled():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        The replicas hold the same data as the primary, objects read
+        from any of them can be related.
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        The replicas are copies of the primary, never migrate them.
+        """
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ProjectShardRouter:
+    """
+    Send the contributors, issues and comments to the shard of their
+    project (see softdesk.sharding). The other models are left to the
+    next routers. Does nothing while settings.DATABASE_SHARDS is empty.
+    """
+    def _db_for_model(self, model, **hints):
+        if not settings.DATABASE_SHARDS:
+            return None
+        if model._meta.label == 'softdesk.ProjectShard':
+            return 'default'
+        if sharding.is_sharded(model):
+            return sharding.shard_for_hints(hints)
+        return None
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        The users and projects are mirrored in the shards, an object of
+        a shard can be related to one of the global database.
+        """
+        if settings.DATABASE_SHARDS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Every shard holds the full schema.
+        """
+        return None
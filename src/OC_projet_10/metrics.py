@@ -0,0 +1,65 @@
+"""
+Prometheus metrics of the SoftDesk API, served by /metrics.
+
+Under a server running several worker processes, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory (emptied at every start
+of the server): every process writes its metrics in its own
+memory-mapped files there, and /metrics adds them up.
+"""
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+
+
+REQUESTS = Counter(
+    'softdesk_requests',
+    "Requests served, by view, action, method and status code.",
+    ['view', 'action', 'method', 'status']
+)
+LATENCY = Histogram(
+    'softdesk_request_duration_seconds',
+    "Duration of the requests, by view, action, method and status code.",
+    ['view', 'action', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0,
+             2.5, 5.0, 10.0)
+)
+QUERIES = Histogram(
+    'softdesk_request_queries',
+    "Database queries per request, by view and action.",
+    ['view', 'action'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+CACHE = Counter(
+    'softdesk_cache_lookups',
+    "Lookups of the caching layers, by cache and result (hit, miss).",
+    ['cache', 'result']
+)
+PAGINATION_OFFSET = Histogram(
+    'softdesk_pagination_offset',
+    "Offset of the pages requested from the paginated lists, by view.",
+    ['view'],
+    buckets=(0, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def metrics_view(request):
+    """
+    Expose the metrics of the API, of every worker process when
+    PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,688 @@
+"""
+Middlewares of the SoftDesk API.
+"""
+import gzip
+import io
+import logging
+import os
+import secrets
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.cache import patch_vary_headers
+
+from OC_projet_10 import metrics, profiling
+
+logger = logging.getLogger('softdesk.queries')
+timing_logger = logging.getLogger('softdesk.timing')
+profiling_logger = logging.getLogger('softdesk.profiling')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCompressor:
+    """
+    Incremental gzip compressor. The name of the gzip file is made of a
+    random number of bytes, mitigating the BREACH attack as Django's
+    GZipMiddleware does.
+    """
+    encoding = 'gzip'
+    max_random_bytes = 100
+
+    def __init__(self, level):
+        self._buffer = io.BytesIO()
+        self._file = gzip.GzipFile(
+            filename=b'a' * secrets.randbelow(self.max_random_bytes),
+            mode='wb', compresslevel=level, fileobj=self._buffer, mtime=0
+        )
+
+    def _read(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data):
+        """
+        Compress a chunk and flush it, so that it can be sent.
+        """
+        self._file.write(data)
+        self._file.flush()
+        return self._read()
+
+    def finish(self):
+        self._file.close()
+        return self._read()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    encoding = 'zstd'
+
+    def __init__(self, level):
+        self._compressor = (zstandard.ZstdCompressor(level=level)
+                            .compressobj())
+
+    def compress(self, data):
+        return (self._compressor.compress(data)
+                + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# By order of preference, the encodings whose library is installed.
+COMPRESSORS = [
+    compressor for compressor, library in (
+        (ZstdCompressor, zstandard),
+        (BrotliCompressor, brotli),
+        (GzipCompressor, gzip),
+    ) if library is not None
+]
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header into {encoding: quality}.
+    """
+    encodings = {}
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[encoding] = quality
+    return encodings
+
+
+def choose_compressor(header):
+    """
+    Return the compressor of the encoding preferred by the client, or
+    None if it accepts none of them.
+    """
+    encodings = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for compressor in COMPRESSORS:
+        quality = encodings.get(compressor.encoding, encodings.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = compressor, quality
+    return best
+
+
+def get_compression_level(request):
+    """
+    Give the compression level of the view serving the request: the
+    compression_level attribute of the view function or of its class
+    (DRF views), else settings.COMPRESSION_LEVEL. 0 disables the
+    compression.
+    """
+    match = getattr(request, 'resolver_match', None)
+    view = match.func if match is not None else None
+    for target in (view, getattr(view, 'cls', None)):
+        level = getattr(target, 'compression_level', None)
+        if level is not None:
+            return level
+    return settings.COMPRESSION_LEVEL
+
+
+class HookMiddleware:
+    """
+    Base of the middlewares serving both the sync (WSGI) and the async
+    (ASGI) requests. A subclass implements its hooks once, for both:
+
+    - before(request), run before the view, returns a state, None by
+      default; abefore(request) is its async version, by default the
+      same,
+    - teardown(state), run as soon as the view returned, or raised,
+    - after(request, response, state), run after the view, returns the
+      response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.before(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.teardown(state)
+        return self.after(request, response, state)
+
+    async def __acall__(self, request):
+        state = await self.abefore(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.teardown(state)
+        return self.after(request, response, state)
+
+    def before(self, request):
+        return None
+
+    async def abefore(self, request):
+        return self.before(request)
+
+    def teardown(self, state):
+        pass
+
+    def after(self, request, response, state):
+        return response
+
+
+class CompressionMiddleware(HookMiddleware):
+    """
+    Compress the responses with zstd, brotli (when their library is
+    installed) or gzip, according to the Accept-Encoding header of the
+    request. The responses shorter than settings.COMPRESSION_MIN_SIZE
+    are left as they are, the streaming responses are compressed chunk
+    by chunk, without buffering the whole body.
+    """
+    def after(self, request, response, state):
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        level = get_compression_level(request)
+        if not level or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        compressor_class = choose_compressor(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if compressor_class is None:
+            return response
+        compressor = compressor_class(level)
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.acompress_stream(
+                    compressor, response.streaming_content
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    compressor, response.streaming_content
+                )
+            # The compressed size is only known once it is streamed.
+            del response.headers['Content-Length']
+        else:
+            content = compressor.compress(response.content)
+            content += compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # A strong ETag becomes weak, the representation changed.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = compressor.encoding
+        return response
+
+    @staticmethod
+    def compress_stream(compressor, chunks):
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    @staticmethod
+    async def acompress_stream(compressor, chunks):
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised, with settings.QUERY_BUDGET_STRICT, by a request running more
+    queries than its budget or an N+1 pattern.
+    """
+
+
+class QueryRecorder:
+    """
+    Queries run by a request: their database, SQL template and
+    parameters, and the time spent in the database.
+    """
+    def __init__(self):
+        self.queries = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries.append(
+                (context['connection'].alias, sql, repr(params))
+            )
+
+    def get_duplicates(self):
+        """
+        Give the number of runs of the queries run more than once with
+        the same parameters.
+        """
+        return {query: runs for query, runs in Counter(self.queries).items()
+                if runs > 1}
+
+    def get_n_plus_one(self, threshold):
+        """
+        Give the SQL templates run with at least `threshold` different
+        parameters, and their number of runs.
+        """
+        templates = Counter(
+            (alias, sql) for alias, sql, params in set(self.queries)
+        )
+        return {template: runs for template, runs in templates.items()
+                if runs >= threshold}
+
+
+# Recorder of the current request, set by QueryBudgetMiddleware. A
+# context variable follows the request in the threads of sync_to_async.
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(connection, **kwargs):
+    """
+    Signal to record the queries of every new connection, of every
+    database (shards and replicas included).
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def resolve_view(request):
+    """
+    Give the name, the class (DRF views) and the action (viewsets) of
+    the view serving the request. The name is '-' when no view was
+    found.
+    """
+    match = getattr(request, 'resolver_match', None)
+    view = match.func if match is not None else None
+    view_class = getattr(view, 'cls', None)
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    name = getattr(view_class or view, '__name__', '-')
+    return name, view_class, action
+
+
+def get_query_budget(request):
+    """
+    Give the query budget and the action of the view serving the
+    request: the query_budget_map of a viewset, {action: maximum number
+    of queries}, or the query_budget attribute of a view. None if the
+    view has no budget.
+    """
+    _, view_class, action = resolve_view(request)
+    budget_map = getattr(view_class, 'query_budget_map', {})
+    if action in budget_map:
+        return budget_map[action], action
+    return getattr(view_class, 'query_budget', None), action
+
+
+class QueryBudgetMiddleware(HookMiddleware):
+    """
+    Count the queries of every request, the time spent in the database,
+    the duplicated queries and the N+1 patterns: an SQL template run
+    with settings.QUERY_BUDGET_N_PLUS_ONE different parameters or more.
+    A request over the budget of its view (see get_query_budget()) or
+    running an N+1 pattern is logged, or fails with
+    settings.QUERY_BUDGET_STRICT (tests). The views sending in-process
+    requests (the batch) opt out of the N+1 detection with
+    detect_n_plus_one = False.
+    """
+    def before(self, request):
+        recorder = QueryRecorder()
+        return recorder, _recorder.set(recorder)
+
+    def teardown(self, state):
+        _recorder.reset(state[1])
+
+    def after(self, request, response, state):
+        self.check_budget(request, state[0])
+        return response
+
+    def check_budget(self, request, recorder):
+        budget, action = get_query_budget(request)
+        _, view_class, _ = resolve_view(request)
+        count = len(recorder.queries)
+        duplicates = recorder.get_duplicates()
+        n_plus_one = {}
+        if getattr(view_class, 'detect_n_plus_one', True):
+            n_plus_one = recorder.get_n_plus_one(
+                settings.QUERY_BUDGET_N_PLUS_ONE
+            )
+
+        problems = []
+        if budget is not None and count > budget:
+            problems.append(f"{count} requêtes pour un budget de {budget}")
+        problems += [
+            f"N+1 : {runs} exécutions de {sql} ({alias})"
+            for (alias, sql), runs in n_plus_one.items()
+        ]
+        summary = (
+            f"{request.method} {request.path} ({action or '-'}) : "
+            f"{count} requêtes, {recorder.duration * 1000:.1f} ms, "
+            f"{sum(duplicates.values())} doublons"
+        )
+        if not problems:
+            logger.debug(summary)
+            return
+        message = f"{summary} ; " + " ; ".join(problems)
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ServerTimings:
+    """
+    Durations, in seconds, of the phases of a request measured by
+    measure(). The time of a phase excludes the phases measured inside
+    it, and its database time is kept apart.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.db_durations = defaultdict(float)
+        self.view_end = None
+        self._stack = []
+
+    def begin(self, phase):
+        self._stack.append([phase, time.perf_counter(), get_db_time(), 0, 0])
+
+    def end(self):
+        phase, start, db_start, children, children_db = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        db = get_db_time() - db_start
+        self.durations[phase] += elapsed - children
+        self.db_durations[phase] += db - children_db
+        if self._stack:
+            self._stack[-1][3] += elapsed
+            self._stack[-1][4] += db
+
+    def end_view(self):
+        """
+        End the phases still open (the view) once the response is
+        built, it is then rendered.
+        """
+        while self._stack:
+            self.end()
+        self.view_end = time.perf_counter()
+
+
+_timings = ContextVar('server_timings', default=None)
+
+
+def get_db_time():
+    recorder = _recorder.get()
+    return recorder.duration if recorder is not None else 0.0
+
+
+def begin_phase(phase):
+    timings = _timings.get()
+    if timings is not None:
+        timings.begin(phase)
+
+
+def end_view():
+    timings = _timings.get()
+    if timings is not None:
+        timings.end_view()
+
+
+@contextmanager
+def measure(phase):
+    """
+    Measure a phase of the current request (see ServerTimingMiddleware).
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    timings.begin(phase)
+    try:
+        yield
+    finally:
+        timings.end()
+
+
+class ServerTimingMiddleware(HookMiddleware):
+    """
+    Break the time of every request down into its phases and send them
+    in a Server-Timing header, and as a structured line of the
+    'softdesk.timing' logger:
+
+    - auth, perm, queryset: the authentication, the permission checks
+      and the filtering, pagination or lookup of the objects (database
+      included), measured by the views (see
+      softdesk.utils.mixins.ServerTimingMixin),
+    - db: every query of the request (see QueryBudgetMiddleware, which
+      must come first),
+    - serialize: the rest of the view, its queries excluded,
+    - render: from the end of the view to the rendered response,
+    - total.
+    """
+    def before(self, request):
+        timings = ServerTimings()
+        return timings, _timings.set(timings)
+
+    def teardown(self, state):
+        _timings.reset(state[1])
+
+    def after(self, request, response, state):
+        timings = state[0]
+        now = time.perf_counter()
+        durations = {
+            'auth': timings.durations['auth'],
+            'perm': timings.durations['perm'],
+            'queryset': timings.durations['queryset'],
+            'db': get_db_time(),
+            'serialize': (timings.durations['view']
+                          - timings.db_durations['view']),
+            'render': now - timings.view_end if timings.view_end else 0.0,
+            'total': now - timings.start,
+        }
+        response.headers['Server-Timing'] = ', '.join(
+            f'{phase};dur={duration * 1000:.2f}'
+            for phase, duration in durations.items()
+        )
+
+        view, _, action = resolve_view(request)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'action': action or '-',
+            'status': response.status_code,
+            **{f'{phase}_ms': round(duration * 1000, 2)
+               for phase, duration in durations.items()},
+        }
+        timing_logger.info(
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'timings': fields}
+        )
+        return response
+
+
+class MetricsMiddleware(HookMiddleware):
+    """
+    Count the requests, and observe their duration and their number of
+    queries (see QueryBudgetMiddleware, which must come first), by
+    view, action and status code, for the /metrics endpoint (see
+    OC_projet_10.metrics).
+    """
+    def before(self, request):
+        return time.perf_counter()
+
+    def after(self, request, response, start):
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration):
+        view, _, action = resolve_view(request)
+        action = action or '-'
+        recorder = _recorder.get()
+        metrics.REQUESTS.labels(
+            view, action, request.method, response.status_code
+        ).inc()
+        metrics.LATENCY.labels(
+            view, action, request.method, response.status_code
+        ).observe(duration)
+        if recorder is not None:
+            metrics.QUERIES.labels(view, action).observe(
+                len(recorder.queries)
+            )
+
+
+class ProfilingMiddleware(HookMiddleware):
+    """
+    Profile the requests asking for it with the X-Profile header or the
+    profile query parameter (cprofile or sampling), when their user is
+    an admin, and a share settings.PROFILING_SAMPLE_RATE of every
+    request with the sampling profiler. The profile, tagged with the
+    view and action, is written to settings.PROFILING_DIR (see
+    OC_projet_10.profiling), and its file name sent back in the
+    X-Profile header to the admin asking for it.
+
+    It comes after AuthenticationMiddleware (the session users), and
+    profiles the view and the rendering of the response. One request
+    is profiled at a time per process; under ASGI, the profile follows
+    the event loop, and so the other requests it serves meanwhile.
+    """
+    def before(self, request):
+        requested = profiling.get_requested_profiler(request)
+        if requested is not None and not self.is_allowed(request):
+            requested = None
+        return self.start_profiler(requested)
+
+    async def abefore(self, request):
+        requested = profiling.get_requested_profiler(request)
+        if (requested is not None
+                and not await sync_to_async(self.is_allowed)(request)):
+            requested = None
+        return self.start_profiler(requested)
+
+    def start_profiler(self, requested):
+        """
+        Give the started profiler of the request and the profiler it
+        asked for, None if it is not profiled.
+        """
+        name = self.choose_profiler(requested)
+        if name is None:
+            return None
+        try:
+            profiler = profiling.PROFILERS[name]()
+            profiler.start()
+        except BaseException:
+            profiling.release()
+            raise
+        return profiler, requested
+
+    def teardown(self, state):
+        """
+        Stop the profiler, whose samples are its own: the next request
+        can be profiled while the profile is written.
+        """
+        if state is not None:
+            try:
+                state[0].stop()
+            finally:
+                profiling.release()
+
+    @staticmethod
+    def is_allowed(request):
+        """
+        Check the user asking for a profile, without recording its
+        authentication among the queries of the request.
+        """
+        token = _recorder.set(None)
+        try:
+            return profiling.is_allowed(request)
+        finally:
+            _recorder.reset(token)
+
+    @staticmethod
+    def choose_profiler(requested):
+        """
+        Give the profiler of the request, None if it is not profiled or
+        if another request is. The lock is then held until release().
+        """
+        if requested is not None:
+            name = requested
+        elif profiling.is_sampled():
+            name = 'sampling'
+        else:
+            return None
+        return name if profiling.acquire() else None
+
+    @staticmethod
+    def after(request, response, state):
+        if state is None:
+            return response
+        profiler, requested = state
+        view, _, action = resolve_view(request)
+        path = profiling.write(profiler, view, action or '-')
+        profiling_logger.info(
+            f"{request.method} {request.path} profilé : {path}"
+        )
+        if requested is not None:
+            response.headers['X-Profile'] = os.path.basename(path)
+        return response
@@ -0,0 +1,188 @@
+"""
+On-demand profiling of the requests of the SoftDesk API (see
+OC_projet_10.middleware.ProfilingMiddleware).
+
+Two profilers are available:
+
+- cprofile: cProfile, every call is traced. Exact call counts, but the
+  request runs about twice slower. Written as a .pstats file, read with
+  `python -m pstats` or snakeviz.
+- sampling: a thread samples the stack of the request every
+  settings.PROFILING_INTERVAL seconds. Nearly no overhead, fit for the
+  sampled production requests. Written as a .speedscope.json file, read
+  with https://www.speedscope.app.
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from myauth.permissions import IsAdminAuthenticated
+
+
+class CProfileProfiler:
+    extension = 'pstats'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def dump(self, path, name):
+        self._profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of the thread starting it.
+    """
+    extension = 'speedscope.json'
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILING_INTERVAL
+        self.samples = Counter()
+        self.duration = 0.0
+        self._thread_id = None
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._start
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    (code.co_name, code.co_filename, code.co_firstlineno)
+                )
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def dump(self, path, name):
+        """
+        Write the samples in the speedscope format, the stacks from
+        their root, weighted by their time.
+        """
+        frames, indexes = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            sample = []
+            for frame in stack:
+                if frame not in indexes:
+                    indexes[frame] = len(frames)
+                    frames.append(
+                        {'name': frame[0], 'file': frame[1], 'line': frame[2]}
+                    )
+                sample.append(indexes[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        document = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'softdesk',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+        with open(path, 'w') as file:
+            json.dump(document, file)
+
+
+PROFILERS = {
+    'cprofile': CProfileProfiler,
+    'sampling': SamplingProfiler,
+}
+
+# One profiled request at a time per process: cProfile cannot profile
+# two requests of the same thread (the event loop of the async views).
+_lock = threading.Lock()
+
+
+def acquire():
+    return _lock.acquire(blocking=False)
+
+
+def release():
+    _lock.release()
+
+
+def get_requested_profiler(request):
+    """
+    Give the name of the profiler asked for by the X-Profile header or
+    the profile query parameter: cprofile, sampling, or any other value
+    for cprofile. None if the request asks for none.
+    """
+    value = (request.headers.get('X-Profile')
+             or request.GET.get('profile'))
+    if not value:
+        return None
+    return value if value in PROFILERS else 'cprofile'
+
+
+def is_sampled():
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def is_allowed(request):
+    """
+    Tell whether the user of the request, authenticated as by the API
+    views (JWT or session), is an admin and may ask for a profile.
+    """
+    drf_request = Request(request, authenticators=[
+        authentication() for authentication
+        in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    try:
+        return IsAdminAuthenticated().has_permission(drf_request, None)
+    except APIException:
+        return False
+
+
+def write(profiler, view, action):
+    """
+    Write the profile of a request to settings.PROFILING_DIR, in a file
+    named after its view and action, and return its path.
+    """
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f'{view}.{action}'
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S.%f')
+    path = os.path.join(
+        directory, f'{name}.{stamp}.{os.getpid()}.{profiler.extension}'
+    )
+    profiler.dump(path, name)
+    return path
@@ -48,12 +48,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'OC_projet_10.middleware.CompressionMiddleware',
+    'OC_projet_10.middleware.QueryBudgetMiddleware',
+    'OC_projet_10.middleware.ServerTimingMiddleware',
+    'OC_projet_10.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'OC_projet_10.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'OC_projet_10.urls'
@@ -79,13 +84,84 @@ WSGI_APPLICATION = 'OC_projet_10.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DATABASE_NAME gives another SQLite file, e.g. the throwaway database of
+# the loadtest_mixed command.
+# DATABASE_TEST_NAME gives the tests a database file instead of memory,
+# e.g. to restore a backup into it (softdesk_restore --test) and run the
+# tests with --keepdb.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME') or BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': os.environ.get('DATABASE_TEST_NAME')},
     }
 }
 
+# Read replicas, declared as comma separated aliases in the .env, e.g.
+# DATABASE_REPLICAS='replica1,replica2'. Locally, each replica is a file
+# copy of the primary refreshed by `python manage.py sync_replicas`.
+DATABASE_REPLICAS = [
+    alias.strip()
+    for alias in os.environ.get('DATABASE_REPLICAS', '').split(',')
+    if alias.strip()
+]
+for replica in DATABASE_REPLICAS:
+    DATABASES[replica] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{replica}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Shards of the project data (contributors, issues and comments),
+# declared as comma separated aliases in the .env, e.g.
+# DATABASE_SHARDS='shard1,shard2'. Only append new shards to the list,
+# the position of a shard gives the range of its ids. The users and the
+# projects stay in 'default', see softdesk/sharding.py.
+DATABASE_SHARDS = [
+    alias.strip()
+    for alias in os.environ.get('DATABASE_SHARDS', '').split(',')
+    if alias.strip()
+]
+for shard in DATABASE_SHARDS:
+    DATABASES[shard] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{shard}.sqlite3',
+    }
+
+DATABASE_ROUTERS = [
+    'OC_projet_10.db_routers.ProjectShardRouter',
+    'OC_projet_10.db_routers.PrimaryReplicaRouter',
+]
+
+# Number of seconds during which a user who just wrote something reads
+# from the primary instead of the replicas.
+REPLICA_PIN_SECONDS = 5
+
+# Cache shared by the workers of the server: the pins to the primary
+# above and the cached counts of the lists (see softdesk.pagination) must
+# be seen by every worker, which the default per-process memory cache
+# does not do. CACHE_DIR gives another directory, on a disk shared by
+# the workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Compression of the responses (see OC_projet_10/middleware.py), zstd and
+# brotli being used when zstandard and brotli are installed. The level (1
+# to 9) can be set per view with a compression_level attribute, 0 turning
+# the compression off for latency-sensitive endpoints.
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SIZE = 1024
+
+# Maximum number of sub-requests of a batch request (/api/v1/batch/), and
+# number of threads running the reads of a batch sent with "parallel".
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -138,13 +214,92 @@ AUTH_USER_MODEL = 'myauth.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.LimitOffsetPagination',
+        'softdesk.pagination.SoftDeskPagination',
     'PAGE_SIZE': 5,
+    'DEFAULT_RENDERER_CLASSES':
+        ('softdesk.renderers.ORJSONRenderer',
+         'softdesk.renderers.MessagePackRenderer',
+         'rest_framework.renderers.BrowsableAPIRenderer',),
+    'DEFAULT_PARSER_CLASSES':
+        ('softdesk.parsers.ORJSONParser',
+         'softdesk.parsers.MessagePackParser',
+         'rest_framework.parsers.FormParser',
+         'rest_framework.parsers.MultiPartParser',),
     'DEFAULT_AUTHENTICATION_CLASSES':
         ('rest_framework_simplejwt.authentication.JWTAuthentication',
          'rest_framework.authentication.SessionAuthentication',)
 }
 
+# Serve the list and retrieve actions of the project resources with
+# native async views (see softdesk/async_views.py). Enabled by asgi.py,
+# the async views would be slower under WSGI.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+# Maximum number of seconds a read waits for the identical read already
+# running in the same worker (see softdesk.utils.mixins.SingleFlightMixin)
+# before running its own queries.
+SINGLE_FLIGHT_TIMEOUT = 5
+
+# Number of seconds the counts of the paginated lists of the projects
+# and the users are cached (see softdesk.pagination.CachedCountPagination),
+# and the number of rows past which they are estimated instead. A save or
+# a delete invalidates them at once, not a bulk write (update(),
+# bulk_create(), raw SQL) that does not call pagination.invalidate_counts:
+# they can then be stale for PAGINATION_COUNT_TIMEOUT seconds.
+PAGINATION_COUNT_TIMEOUT = 30
+PAGINATION_COUNT_LIMIT = 10000
+
+# Query budgets of the views (see OC_projet_10.middleware
+# .QueryBudgetMiddleware): an SQL template run with this number of
+# different parameters in a request is an N+1 pattern. The requests
+# over budget are logged by the 'softdesk.queries' logger, or fail when
+# QUERY_BUDGET_STRICT is set (tests).
+QUERY_BUDGET_N_PLUS_ONE = 5
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == '1'
+
+# Profiling of the requests (see OC_projet_10.middleware
+# .ProfilingMiddleware): the admins ask for a profile with the X-Profile
+# header, and this share of every request is profiled by the sampling
+# profiler, whose interval is in seconds. The profiles are written to
+# PROFILING_DIR.
+PROFILING_DIR = os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL = 0.001
+
+# Slow query log (see softdesk.slow_queries): the queries lasting this
+# number of seconds or more are written, as JSON lines, to SLOW_QUERY_LOG,
+# rotated past SLOW_QUERY_LOG_MAX_BYTES. Aggregated by the slow_queries
+# command.
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.1))
+SLOW_QUERY_LOG = os.environ.get(
+    'SLOW_QUERY_LOG', BASE_DIR / 'logs' / 'slow_queries.jsonl'
+)
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Soft deletion (see softdesk/purge.py): the projects and the users
+# deleted through the API are hidden at once and purged in batches by
+# the purge_deleted command. Set SOFT_DELETE=0 to delete them in the
+# request.
+SOFT_DELETE = os.environ.get('SOFT_DELETE', '1') == '1'
+
+# In-database job queue (see softdesk.jobs): the softdesk_worker command
+# looks for due jobs every JOB_POLL_INTERVAL seconds, retries a failed
+# job after JOB_BACKOFF_BASE * 2 ** (attempts - 1) seconds (at most
+# JOB_BACKOFF_MAX) and queues again the jobs of a worker which did not
+# renew their lock for JOB_LOCK_TIMEOUT seconds. The jobs done are kept
+# JOB_RETENTION seconds.
+JOB_POLL_INTERVAL = 0.2
+JOB_BACKOFF_BASE = 2
+JOB_BACKOFF_MAX = 600
+JOB_LOCK_TIMEOUT = 300
+JOB_RETENTION = 7 * 24 * 3600
+
+# Archival (see softdesk/archive.py): the archive_issues command moves
+# the FINISHED issues created more than ARCHIVE_AFTER_DAYS days ago, and
+# their comments, to the archive tables.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
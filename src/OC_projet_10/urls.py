@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_nested import routers
@@ -5,10 +6,14 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView, TokenRefreshView
 )
 
+from OC_projet_10.batch import BatchView
+from OC_projet_10.metrics import metrics_view
 from myauth.views import UserViewSet
 from softdesk.views import (
-    ProjectViewSet, ContributorViewSet, IssueViewSet, CommentViewSet
+    ProjectViewSet, ContributorViewSet, IssueViewSet, CommentViewSet,
+    AssignedIssueViewSet
 )
+from softdesk.async_views import with_async_reads
 
 # DefaultRouter includes a default API root view that returns a response
 # containing hyperlinks to all the list views.
@@ -54,6 +59,16 @@ issues_router.register(
     basename='issue-comment'
 )
 
+api_urls = router.urls + projects_router.urls + issues_router.urls + [
+    path(
+        route='me/issues/',
+        view=AssignedIssueViewSet.as_view({'get': 'list'}),
+        name='me-issue-list'
+    ),
+]
+# Under ASGI, the read actions are served by async views
+if settings.ASYNC_READ_VIEWS:
+    api_urls = with_async_reads(api_urls)
 
 urlpatterns = [
     path(
@@ -74,17 +89,18 @@ urlpatterns = [
         view=TokenRefreshView.as_view(),
         name='token_refresh'
     ),
-    # the three following paths have the same route
     path(
-        route='api/v1/',
-        view=include(router.urls)
+        route='api/v1/batch/',
+        view=BatchView.as_view(),
+        name='batch'
     ),
     path(
         route='api/v1/',
-        view=include(projects_router.urls)
+        view=include(api_urls)
     ),
     path(
-        route='api/v1/',
-        view=include(issues_router.urls)
+        route='metrics',
+        view=metrics_view,
+        name='metrics'
     ),
 ]
@@ -5,7 +5,7 @@ from myauth.models import User
 class UserFilter(filters.FilterSet):
     user_id = filters.NumberFilter(
         field_name='id',
-        lookup_expr='iexact'
+        lookup_expr='exact'
     )
     username = filters.CharFilter(
         field_name='username',
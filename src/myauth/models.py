@@ -6,7 +6,9 @@ from django.db import models
 
 class User(AbstractUser):
     """
-    Basic django User class expanded to add a few custom fields
+    Basic django User class expanded to add a few custom fields.
+    A user with a deleted_at date is inactive and hidden, their purge
+    is left to the purge_deleted command.
     """
 
     date_of_birth = models.DateField(
@@ -22,6 +24,21 @@ class User(AbstractUser):
     created_time = models.DateTimeField(
         auto_now_add=True
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+
+    class Meta(AbstractUser.Meta):
+        """
+        Index for the deleted users, hidden from the lists and purged.
+        """
+        indexes = [
+            models.Index(
+                fields=['deleted_at'],
+                name='user_deleted_at_idx'
+            ),
+        ]
 
     def clean(self):
         """
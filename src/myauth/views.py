@@ -2,6 +2,7 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 from django_filters import rest_framework as filters
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from myauth.serializers import (
     UserListSerializer,
@@ -11,12 +12,15 @@ from myauth.serializers import (
 
 from myauth.permissions import IsAdminAuthenticated, IsOwner
 from myauth.filters import UserFilter
+from softdesk import purge
+from softdesk.pagination import CachedCountPagination
+from softdesk.utils.mixins import ReplicaRoutingMixin, ServerTimingMixin
 
 
 User = get_user_model()
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(ServerTimingMixin, ReplicaRoutingMixin, ModelViewSet):
     """
     The SoftDesk API is a RESTful API built using Django Rest Framework
     in order to develop a secured and efficient backend interface to
@@ -49,6 +53,15 @@ class UserViewSet(ModelViewSet):
         'partial_update': UserPostSerializer,
         'retrieve': UserDetailSerializer
     }
+    # Maximum number of queries of the actions, see
+    # OC_projet_10.middleware.QueryBudgetMiddleware
+    query_budget_map = {
+        'list': 4,
+        'retrieve': 4,
+        'create': 4,
+        'update': 6,
+        'partial_update': 6,
+    }
 
     # Permissions
     default_permission = [IsOwner | IsAdminAuthenticated]
@@ -68,9 +81,21 @@ class UserViewSet(ModelViewSet):
     }
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = UserFilter
+    pagination_class = CachedCountPagination
 
     def get_queryset(self):
-        return User.objects.all()
+        return User.objects.filter(deleted_at__isnull=True)
+
+    def perform_destroy(self, instance):
+        """
+        With settings.SOFT_DELETE, deactivate and hide the user and queue
+        the deletion of their projects, issues and comments, run by the
+        softdesk_worker command (see softdesk/purge.py).
+        """
+        if settings.SOFT_DELETE:
+            purge.soft_delete_user(instance)
+        else:
+            super().perform_destroy(instance)
 
     def get_serializer_class(self):
         """
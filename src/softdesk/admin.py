@@ -1,5 +1,7 @@
 from django.contrib import admin
-from softdesk.models import Project, Contributor, Issue, Comment
+from softdesk.models import (
+    Project, Contributor, Issue, Comment, Job, ArchivedIssue
+)
 
 
 @admin.register(Project)
@@ -47,3 +49,23 @@ class CommentAdmin(admin.ModelAdmin):
         if obj.content:
             return obj.content[:60] + ("..." if len(obj.content) > 60 else '')
         return ''
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Custom admin configuration for the Job model.
+    """
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after',
+                    'time_finished')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key')
+
+
+@admin.register(ArchivedIssue)
+class ArchivedIssueAdmin(admin.ModelAdmin):
+    """
+    Custom admin configuration for the ArchivedIssue model.
+    """
+    list_display = ('id', 'author', 'project', 'title', 'time_created')
+    search_fields = ('author', 'project', 'title')
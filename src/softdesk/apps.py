@@ -11,3 +11,5 @@ class SoftdeskConfig(AppConfig):
         # See Django docs:
         # https://docs.djangoproject.com/en/5.1/topics/signals/#connecting-receiver-functions
         import softdesk.signals
+        # Register the tasks of the job queue (see softdesk.jobs).
+        import softdesk.purge  # noqa: F401
@@ -0,0 +1,194 @@
+"""
+Archival of the issues FINISHED for long, with their comments.
+
+The archived issues and comments are moved, in the shard of their
+project, to the tables of ArchivedIssue and ArchivedComment, which keeps
+the tables of the live issues and comments, and their indexes, small.
+They keep their ids, and are read back by the include_archived filter of
+the issues through two database views, the union of the live and the
+archived rows (IssueRecord and CommentRecord).
+
+SQLite rebuilds a table for most changes of its columns, and the rebuild
+fails on the views reading the table: the views are dropped before the
+migrations and created again after them (see softdesk.signals).
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+)
+from django.utils import timezone
+
+from softdesk import pagination, sharding
+from softdesk.models import (
+    Project, Issue, Comment, ArchivedIssue, ArchivedComment, IssueRecord,
+    CommentRecord
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(model):
+    return ', '.join(field.column for field in model._meta.concrete_fields)
+
+
+def _view_sql(connection, view, live, archived, flag=False):
+    """
+    Give the SQL creating a view, the union of the rows of a live model
+    and of its archived model, flagged by an archived column if flag.
+    """
+    quote_name = connection.ops.quote_name
+    columns = _columns(archived)
+    selects = [
+        f"SELECT {columns}{f', {value} AS archived' if flag else ''} "
+        f"FROM {quote_name(model._meta.db_table)}"
+        for model, value in ((live, 'FALSE'), (archived, 'TRUE'))
+    ]
+    return (f"CREATE VIEW IF NOT EXISTS {quote_name(view._meta.db_table)} "
+            f"AS {' UNION ALL '.join(selects)}")
+
+
+def create_views(alias=DEFAULT_DB_ALIAS):
+    """
+    Create the views of IssueRecord and CommentRecord in a database,
+    once the archive tables exist.
+    """
+    connection = connections[alias]
+    tables = connection.introspection.table_names()
+    if not {ArchivedIssue._meta.db_table,
+            ArchivedComment._meta.db_table} <= set(tables):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_view_sql(connection, IssueRecord, Issue,
+                                 ArchivedIssue, flag=True))
+        cursor.execute(_view_sql(connection, CommentRecord, Comment,
+                                 ArchivedComment))
+
+
+def drop_views(alias=DEFAULT_DB_ALIAS):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for view in (CommentRecord, IssueRecord):
+            cursor.execute(f"DROP VIEW IF EXISTS "
+                           f"{connection.ops.quote_name(view._meta.db_table)}")
+
+
+def _move(alias, issue_ids, source, target):
+    """
+    Move issues, by their ids, and their comments from the tables of the
+    source models (issue, comment) to those of the target models, in one
+    transaction.
+    """
+    connection = connections[alias]
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(issue_ids))
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        for (model, target_model), key in zip(zip(source, target),
+                                              ('id', 'issue_id')):
+            columns = _columns(target_model)
+            cursor.execute(
+                f"INSERT INTO {quote_name(target_model._meta.db_table)} "
+                f"({columns}) SELECT {columns} "
+                f"FROM {quote_name(model._meta.db_table)} "
+                f"WHERE {key} IN ({placeholders})",
+                issue_ids
+            )
+        # The comments first, they reference the issues.
+        for model, key in ((source[1], 'issue_id'), (source[0], 'id')):
+            cursor.execute(
+                f"DELETE FROM {quote_name(model._meta.db_table)} "
+                f"WHERE {key} IN ({placeholders})",
+                issue_ids
+            )
+    for model in (*source, *target):
+        pagination.invalidate_counts(model)
+
+
+def archive_finished_issues(days=None, batch_size=100, pause=0.01,
+                            log=logger.info):
+    """
+    Archive the FINISHED issues created more than days ago (by default
+    settings.ARCHIVE_AFTER_DAYS) and their comments, batch_size issues
+    at a time, project by project. Each batch is moved in its own
+    transaction, with a pause of pause seconds between the batches. The
+    issues of the soft deleted projects are left to their purge.
+    Return the number of archived issues.
+    """
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    projects = list(Project.objects.using(DEFAULT_DB_ALIAS)
+                    .filter(deleted_at__isnull=True)
+                    .order_by('pk').values_list('pk', flat=True))
+    total = 0
+    for project_id in projects:
+        alias = sharding.shard_for_project(project_id)
+        finished = (Issue.objects.using(alias)
+                    .filter(project_id=project_id,
+                            status=Issue.IssueStatus.FINISHED,
+                            time_created__lt=cutoff)
+                    .order_by('pk'))
+        archived = 0
+        last = 0
+        while True:
+            issue_ids = list(finished.filter(pk__gt=last)
+                             .values_list('pk', flat=True)[:batch_size])
+            if not issue_ids:
+                break
+            _move(alias, issue_ids, (Issue, Comment),
+                  (ArchivedIssue, ArchivedComment))
+            archived += len(issue_ids)
+            last = issue_ids[-1]
+            if pause:
+                time.sleep(pause)
+        if archived:
+            log(f"projet {project_id} : {archived} issue(s) archivée(s)")
+        total += archived
+    return total
+
+
+def restore_issues(issue_ids=None, project_id=None, batch_size=100):
+    """
+    Move archived issues, given by their ids or by their project, back
+    to the live issues with their comments. An issue whose title was
+    taken meanwhile by a live issue of its author in its project
+    (unique_issue) stays archived. Return the number of restored issues
+    and the ids of those left archived by a conflict.
+    """
+    aliases = (sharding.shard_aliases() if project_id is None
+               else [sharding.shard_for_project(project_id)])
+    total = 0
+    conflicts = []
+    for alias in aliases:
+        archived = ArchivedIssue.objects.using(alias).order_by('pk')
+        if issue_ids is not None:
+            archived = archived.filter(pk__in=issue_ids)
+        if project_id is not None:
+            archived = archived.filter(project_id=project_id)
+        last = 0
+        while True:
+            batch = list(archived.filter(pk__gt=last)
+                         .values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last = batch[-1]
+            try:
+                _move(alias, batch, (ArchivedIssue, ArchivedComment),
+                      (Issue, Comment))
+                total += len(batch)
+                continue
+            except IntegrityError:
+                pass
+            # The batch holds a conflict: move its issues one by one,
+            # each in its own transaction.
+            for issue_id in batch:
+                try:
+                    _move(alias, [issue_id], (ArchivedIssue, ArchivedComment),
+                          (Issue, Comment))
+                    total += 1
+                except IntegrityError:
+                    conflicts.append(issue_id)
+    return total, conflicts
@@ -0,0 +1,273 @@
+"""
+Async read paths of the project resources, served under ASGI.
+
+When settings.ASYNC_READ_VIEWS is enabled, the list and retrieve
+actions of the viewsets implementing AsyncReadMixin are served by a
+native async view: JWT authentication, permission checks, queries and
+pagination use the async ORM, and the request does not hop through a
+thread. Every other request (writes, session authentication, browsable
+API) is handed to the regular DRF viewset.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404, HttpResponse
+from django.urls import URLPattern
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AND, OR, NOT, BasePermission
+from rest_framework.response import Response
+
+from myauth.authentication import AsyncJWTAuthentication
+from OC_projet_10 import db_routers, middleware
+from softdesk import sharding
+
+
+async def acheck_permission(permission, request, view):
+    """
+    Async version of permission.has_permission, following the
+    operators (|, &, ~) of the composed permissions.
+    """
+    if isinstance(permission, OR):
+        return (await acheck_permission(permission.op1, request, view)
+                or await acheck_permission(permission.op2, request, view))
+    if isinstance(permission, AND):
+        return (await acheck_permission(permission.op1, request, view)
+                and await acheck_permission(permission.op2, request, view))
+    if isinstance(permission, NOT):
+        return not await acheck_permission(permission.op1, request, view)
+    if hasattr(permission, 'ahas_permission'):
+        return await permission.ahas_permission(request, view)
+    return permission.has_permission(request, view)
+
+
+async def acheck_object_permission(permission, request, view, obj):
+    """
+    Async version of permission.has_object_permission. The object
+    permissions that are not the default one run in a thread, they
+    may need the database.
+    """
+    if isinstance(permission, (OR, AND)):
+        op1 = (await acheck_permission(permission.op1, request, view)
+               and await acheck_object_permission(
+                   permission.op1, request, view, obj))
+        if isinstance(permission, OR) and op1:
+            return True
+        if isinstance(permission, AND) and not op1:
+            return False
+        return (await acheck_permission(permission.op2, request, view)
+                and await acheck_object_permission(
+                    permission.op2, request, view, obj))
+    if isinstance(permission, NOT):
+        return not await acheck_object_permission(
+            permission.op1, request, view, obj
+        )
+    has_object_permission = type(permission).has_object_permission
+    if has_object_permission is BasePermission.has_object_permission:
+        return True
+    return await sync_to_async(permission.has_object_permission)(
+        request, view, obj
+    )
+
+
+class AsyncReadMixin:
+    """
+    Mixin for the viewsets of the project resources, giving an async
+    implementation of the actions listed in async_actions.
+    """
+    async_actions = ('list', 'retrieve')
+    async_authentication_class = AsyncJWTAuthentication
+
+    @classmethod
+    def as_async_view(cls, sync_view):
+        """
+        Build an async view serving the async actions of a viewset and
+        handing the other requests to sync_view, the view built by the
+        router for the same URL.
+        """
+        actions = sync_view.actions
+        initkwargs = sync_view.initkwargs
+        async_sync_view = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            response = None
+            if actions.get(request.method.lower()) in cls.async_actions:
+                self = cls(**initkwargs)
+                response = await self.adispatch(
+                    request, actions, *args, **kwargs
+                )
+            if response is None:
+                response = await async_sync_view(request, *args, **kwargs)
+            return response
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, actions, *args, **kwargs):
+        """
+        Async version of dispatch, for the requests authenticated with a
+        JWT and expecting a JSON response. Return None for the other
+        requests, which are served by the sync viewset.
+        """
+        authenticator = self.async_authentication_class()
+        header = authenticator.get_header(request)
+        if header is None or authenticator.get_raw_token(header) is None:
+            return None
+
+        self.action_map = actions
+        for method, action in actions.items():
+            setattr(self, method, getattr(self, action))
+        if hasattr(self, 'get') and not hasattr(self, 'head'):
+            self.head = self.get
+        self.args = args
+        self.kwargs = kwargs
+        self.headers = self.default_response_headers
+
+        authentication_error = None
+        try:
+            with middleware.measure('auth'):
+                user, token = await authenticator.aauthenticate(request)
+            request._force_auth_user = user
+            request._force_auth_token = token
+        except APIException as exc:
+            authentication_error = exc
+
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        try:
+            renderer, media_type = self.perform_content_negotiation(request)
+        except APIException:
+            return None
+        if renderer.format == 'api':
+            return None
+        request.accepted_renderer = renderer
+        request.accepted_media_type = media_type
+
+        try:
+            try:
+                if authentication_error is not None:
+                    raise authentication_error
+                await self.ainitial(request, *args, **kwargs)
+                middleware.begin_phase('view')
+                handler = getattr(self, f'a{self.action}')
+                response = await handler(request, *args, **kwargs)
+            except Exception as exc:
+                response = self.handle_exception(exc)
+            response = self.finalize_response(
+                request, response, *args, **kwargs
+            )
+        finally:
+            self.reset_replica_reads()
+            self.reset_shard()
+
+        if not isinstance(response, Response):
+            return response
+        content = (response.content if response.is_rendered
+                   else response.rendered_content)
+        http_response = HttpResponse(
+            content,
+            status=response.status_code,
+            content_type=response['Content-Type'],
+        )
+        for header, value in response.items():
+            http_response[header] = value
+        return http_response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Async version of initial, routing the queries (see
+        ShardRoutingMixin and ReplicaRoutingMixin) and checking the
+        permissions.
+        """
+        project_pk = self.kwargs.get(self.shard_project_kwarg)
+        if project_pk is not None:
+            self._shard_token = await sharding.aset_current_project(
+                project_pk
+            )
+        self._replica_token = db_routers.set_replica_reads(
+            self.action in self.replica_actions
+            and not db_routers.is_pinned_to_primary(request.user)
+        )
+
+        with middleware.measure('perm'):
+            for permission in self.get_permissions():
+                if not await acheck_permission(permission, request, self):
+                    self.permission_denied(
+                        request,
+                        message=getattr(permission, 'message', None),
+                        code=getattr(permission, 'code', None)
+                    )
+
+    async def afilter_queryset(self, queryset):
+        """
+        Filtering only builds lazy querysets, except for the filters
+        gathering ids from every shard, run in a thread when sharding
+        is enabled.
+        """
+        if settings.DATABASE_SHARDS:
+            return await sync_to_async(self.filter_queryset)(queryset)
+        return self.filter_queryset(queryset)
+
+    async def alist(self, request, *args, **kwargs):
+        with middleware.measure('queryset'):
+            queryset = await self.afilter_queryset(self.get_queryset())
+
+        if self.paginator is not None:
+            with middleware.measure('queryset'):
+                page = await self.paginator.apaginate_queryset(
+                    queryset, request, view=self
+                )
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+
+        objects = [obj async for obj in queryset]
+        serializer = self.get_serializer(objects, many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            with middleware.measure('queryset'):
+                queryset = await self.afilter_queryset(self.get_queryset())
+                instance = await queryset.aget(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                )
+        except (ObjectDoesNotExist, ValidationError, ValueError, TypeError):
+            raise Http404
+
+        with middleware.measure('perm'):
+            for permission in self.get_permissions():
+                if not await acheck_object_permission(
+                        permission, request, self, instance):
+                    self.permission_denied(
+                        request,
+                        message=getattr(permission, 'message', None),
+                        code=getattr(permission, 'code', None)
+                    )
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+def with_async_reads(urlpatterns):
+    """
+    Replace the views built by a router for the viewsets implementing
+    AsyncReadMixin by their async views.
+    """
+    patterns = []
+    for pattern in urlpatterns:
+        viewset = getattr(pattern.callback, 'cls', None)
+        if (isinstance(pattern, URLPattern)
+                and isinstance(viewset, type)
+                and issubclass(viewset, AsyncReadMixin)):
+            pattern = URLPattern(
+                pattern.pattern,
+                viewset.as_async_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        patterns.append(pattern)
+    return patterns
@@ -0,0 +1,136 @@
+"""
+Online backups of the SQLite databases, and their restoration.
+
+A backup is a directory holding a copy of every database (the global
+one and the shards), optionally compressed, and a manifest.json giving
+the SHA-256 of every file. The databases are copied with the online
+backup API of SQLite (see softdesk.utils.sqlite), a few pages at a
+time: the API keeps serving, and writing, while they are copied. The
+copies are restored the same way, page by page over the live
+databases, or over the test databases to run the tests on a snapshot
+of production.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.db import connections
+from django.utils import timezone
+
+from softdesk import sharding
+from softdesk.utils.sqlite import copy_database, restore_database
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# Suffix and opener of the files of a backup, by compression.
+COMPRESSIONS = {
+    'none': ('', open),
+    'gzip': ('.gz', gzip.open),
+    'zstd': ('.zst', zstandard.open if zstandard is not None else None),
+}
+
+CHUNK_SIZE = 2 ** 20
+
+
+def checksum(path):
+    """
+    Give the SHA-256 of a file, read by chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _opener(compression):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compressions possibles : "
+                         f"{', '.join(COMPRESSIONS)}.")
+    suffix, opener = COMPRESSIONS[compression]
+    if opener is None:
+        raise ValueError("zstandard est requis : pip install zstandard")
+    return suffix, opener
+
+
+def backup(directory, aliases=None, compression='gzip', pages=1024,
+           sleep=0.01, log=logger.info):
+    """
+    Back up databases (by default the global one and the shards) into a
+    new directory, pages pages at a time with sleep seconds between the
+    steps, and write its manifest. Return the manifest.
+    """
+    suffix, opener = _opener(compression)
+    directory = Path(directory)
+    directory.mkdir(parents=True)
+    manifest = {'created': timezone.now().isoformat(),
+                'compression': compression, 'databases': {}}
+    for alias in aliases or sharding.shard_aliases():
+        copy = directory / f'{alias}.sqlite3'
+        copy_database(connections[alias].settings_dict['NAME'], copy,
+                      pages=pages, sleep=sleep)
+        entry = {'database_sha256': checksum(copy),
+                 'database_bytes': copy.stat().st_size}
+        if suffix:
+            with open(copy, 'rb') as src, opener(f'{copy}{suffix}',
+                                                 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            copy.unlink()
+            copy = copy.with_name(copy.name + suffix)
+        entry.update(file=copy.name, sha256=checksum(copy),
+                     bytes=copy.stat().st_size)
+        manifest['databases'][alias] = entry
+        log(f"{alias} : {entry['database_bytes'] / 2 ** 20:.1f} Mio, "
+            f"{entry['file']} {entry['bytes'] / 2 ** 20:.1f} Mio")
+    with open(directory / MANIFEST, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(Path(directory) / MANIFEST) as file:
+        return json.load(file)
+
+
+def restore(directory, targets, pages=1024, sleep=0.01, log=logger.info):
+    """
+    Restore the databases of a backup over the database files given by
+    targets, a dict {alias: path}, after checking their checksums. A
+    database is only written once its copy is checked.
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    _, opener = _opener(manifest['compression'])
+    for alias, target in targets.items():
+        entry = manifest['databases'].get(alias)
+        if entry is None:
+            raise ValueError(f"La sauvegarde n'a pas de base {alias}.")
+        copy = directory / entry['file']
+        if checksum(copy) != entry['sha256']:
+            raise ValueError(f"{copy} : somme de contrôle invalide.")
+
+        # The copy is decompressed next to the target, on the same disk.
+        fd, path = tempfile.mkstemp(suffix='.sqlite3',
+                                    dir=Path(target).parent)
+        try:
+            with os.fdopen(fd, 'wb') as dst, opener(copy, 'rb') as src:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            if checksum(path) != entry['database_sha256']:
+                raise ValueError(f"{copy} : somme de contrôle invalide "
+                                 f"une fois décompressé.")
+            restore_database(path, target, pages=pages, sleep=sleep)
+        finally:
+            os.unlink(path)
+        log(f"{alias} : {target} restaurée.")
@@ -1,5 +1,39 @@
 from django_filters import rest_framework as filters
-from softdesk.models import Project, Issue, Contributor, Comment
+from django_filters.constants import EMPTY_VALUES
+from softdesk import sharding
+from softdesk.models import Project, Issue, Contributor, Comment, IssueRecord
+
+
+class ChoiceNameFilter(filters.ChoiceFilter):
+    """
+    Filter on the integer-coded choices (IntegerChoices) of the models,
+    by their names (e.g. 'IN_PROGRESS').
+    """
+    def __init__(self, choices_class, *args, **kwargs):
+        self.choices_class = choices_class
+        kwargs['choices'] = [
+            (member.name, member.label) for member in choices_class
+        ]
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value in self.choices_class.names:
+            value = self.choices_class[value]
+        return super().filter(qs, value)
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter ending with the id, in the direction of the first
+    ordering, so that the pages of equal values are stable and the
+    ordering matches the (..., id) indexes.
+    """
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        tie_breaker = '-id' if ordering[0].startswith('-') else 'id'
+        return qs.order_by(*ordering, tie_breaker)
 
 
 class ProjectFilterSet(filters.FilterSet):
@@ -8,7 +42,7 @@ class ProjectFilterSet(filters.FilterSet):
     """
     project_id = filters.NumberFilter(
         field_name='id',
-        lookup_expr='iexact'
+        lookup_expr='exact'
     )
     title = filters.CharFilter(
         field_name="title",
@@ -20,8 +54,9 @@ class ProjectFilterSet(filters.FilterSet):
     )
     author_id = filters.NumberFilter(
         field_name='author__id',
-        lookup_expr='iexact',
+        lookup_expr='exact',
     )
+    type = ChoiceNameFilter(Project.ProjectType)
     my_projects = filters.BooleanFilter(
         label='my project :',
         method='filter_my_project'
@@ -33,10 +68,17 @@ class ProjectFilterSet(filters.FilterSet):
         contributor.
         NB : If a user is the project's author, he will always be a
         contributor.
+        The contributors are spread across the shards, the ids of the
+        projects are gathered from every shard.
         """
         if value:
             user = self.request.user
-            queryset = queryset.filter(contributors__user=user)
+            project_ids = sharding.scatter_gather(
+                Contributor.objects
+                .filter(user=user)
+                .values_list('project_id', flat=True)
+            )
+            queryset = queryset.filter(id__in=project_ids)
         return queryset
 
     class Meta:
@@ -57,7 +99,7 @@ class IssueFilterSet(filters.FilterSet):
     """
     issue_id = filters.NumberFilter(
         field_name='id',
-        lookup_expr='iexact'
+        lookup_expr='exact'
     )
     title = filters.CharFilter(
         field_name="title",
@@ -75,6 +117,36 @@ class IssueFilterSet(filters.FilterSet):
         field_name='assigned_to__id',
         lookup_expr='exact'
     )
+    priority = ChoiceNameFilter(Issue.IssuePriority)
+    type = ChoiceNameFilter(Issue.IssueType)
+    status = ChoiceNameFilter(Issue.IssueStatus)
+    # The priorities and the statuses are ordered by their codes, from
+    # LOW to HIGH and from TO_DO to FINISHED.
+    ordering = StableOrderingFilter(
+        fields=('priority', 'status', 'time_created')
+    )
+    include_archived = filters.BooleanFilter(
+        label='include archived :',
+        method='filter_include_archived'
+    )
+
+    def filter_include_archived(self, queryset, name, value):
+        """
+        The archived issues are read by the view itself, through
+        IssueRecord (see IssueRecordFilterSet), the queryset is left as
+        is.
+        """
+        return queryset
+
+    @classmethod
+    def includes_archived(cls, request):
+        """
+        Check if a request asks for the archived issues too.
+        """
+        widget = cls.base_filters['include_archived'].field.widget
+        return widget.value_from_datadict(
+            request.query_params, {}, 'include_archived'
+        ) is True
 
     class Meta:
         model = Issue
@@ -86,17 +158,39 @@ class IssueFilterSet(filters.FilterSet):
             'assigned_to',
             'priority',
             'type',
-            'status'
+            'status',
+            'include_archived'
         ]
 
 
+class IssueRecordFilterSet(IssueFilterSet):
+    """
+    Filters of the project-issue-list endpoint read with
+    include_archived=true, on the issues and the archived issues.
+    """
+    class Meta(IssueFilterSet.Meta):
+        model = IssueRecord
+
+
+class AssignedIssueFilterSet(filters.FilterSet):
+    """
+    Implements filters to be used with the me-issue-list endpoint.
+    """
+    status = ChoiceNameFilter(Issue.IssueStatus)
+    priority = ChoiceNameFilter(Issue.IssuePriority)
+
+    class Meta:
+        model = Issue
+        fields = ['status', 'priority']
+
+
 class ContributorFilterSet(filters.FilterSet):
     """
     Implements filters to be used with the project-contributor-list endpoint.
     """
     user_id = filters.NumberFilter(
         field_name='user__id',
-        lookup_expr='iexact'
+        lookup_expr='exact'
     )
 
     class Meta:
@@ -110,7 +204,7 @@ class CommentFilterSet(filters.FilterSet):
     """
     author_id = filters.NumberFilter(
         field_name='author__id',
-        lookup_expr='iexact'
+        lookup_expr='exact'
     )
 
     class Meta:
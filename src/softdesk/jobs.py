@@ -0,0 +1,185 @@
+"""
+In-database job queue: the work to run outside the requests (purges,
+exports, repairs) is queued as rows of the Job table and run by the
+softdesk_worker command, without any broker.
+
+A job names a task registered with @task and holds its JSON payload.
+The workers claim the due jobs with SELECT ... FOR UPDATE SKIP LOCKED
+where the database has it (PostgreSQL). With SQLite, whose writers are
+serialized, a job is claimed by a conditional UPDATE of its status that
+only one worker wins. A failed job is retried after an exponential
+backoff, up to its max_attempts. The running jobs whose lock was not
+renewed for settings.JOB_LOCK_TIMEOUT seconds (a stopped worker) are
+queued again, the tasks must then be idempotent.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+)
+from django.utils import timezone
+
+from softdesk.models import Job
+
+logger = logging.getLogger('softdesk.jobs')
+
+# Registered tasks, by name.
+TASKS = {}
+
+
+def task(name=None, max_attempts=5):
+    """
+    Register a function as a task, called by the workers with the
+    payload of its jobs as keyword arguments.
+    """
+    def decorator(function):
+        function.task_name = (name
+                              or f'{function.__module__}.{function.__name__}')
+        function.max_attempts = max_attempts
+        TASKS[function.task_name] = function
+        return function
+    return decorator
+
+
+def enqueue(function, payload=None, key=None, delay=0):
+    """
+    Queue a job running a task with a payload, in delay seconds. Only one
+    job is queued per idempotency key: the job already queued with the
+    key, or run, is returned instead.
+    """
+    jobs = Job.objects.using(DEFAULT_DB_ALIAS)
+    if key is not None:
+        job = jobs.filter(idempotency_key=key).first()
+        if job is not None:
+            return job
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            return jobs.create(
+                name=function.task_name,
+                payload=payload or {},
+                idempotency_key=key,
+                max_attempts=function.max_attempts,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Queued with the same key by a concurrent request.
+        return jobs.get(idempotency_key=key)
+
+
+def claim(worker, limit):
+    """
+    Claim up to limit due jobs for a worker, the oldest first, and
+    return them.
+    """
+    now = timezone.now()
+    jobs = Job.objects.using(DEFAULT_DB_ALIAS)
+    due = (jobs.filter(status=Job.JobStatus.QUEUED, run_after__lte=now)
+           .order_by('run_after'))
+    lock = {'status': Job.JobStatus.RUNNING, 'locked_by': worker,
+            'locked_at': now}
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            claimed = list(due.select_for_update(skip_locked=True)[:limit])
+            jobs.filter(pk__in=[job.pk for job in claimed]).update(**lock)
+    else:
+        claimed = [
+            job for job in due[:limit]
+            if jobs.filter(pk=job.pk, status=Job.JobStatus.QUEUED)
+            .update(**lock)
+        ]
+    for job in claimed:
+        for field, value in lock.items():
+            setattr(job, field, value)
+    return claimed
+
+
+def backoff(attempts):
+    """
+    Give the delay before the next attempt of a job, in seconds: doubled
+    at every attempt, with a jitter spreading the retries.
+    """
+    delay = min(settings.JOB_BACKOFF_BASE * 2 ** (attempts - 1),
+                settings.JOB_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1)
+
+
+def run(job):
+    """
+    Run a claimed job and record its outcome: done, queued again after a
+    backoff, or failed past its max_attempts. The outcome is not
+    recorded if the lock of the job expired meanwhile. Return the
+    status of the job.
+    """
+    job.attempts += 1
+    function = TASKS.get(job.name)
+    start = time.perf_counter()
+    try:
+        if function is None:
+            raise LookupError(f"Tâche inconnue : {job.name}")
+        function(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        now = timezone.now()
+        if function is not None and job.attempts < job.max_attempts:
+            job.status = Job.JobStatus.QUEUED
+            job.run_after = now + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = Job.JobStatus.FAILED
+            job.time_finished = now
+        logger.warning("job %s %s, tentative %s/%s :\n%s", job.pk, job.name,
+                       job.attempts, job.max_attempts, job.last_error)
+    else:
+        job.status = Job.JobStatus.DONE
+        job.time_finished = timezone.now()
+        job.last_error = None
+        logger.info("job %s %s : %.3f s", job.pk, job.name,
+                    time.perf_counter() - start)
+
+    (Job.objects.using(DEFAULT_DB_ALIAS)
+     .filter(pk=job.pk, status=Job.JobStatus.RUNNING,
+             locked_by=job.locked_by)
+     .update(status=job.status, attempts=job.attempts,
+             run_after=job.run_after, last_error=job.last_error,
+             time_finished=job.time_finished, locked_by=None,
+             locked_at=None))
+    return job.status
+
+
+def renew_locks(worker, pks):
+    """
+    Renew the locks of the jobs a worker is running.
+    """
+    return (Job.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk__in=pks, status=Job.JobStatus.RUNNING,
+                    locked_by=worker)
+            .update(locked_at=timezone.now()))
+
+
+def requeue_expired():
+    """
+    Queue again the running jobs whose lock expired.
+    """
+    now = timezone.now()
+    deadline = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return (Job.objects.using(DEFAULT_DB_ALIAS)
+            .filter(status=Job.JobStatus.RUNNING, locked_at__lt=deadline)
+            .update(status=Job.JobStatus.QUEUED, run_after=now,
+                    locked_by=None, locked_at=None))
+
+
+def prune_done():
+    """
+    Delete the jobs done for more than settings.JOB_RETENTION seconds,
+    their idempotency keys can be queued again. The failed jobs are
+    kept for inspection.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_RETENTION)
+    return (Job.objects.using(DEFAULT_DB_ALIAS)
+            .filter(status=Job.JobStatus.DONE, time_finished__lt=deadline)
+            .delete()[0])
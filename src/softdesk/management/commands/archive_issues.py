@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk import archive
+
+
+class Command(BaseCommand):
+    help = ("Move the FINISHED issues created more than --older-than days "
+            "ago, and their comments, to the archive tables, in batches of "
+            "short transactions. With --restore or --restore-project, move "
+            "archived issues back instead.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int,
+                            default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Age of the archived issues, in days.")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Issues moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0.01,
+                            help="Seconds between two batches, left to "
+                                 "the other writers.")
+        parser.add_argument('--restore', type=int, nargs='+',
+                            metavar='ISSUE_ID',
+                            help="Restore archived issues by their ids.")
+        parser.add_argument('--restore-project', type=int,
+                            metavar='PROJECT_ID',
+                            help="Restore the archived issues of a "
+                                 "project.")
+
+    def handle(self, *args, **options):
+        if options['restore'] or options['restore_project']:
+            restored, conflicts = archive.restore_issues(
+                issue_ids=options['restore'],
+                project_id=options['restore_project'],
+                batch_size=options['batch_size']
+            )
+            if conflicts:
+                self.stderr.write(
+                    f"Issue(s) {', '.join(map(str, conflicts))} laissée(s) "
+                    f"archivée(s) : une issue de leur auteur dans leur "
+                    f"projet porte déjà leur titre."
+                )
+            if (options['restore']
+                    and restored + len(conflicts) < len(options['restore'])):
+                raise CommandError(
+                    f"{restored} issue(s) restaurée(s) sur "
+                    f"{len(options['restore'])}, {len(conflicts)} en "
+                    f"conflit, les autres ne sont pas archivées."
+                )
+            self.stdout.write(f"{restored} issue(s) restaurée(s).")
+            return
+        archived = archive.archive_finished_issues(
+            options['older_than'], options['batch_size'], options['pause'],
+            log=self.stdout.write
+        )
+        self.stdout.write(f"{archived} issue(s) archivée(s).")
@@ -0,0 +1,151 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from softdesk.models import Issue, Comment
+from softdesk.seeding import Seeder
+from softdesk.utils import utils
+
+
+SCHEMES = ('uuid4', 'uuid7')
+
+
+class Command(BaseCommand):
+    help = ("Measure the throughput of the inserts of comments into a "
+            "large table, their ids drawn at random (UUID version 4) or "
+            "ordered by time (UUID version 7), on a throwaway SQLite "
+            "database file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000,
+                            help="Comments already in the table when the "
+                                 "inserts are measured.")
+        parser.add_argument('--inserts', type=int, default=100000,
+                            help="Comments inserted and measured.")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Comments inserted per transaction.")
+        parser.add_argument('--schemes', default=','.join(SCHEMES))
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output',
+                            help="JSON file receiving the results.")
+
+    def handle(self, *args, **options):
+        schemes = options['schemes'].split(',')
+        if set(schemes) - set(SCHEMES):
+            raise CommandError(f"Schémas possibles : {', '.join(SCHEMES)}.")
+        if connection.vendor != 'sqlite':
+            raise CommandError("Ce benchmark attend une base SQLite.")
+
+        with tempfile.TemporaryDirectory() as directory:
+            # A file, not the in-memory test database: the table and its
+            # indexes outgrow the page cache as they would in production.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                directory, 'bench.sqlite3'
+            )
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with override_settings(
+                        DATABASE_SHARDS=[], DATABASE_REPLICAS=[],
+                        CACHES={'default': {'BACKEND': 'django.core.cache'
+                                            '.backends.dummy.DummyCache'}}):
+                    Seeder(random.Random(options['seed']), users=100,
+                           projects=20, contributors=400, issues=2000,
+                           comments=0, prefix='bench',
+                           log=lambda message: None).run()
+                    results = {scheme: self.run(scheme, options)
+                               for scheme in schemes}
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def run(self, scheme, options):
+        """
+        Fill the table with --rows comments of a scheme, then insert
+        --inserts more in transactions of --batch-size comments.
+        """
+        rng = random.Random(options['seed'])
+        make_id = self.id_factory(scheme, rng)
+        new_id = uuid.uuid4 if scheme == 'uuid4' else utils.uuid7
+        issues = list(Issue.objects.values_list('id', 'author_id'))
+        table = connection.ops.quote_name(Comment._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute('VACUUM')
+
+        self.stdout.write(f"{scheme} : {options['rows']} commentaires...")
+        rows = []
+        for _ in range(options['rows']):
+            issue_id, author_id = rng.choice(issues)
+            rows.append((make_id(), issue_id, author_id, 'Commentaire.',
+                         timezone.now()))
+            if len(rows) == 50000:
+                Seeder.insert(Comment, 'default', Seeder.comment_fields, rows)
+                rows.clear()
+        Seeder.insert(Comment, 'default', Seeder.comment_fields, rows)
+
+        timings = []
+        start = time.perf_counter()
+        for inserted in range(0, options['inserts'], options['batch_size']):
+            size = min(options['batch_size'], options['inserts'] - inserted)
+            comments = [
+                Comment(id=new_id(), issue_id=issue_id, author_id=author_id,
+                        content='Commentaire.')
+                for issue_id, author_id in rng.choices(issues, k=size)
+            ]
+            batch_start = time.perf_counter()
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+            timings.append((time.perf_counter() - batch_start) * 1000)
+        elapsed = time.perf_counter() - start
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA page_count')
+            pages = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            size = pages * cursor.fetchone()[0]
+
+        quantiles = statistics.quantiles(timings, n=100)
+        result = {
+            'rows_per_second': options['inserts'] / elapsed,
+            'batch_p50_ms': quantiles[49],
+            'batch_p99_ms': quantiles[98],
+            'database_bytes': size,
+        }
+        self.stdout.write(
+            f"{scheme} : {result['rows_per_second']:.0f} insertions/s, "
+            f"transaction p50 {result['batch_p50_ms']:.2f} ms, "
+            f"p99 {result['batch_p99_ms']:.2f} ms, "
+            f"base {size / 2 ** 20:.1f} Mio"
+        )
+        return result
+
+    @staticmethod
+    def id_factory(scheme, rng):
+        """
+        Give the id generator of the comments filling the table, the
+        random bits drawn from rng. Their version 7 ids are older than
+        those of the inserted comments, one per millisecond.
+        """
+        if scheme == 'uuid4':
+            return lambda: uuid.UUID(int=rng.getrandbits(128), version=4)
+        state = {'ms': time.time_ns() // 1_000_000 - 10 ** 9}
+
+        def uuid7():
+            state['ms'] += 1
+            return utils.make_uuid7(state['ms'], rng.getrandbits(12),
+                                    rng.getrandbits(62))
+        return uuid7
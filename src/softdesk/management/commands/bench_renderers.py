@@ -0,0 +1,77 @@
+import io
+import timeit
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from softdesk import sharding
+from softdesk.models import Issue
+from softdesk.parsers import MessagePackParser, ORJSONParser
+from softdesk.renderers import MessagePackRenderer, ORJSONRenderer
+from softdesk.serializers import IssueDetailSerializer
+
+
+class Command(BaseCommand):
+    help = ("Compare the time spent rendering and parsing a list of "
+            "IssueDetailSerializer payloads by the stock JSON renderer of "
+            "DRF, the orjson renderer and the MessagePack renderer.")
+
+    formats = (
+        ('json (DRF)', JSONRenderer(), JSONParser()),
+        ('orjson', ORJSONRenderer(), ORJSONParser()),
+        ('msgpack', MessagePackRenderer(), MessagePackParser()),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=100,
+                            help="Number of issues of the payload, the "
+                                 "issues of the database are repeated.")
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        data = self.get_payload(options['issues'])
+        iterations = options['iterations']
+
+        self.stdout.write(
+            f"{options['issues']} issues, {iterations} iterations\n"
+            f"{'format':<12}{'size':>10}{'render us':>12}{'parse us':>12}"
+            f"{'speedup':>10}"
+        )
+        baseline = None
+        for name, renderer, parser in self.formats:
+            content = renderer.render(data)
+            render = timeit.timeit(
+                lambda: renderer.render(data), number=iterations
+            ) / iterations * 1e6
+            parse = timeit.timeit(
+                lambda: parser.parse(io.BytesIO(content)), number=iterations
+            ) / iterations * 1e6
+            baseline = baseline or render
+            self.stdout.write(
+                f"{name:<12}{len(content):>10}{render:>12.1f}{parse:>12.1f}"
+                f"{baseline / render:>9.1f}x"
+            )
+
+    def get_payload(self, size):
+        """
+        Serialize the issues as the detailed view does (comments and
+        hyperlinks included).
+        """
+        issues = sharding.scatter_gather(
+            Issue.objects
+            .select_related('author', 'assigned_to', 'project')
+            .prefetch_related('comments__author')
+            .order_by('pk')
+        )
+        issues = list(islice(cycle(issues), size))
+        if not issues:
+            raise CommandError("No issue in the database.")
+
+        request = Request(APIRequestFactory().get('/'))
+        return IssueDetailSerializer(
+            issues, many=True, context={'request': request}
+        ).data
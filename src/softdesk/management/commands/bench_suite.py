@@ -0,0 +1,398 @@
+import json
+import platform
+import random
+import statistics
+import timeit
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from myauth.filters import UserFilter
+from myauth.permissions import IsAdminAuthenticated, IsOwner
+from myauth.views import UserViewSet
+from softdesk.filters import (
+    ProjectFilterSet, IssueFilterSet, AssignedIssueFilterSet,
+    ContributorFilterSet, CommentFilterSet
+)
+from softdesk.models import Project, Contributor, Issue, Comment
+from softdesk.permissions import (
+    IsResourceAuthor, IsProjectAuthor, IsProjectContributor,
+    IsUserContributor
+)
+from softdesk.seeding import Seeder
+from softdesk.serializers import (
+    ProjectListSerializer, IssueDetailSerializer, CommentListSerializer,
+    IssuePostSerializer
+)
+from softdesk.utils import utils
+from softdesk.views import (
+    ProjectViewSet, ContributorViewSet, IssueViewSet, CommentViewSet
+)
+
+
+User = get_user_model()
+
+# A map of the viewsets before its tuple keys are flattened.
+TUPLE_KEYS_MAP = {
+    'list': 'list',
+    'retrieve': 'retrieve',
+    ('create', 'update', 'partial_update'): 'write',
+    ('retrieve', 'snapshot'): 'read',
+    'destroy': 'destroy',
+}
+
+
+class Command(BaseCommand):
+    help = ("Run the microbenchmarks of the hot code paths (serializers, "
+            "permissions, filter sets, action dispatch) on a seeded "
+            "throwaway database, and store the results as JSON. "
+            "--compare BASE [NEW] flags the benchmarks slower than BASE "
+            "beyond --threshold.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output',
+                            help="JSON file receiving the results.")
+        parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                            help="Results of a previous run (BASE), "
+                                 "compared to a new run or to the "
+                                 "results of another file (NEW).")
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help="Relative slowdown of the median beyond "
+                                 "which a benchmark regressed.")
+        parser.add_argument('-k', '--select', default='',
+                            help="Only run the benchmarks whose name "
+                                 "contains this string.")
+        parser.add_argument('--page-sizes', default='10,50,100')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        compare = options['compare'] or []
+        if len(compare) > 2:
+            raise CommandError("--compare attend un ou deux fichiers.")
+        base = self.load(compare[0]) if compare else None
+
+        if len(compare) == 2:
+            results = self.load(compare[1])
+        else:
+            results = self.run(options)
+            if options['output']:
+                with open(options['output'], 'w') as file:
+                    json.dump(results, file, indent=2)
+                self.stdout.write(f"Résultats écrits dans "
+                                  f"{options['output']}.")
+
+        if base is not None:
+            regressions = self.compare(base, results, options['threshold'])
+            if regressions:
+                raise CommandError(f"{regressions} régression(s) au-delà "
+                                   f"de {options['threshold']:.0%}.")
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"{path} : {error}")
+
+    def run(self, options):
+        self.repeat = options['repeat']
+        page_sizes = [int(size) for size in options['page_sizes'].split(',')]
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            # The requests of APIRequestFactory are sent to 'testserver'.
+            with override_settings(
+                    ALLOWED_HOSTS=['testserver'],
+                    DATABASE_SHARDS=[], DATABASE_REPLICAS=[],
+                    CACHES={'default': {'BACKEND': 'django.core.cache'
+                                        '.backends.dummy.DummyCache'}}):
+                Seeder(random.Random(options['seed']), users=200,
+                       projects=200, contributors=1000, issues=2000,
+                       comments=20000, prefix='bench',
+                       log=lambda message: None).run()
+                self.setup(max(page_sizes))
+                benchmarks = [
+                    *self.serializer_benchmarks(page_sizes),
+                    *self.permission_benchmarks(),
+                    *self.filterset_benchmarks(),
+                    *self.dispatch_benchmarks(),
+                ]
+                results = {}
+                self.stdout.write(f"{'benchmark':<58}{'median us':>11}"
+                                  f"{'stdev':>9}{'queries':>9}")
+                for name, function in benchmarks:
+                    if options['select'] in name:
+                        results[name] = self.measure(function)
+                        self.stdout.write(
+                            f"{name:<58}{results[name]['median_us']:>11.2f}"
+                            f"{results[name]['stdev_us']:>9.2f}"
+                            f"{results[name]['queries']:>9}"
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        return {
+            'meta': {
+                'time': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.platform(),
+                'seed': options['seed'],
+                'repeat': self.repeat,
+            },
+            'results': results,
+        }
+
+    def measure(self, function):
+        """
+        Time a benchmark: the number of calls per run is calibrated to
+        last 0.2 s, and the runs are repeated. The queries of a call are
+        counted once the caches are warm.
+        """
+        function()
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        times = [total / number * 1e6
+                 for total in timer.repeat(repeat=self.repeat, number=number)]
+        return {
+            'median_us': statistics.median(times),
+            'min_us': min(times),
+            'mean_us': statistics.mean(times),
+            'stdev_us': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'loops': number,
+            'queries': len(queries),
+        }
+
+    def compare(self, base, new, threshold):
+        """
+        Print the ratio of the medians of the benchmarks run twice, and
+        return the number of regressions.
+        """
+        base, new = base['results'], new['results']
+        regressions = 0
+        self.stdout.write(f"{'benchmark':<58}{'base us':>11}{'new us':>11}"
+                          f"{'ratio':>8}")
+        for name in sorted(base.keys() & new.keys()):
+            ratio = new[name]['median_us'] / base[name]['median_us']
+            line = (f"{name:<58}{base[name]['median_us']:>11.2f}"
+                    f"{new[name]['median_us']:>11.2f}{ratio:>7.2f}x")
+            if ratio > 1 + threshold:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f"{line}  RÉGRESSION"))
+            elif ratio < 1 - threshold:
+                self.stdout.write(self.style.SUCCESS(f"{line}  gain"))
+            else:
+                self.stdout.write(line)
+            if new[name]['queries'] != base[name]['queries']:
+                regressions += new[name]['queries'] > base[name]['queries']
+                self.stdout.write(self.style.WARNING(
+                    f"{'':<58}{base[name]['queries']} -> "
+                    f"{new[name]['queries']} requêtes"
+                ))
+        for name in sorted(base.keys() ^ new.keys()):
+            self.stdout.write(f"{name:<58}"
+                              f"{'absent' if name in base else 'nouveau':>11}")
+        return regressions
+
+    def setup(self, size):
+        """
+        Pick the busiest project and issue of the dataset and a
+        contributor of the project, and load the pages serialized by
+        the benchmarks as the views read them.
+        """
+        self.project = (Project.objects.annotate(issues=Count('issue'))
+                        .order_by('-issues').first())
+        self.issue = (Issue.objects.filter(project=self.project)
+                      .annotate(total=Count('comments'))
+                      .order_by('-total').first())
+        self.user = (User.objects
+                     .filter(contributor__project=self.project)
+                     .exclude(pk=self.project.author_id).first())
+        self.request = Request(APIRequestFactory().get('/'))
+        self.request.user = self.user
+        self.contributors_id = set(
+            Contributor.objects.filter(project=self.project)
+            .values_list('user_id', flat=True)
+        )
+
+        self.projects = list(
+            self.make_view(ProjectViewSet, 'list').get_queryset()[:size]
+        )
+        self.issues = list(
+            self.make_view(IssueViewSet, 'retrieve').get_queryset()
+            .select_related('project').prefetch_related('comments__author')
+            [:size]
+        )
+        self.comments = list(
+            self.make_view(CommentViewSet, 'list').get_queryset()
+            .select_related('issue__project')[:size]
+        )
+
+    def make_view(self, viewset, action):
+        """
+        Instantiate a viewset as for a request of the contributor, the
+        project and its contributors already cached.
+        """
+        kwargs = {'project_pk': self.project.pk, 'issue_pk': self.issue.pk}
+        if viewset is ProjectViewSet:
+            kwargs = {'pk': self.project.pk}
+        elif viewset is UserViewSet:
+            kwargs = {'pk': self.user.pk}
+        view = viewset(request=self.request, action=action, kwargs=kwargs,
+                       args=(), format_kwarg=None,
+                       detail=action not in ('list', 'create'))
+        view._project_cache = self.project
+        view._project_contributors_id_cache = self.contributors_id
+        return view
+
+    def serializer_benchmarks(self, page_sizes):
+        context = {'request': self.request}
+        pages = (
+            (ProjectListSerializer, self.projects),
+            (IssueDetailSerializer, self.issues),
+            (CommentListSerializer, self.comments),
+        )
+        for serializer_class, rows in pages:
+            for size in page_sizes:
+                page = rows[:size]
+                yield (
+                    f'serializer.{serializer_class.__name__}[page={size}]',
+                    lambda serializer_class=serializer_class, page=page: (
+                        serializer_class(page, many=True,
+                                         context=context).data
+                    )
+                )
+
+        view = self.make_view(IssueViewSet, 'create')
+        yield (
+            'serializer.IssuePostSerializer.__init__',
+            lambda: IssuePostSerializer(
+                data={}, context={'request': self.request, 'view': view}
+            ).fields
+        )
+
+    def permission_benchmarks(self):
+        viewsets = (ProjectViewSet, ContributorViewSet, IssueViewSet,
+                    CommentViewSet, UserViewSet)
+        objects = {ProjectViewSet: self.project, IssueViewSet: self.issue,
+                   CommentViewSet: self.comments[0], UserViewSet: self.user,
+                   ContributorViewSet: Contributor.objects.filter(
+                       project=self.project, user=self.user).first()}
+        for viewset in viewsets:
+            for action in ('list', 'retrieve', 'destroy'):
+                view = self.make_view(viewset, action)
+                yield (f'permissions.{viewset.__name__}.{action}'
+                       f'.get_permissions', view.get_permissions)
+                yield (f'permissions.{viewset.__name__}.{action}.check',
+                       lambda view=view, obj=objects[viewset]: (
+                           self.check_permissions(view, obj)
+                       ))
+
+        view = self.make_view(IssueViewSet, 'destroy')
+        checks = (
+            (IsAdminAuthenticated, None),
+            (IsProjectContributor, None),
+            (IsProjectAuthor, None),
+            (IsProjectContributor | IsAdminAuthenticated, None),
+            (IsOwner, self.user),
+            (IsResourceAuthor, self.issue),
+            (IsUserContributor, objects[ContributorViewSet]),
+        )
+        for permission_class, obj in checks:
+            permission = permission_class()
+            name = getattr(permission_class, '__name__',
+                           'IsProjectContributor|IsAdminAuthenticated')
+            if obj is None:
+                function = (lambda permission=permission:
+                            permission.has_permission(self.request, view))
+            else:
+                function = (lambda permission=permission, obj=obj:
+                            permission.has_object_permission(
+                                self.request, view, obj))
+            yield f'permission.{name}', function
+
+    def check_permissions(self, view, obj):
+        """
+        Check the permissions as a detail view does, without raising.
+        """
+        allowed = True
+        for permission in view.get_permissions():
+            allowed &= permission.has_permission(self.request, view)
+            if view.detail:
+                allowed &= permission.has_object_permission(
+                    self.request, view, obj
+                )
+        return allowed
+
+    def filterset_benchmarks(self):
+        issue = self.issue
+        samples = (
+            (UserFilter, User.objects.all(), {
+                'user_id': self.user.pk, 'username': self.user.username,
+                'username_contains': 'user_00',
+            }),
+            (ProjectFilterSet, Project.objects.all(), {
+                'project_id': self.project.pk, 'title': self.project.title,
+                'title_contains': 'Projet', 'type': 'BACKEND',
+                'author_id': self.project.author_id, 'my_projects': 'true',
+            }),
+            (ContributorFilterSet, Contributor.objects.all(), {
+                'user_id': self.user.pk,
+            }),
+            (IssueFilterSet, Issue.objects.all(), {
+                'issue_id': issue.pk, 'title': issue.title,
+                'title_contains': 'Issue', 'author_id': issue.author_id,
+                'assigned_to': self.user.pk, 'priority': 'HIGH',
+                'type': 'BUG', 'status': 'IN_PROGRESS',
+                'ordering': '-priority', 'include_archived': 'true',
+            }),
+            (AssignedIssueFilterSet, Issue.objects.all(), {
+                'status': 'IN_PROGRESS', 'priority': 'HIGH',
+            }),
+            (CommentFilterSet, Comment.objects.all(), {
+                'author_id': self.user.pk,
+            }),
+        )
+        for filterset_class, queryset, params in samples:
+            missing = set(filterset_class.base_filters) - set(params)
+            if missing:
+                raise CommandError(
+                    f"{filterset_class.__name__} : aucune valeur d'exemple "
+                    f"pour {', '.join(sorted(missing))}."
+                )
+            for label, data in (('none', {}), ('all', params)):
+                yield (
+                    f'filterset.{filterset_class.__name__}[{label}]',
+                    lambda filterset_class=filterset_class,
+                    queryset=queryset, data=data: (
+                        filterset_class(data, queryset=queryset,
+                                        request=self.request)
+                        .qs.query.sql_with_params()
+                    )
+                )
+
+    def dispatch_benchmarks(self):
+        yield ('dispatch.flatten_tuple_of_keys',
+               lambda: utils.flatten_tuple_of_keys(TUPLE_KEYS_MAP))
+        actions = ('list', 'retrieve', 'create', 'update', 'partial_update',
+                   'destroy')
+        for viewset in (ProjectViewSet, IssueViewSet, CommentViewSet):
+            views = [self.make_view(viewset, action) for action in actions]
+            yield (
+                f'dispatch.{viewset.__name__}.get_serializer_class',
+                lambda views=views: [view.get_serializer_class()
+                                     for view in views]
+            )
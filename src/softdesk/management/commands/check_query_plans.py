@@ -0,0 +1,292 @@
+import random
+import re
+from itertools import combinations
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from softdesk.models import Project, Contributor, Issue, Comment
+
+
+User = get_user_model()
+
+# Filters whose plans are expected to scan: a substring search cannot
+# use an index, nor can a case-insensitive search (LIKE) with SQLite.
+SCANNING_FILTERS = {'username', 'username_contains', 'title',
+                    'title_contains'}
+
+# The filter hiding the soft deleted rows alone: nearly every row passes
+# it, a scan still stops at the end of the page.
+SOFT_DELETE_FILTER = re.compile(r' WHERE "\w+"\."deleted_at" IS NULL'
+                                r'(?= LIMIT| ORDER BY|\)|$)')
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway database, request every list endpoint with "
+            "every filter and every pair of filters, and check the "
+            "EXPLAIN QUERY PLAN of their queries: a full scan or a "
+            "temporary B-tree on a large table fails the check.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--projects', type=int, default=2000)
+        parser.add_argument('--issues', type=int, default=10,
+                            help="Number of issues per project.")
+        parser.add_argument('--comments', type=int, default=2,
+                            help="Number of comments per issue.")
+        parser.add_argument('--large', type=int, default=1000,
+                            help="Number of rows from which a table, or "
+                                 "a sort, is large. The project and the "
+                                 "issue whose lists are checked get as "
+                                 "many contributors, issues and "
+                                 "comments.")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the plan of every query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN est propre à SQLite.")
+        self.verbose_plans = options['verbose_plans']
+        self.large = options['large']
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            # No shard, no replica, and no cache hiding the counts. The
+            # test client sends its requests to the host 'testserver'.
+            with override_settings(
+                    ALLOWED_HOSTS=['testserver'],
+                    DATABASE_SHARDS=[], DATABASE_REPLICAS=[],
+                    CACHES={'default': {'BACKEND': 'django.core.cache'
+                                        '.backends.dummy.DummyCache'}}):
+                samples = self.seed(options)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                self.large_tables = self.get_large_tables()
+                failures = self.check_endpoints(samples)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError(f"{failures} requête(s) avec un plan "
+                               f"défavorable.")
+        self.stdout.write(self.style.SUCCESS("Aucun plan défavorable."))
+
+    def seed(self, options):
+        """
+        Create the users, projects, contributors, issues and comments,
+        and return the sample values of the filters.
+        """
+        rng = random.Random(10)
+        users = User.objects.bulk_create(
+            User(username=f'user_{index:05}', is_staff=index == 0,
+                 is_superuser=index == 0)
+            for index in range(options['users'])
+        )
+        projects = Project.objects.bulk_create(
+            Project(author=rng.choice(users), title=f'Projet {index}',
+                    type=rng.choice(Project.ProjectType.values))
+            for index in range(options['projects'])
+        )
+        Contributor.objects.bulk_create(
+            Contributor(user=user, project=project)
+            for project in projects
+            for user in {project.author, *rng.sample(users, 5)}
+        )
+        issues = Issue.objects.bulk_create(
+            Issue(project=project, author=rng.choice(users),
+                  assigned_to=rng.choice([None, *users]),
+                  title=f'Issue {index}',
+                  priority=rng.choice(Issue.IssuePriority.values),
+                  type=rng.choice(Issue.IssueType.values),
+                  status=rng.choice(Issue.IssueStatus.values))
+            for project in projects
+            for index in range(options['issues'])
+        )
+        Comment.objects.bulk_create(
+            Comment(issue=issue, author=rng.choice(users), content='...')
+            for issue in issues
+            for _ in range(options['comments'])
+        )
+
+        # A busy project and a busy issue, whose lists are checked.
+        project, issue, user = projects[0], issues[0], users[1]
+        busy = options['large']
+        Contributor.objects.bulk_create(
+            (Contributor(user=contributor, project=project)
+             for contributor in users[:busy]),
+            ignore_conflicts=True
+        )
+        # Assigned to the user checking the endpoints, their issues
+        # across the projects are a large list too.
+        Issue.objects.bulk_create(
+            Issue(project=project, author=rng.choice(users),
+                  assigned_to=users[0],
+                  title=f'Issue chargée {index}',
+                  priority=rng.choice(Issue.IssuePriority.values),
+                  status=rng.choice(Issue.IssueStatus.values))
+            for index in range(busy)
+        )
+        Comment.objects.bulk_create(
+            Comment(issue=issue, author=rng.choice(users), content='...')
+            for _ in range(busy)
+        )
+
+        return {
+            'admin': users[0],
+            'endpoints': [
+                (reverse('user-list'), {
+                    'user_id': user.pk,
+                    'username': user.username,
+                    'username_contains': 'user_0001',
+                }),
+                (reverse('project-list'), {
+                    'project_id': project.pk,
+                    'title': project.title,
+                    'title_contains': 'Projet 1',
+                    'type': 'BACKEND',
+                    'author_id': project.author_id,
+                    'my_projects': 'true',
+                }),
+                (reverse('project-contributor-list',
+                         kwargs={'project_pk': project.pk}), {
+                    'user_id': project.author_id,
+                }),
+                (reverse('project-issue-list',
+                         kwargs={'project_pk': project.pk}), {
+                    'issue_id': issue.pk,
+                    'title': issue.title,
+                    'title_contains': 'Issue 1',
+                    'author_id': issue.author_id,
+                    'assigned_to': user.pk,
+                    'priority': 'HIGH',
+                    'type': 'BUG',
+                    'status': 'IN_PROGRESS',
+                    'ordering': '-priority',
+                    'include_archived': 'true',
+                }),
+                (reverse('me-issue-list'), {
+                    'status': 'IN_PROGRESS',
+                    'priority': 'HIGH',
+                }),
+                (reverse('issue-comment-list',
+                         kwargs={'project_pk': project.pk,
+                                 'issue_pk': issue.pk}), {
+                    'author_id': issue.author_id,
+                }),
+            ],
+        }
+
+    def get_large_tables(self):
+        """
+        Give the large tables, their rows counted by ANALYZE.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tbl, MAX(CAST(stat AS INTEGER)) '
+                           'FROM sqlite_stat1 GROUP BY tbl')
+            return {table for table, rows in cursor.fetchall()
+                    if rows >= self.large}
+
+    def check_endpoints(self, samples):
+        client = Client()
+        client.force_login(samples['admin'])
+        failures = 0
+        for path, filters in samples['endpoints']:
+            names = list(filters)
+            self.check_filterset(path, client, names)
+            for size in (0, 1, 2):
+                for combination in combinations(names, size):
+                    params = {name: filters[name] for name in combination}
+                    failures += self.check_request(client, path, params)
+        return failures
+
+    def check_filterset(self, path, client, names):
+        """
+        Fail if a filter of the endpoint has no sample value.
+        """
+        response = client.get(path, {'limit': 1})
+        if response.status_code != 200:
+            raise CommandError(
+                f"{path} : statut {response.status_code}."
+            )
+        view = response.renderer_context['view']
+        filterset_class = view.filterset_class
+        missing = set(filterset_class.base_filters) - set(names)
+        if missing:
+            raise CommandError(
+                f"{path} : aucune valeur d'exemple pour "
+                f"{', '.join(sorted(missing))}."
+            )
+
+    def check_request(self, client, path, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path, params, HTTP_ACCEPT='application/json')
+        if response.status_code != 200:
+            raise CommandError(
+                f"{path} {params} : statut {response.status_code}."
+            )
+
+        expected_scan = bool(SCANNING_FILTERS & set(params))
+        failures = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'django_session' in sql:
+                continue
+            plan = self.explain(sql)
+            problems = self.get_problems(sql, plan)
+            if problems and not expected_scan:
+                failures += 1
+                self.stdout.write(self.style.ERROR(
+                    f"FAIL {path} {params}: {'; '.join(problems)}\n"
+                    f"     {sql}"
+                ))
+            elif self.verbose_plans:
+                self.stdout.write(f"{path} {params}\n     {sql}\n"
+                                  + '\n'.join(f"     {row}" for row in plan))
+        return failures
+
+    @staticmethod
+    def explain(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def get_problems(self, sql, plan):
+        """
+        Give the steps of a plan scanning a large table to filter it, or
+        sorting many rows of a large table with a temporary B-tree.
+        An unfiltered list reads its page (or its capped count) from the
+        start of the table, its scan is not a problem.
+        """
+        filtered = ' WHERE ' in SOFT_DELETE_FILTER.sub('', sql)
+        problems = []
+        read_large_table = False
+        for step in plan:
+            words = step.split()
+            if (words[0] in ('SCAN', 'SEARCH')
+                    and words[1] in self.large_tables):
+                read_large_table = True
+                if (words[0] == 'SCAN' and 'USING' not in words
+                        and filtered):
+                    problems.append(step)
+        sorts = [step for step in plan if 'TEMP B-TREE' in step]
+        if read_large_table and sorts:
+            rows = self.count_sorted_rows(sql)
+            if rows >= self.large:
+                problems += [f'{step} ({rows} rows)' for step in sorts]
+        return problems
+
+    @staticmethod
+    def count_sorted_rows(sql):
+        """
+        Count the rows of a query before its LIMIT, the rows it sorts.
+        """
+        sql = re.sub(r' LIMIT \d+( OFFSET \d+)?$', '', sql)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql})')
+            return cursor.fetchone()[0]
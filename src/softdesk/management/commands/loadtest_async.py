@@ -0,0 +1,113 @@
+import importlib.util
+import itertools
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk import sharding
+from softdesk.models import Project, Issue
+from softdesk.utils import loadtest
+
+
+class Command(BaseCommand):
+    help = ("Compare the requests/sec and latency of the read endpoints "
+            "served by uvicorn (ASGI, async views) and by a WSGI server "
+            "(gunicorn, or runserver if gunicorn is not installed).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10,
+                            help="Duration of each run, in seconds.")
+        parser.add_argument('--username', default='user_one')
+        parser.add_argument('--password', default='53CR37!U53R')
+        parser.add_argument('--project', type=int,
+                            help="Id of the project to read, defaults to "
+                                 "the first project of the user.")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("uvicorn is required: pip install uvicorn")
+
+        paths = self.get_paths(options)
+        servers = {
+            'ASGI (uvicorn)': (
+                [sys.executable, '-m', 'uvicorn',
+                 'OC_projet_10.asgi:application', '--log-level', 'warning',
+                 '--no-access-log', '--port'],
+                '1'
+            ),
+            'WSGI': (self.wsgi_command(options['concurrency']), '0'),
+        }
+        self.stdout.write(
+            f"{'server':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+            f"{'errors':>8}"
+        )
+        for name, (command, async_reads) in servers.items():
+            port = loadtest.free_port()
+            env = {**os.environ, 'ASYNC_READ_VIEWS': async_reads}
+            process = loadtest.start_server(
+                command + [str(port)], port, settings.BASE_DIR, env
+            )
+            try:
+                token = loadtest.obtain_token(
+                    port, options['username'], options['password']
+                )
+                path_cycle = itertools.cycle(paths)
+
+                def workload(connection, record):
+                    path = next(path_cycle)
+                    loadtest.timed_request(
+                        connection, record, path, 'GET', path, token
+                    )
+
+                result = loadtest.run_load(
+                    port, workload, options['concurrency'],
+                    options['duration']
+                )
+            finally:
+                loadtest.stop_server(process)
+            summary = result.summary()
+            self.stdout.write(
+                f"{name:<16}{summary['rps']:>10.1f}{summary['p50']:>10.1f}"
+                f"{summary['p99']:>10.1f}{summary['errors']:>8}"
+            )
+
+    def wsgi_command(self, concurrency):
+        if importlib.util.find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn',
+                    'OC_projet_10.wsgi:application',
+                    '--threads', str(concurrency), '--bind']
+        return [sys.executable, 'manage.py', 'runserver', '--noreload',
+                '--skip-checks']
+
+    def get_paths(self, options):
+        projects = Project.objects.filter(
+            author__username=options['username']
+        )
+        if options['project']:
+            projects = Project.objects.filter(pk=options['project'])
+        project = projects.order_by('pk').first()
+        if project is None:
+            raise CommandError("No project to read.")
+
+        token = sharding.set_current_project(project.pk)
+        try:
+            issue = (Issue.objects.filter(project=project)
+                     .order_by('pk').first())
+        finally:
+            sharding.reset_current_project(token)
+
+        paths = [
+            '/api/v1/projects/',
+            f'/api/v1/projects/{project.pk}/',
+            f'/api/v1/projects/{project.pk}/contributors/',
+            f'/api/v1/projects/{project.pk}/issues/',
+        ]
+        if issue is not None:
+            paths += [
+                f'/api/v1/projects/{project.pk}/issues/{issue.pk}/',
+                f'/api/v1/projects/{project.pk}/issues/{issue.pk}/comments/',
+            ]
+        return paths
@@ -0,0 +1,303 @@
+import base64
+import http.client
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk.seeding import SEED_PASSWORD
+from softdesk.utils import loadtest
+from softdesk.utils.sqlite import copy_database
+
+
+SCENARIOS = ('browse', 'issues', 'comment', 'triage')
+
+
+class VirtualUser:
+    """
+    A user of the load test: their token, and the projects and issues
+    they can read, comment or triage, discovered through the API.
+    """
+    def __init__(self, username, token, rng):
+        self.username = username
+        self.token = token
+        self.rng = rng
+        self.id = json.loads(base64.urlsafe_b64decode(
+            token.split('.')[1] + '=='
+        ))['user_id']
+        self.projects = []
+        self.issues = []
+        self.own_issues = []
+
+    def discover(self, port, projects=5):
+        connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                timeout=30)
+        try:
+            self.projects = [
+                project['id'] for project in self.get(
+                    connection, '/api/v1/projects/?my_projects=true&limit=50'
+                )
+            ][:projects]
+            for project_id in self.projects:
+                path = f'/api/v1/projects/{project_id}/issues/?limit=50'
+                self.issues += [(project_id, issue['id']) for issue
+                                in self.get(connection, path)]
+                self.own_issues += [
+                    (project_id, issue['id']) for issue in self.get(
+                        connection, f'{path}&author_id={self.id}'
+                    )
+                ]
+        finally:
+            connection.close()
+
+    def get(self, connection, path):
+        status, body = loadtest.request(connection, 'GET', path, self.token)
+        if status != 200:
+            raise RuntimeError(f"GET {path}: {status}")
+        return json.loads(body)['results']
+
+
+class Command(BaseCommand):
+    help = ("Start the API under a local server on a throwaway database, "
+            "authenticate virtual users through api/v1/token/ and replay "
+            "a mixed workload (browse projects, page issues, post "
+            "comments, triage statuses). Report the throughput and the "
+            "p50/p95/p99 latencies per endpoint.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+                            help="Number of virtual users, one thread "
+                                 "each.")
+        parser.add_argument('--duration', type=float, default=30,
+                            help="Duration of the load, in seconds.")
+        parser.add_argument('--mix', default='browse=40,issues=35,'
+                                             'comment=15,triage=10',
+                            help="Weights of the scenarios.")
+        parser.add_argument('--server', choices=['wsgi', 'asgi'],
+                            default='wsgi',
+                            help="gunicorn (runserver if it is not "
+                                 "installed) or uvicorn.")
+        parser.add_argument('--workers', type=int, default=2,
+                            help="Worker processes of gunicorn and "
+                                 "uvicorn.")
+        parser.add_argument('--database',
+                            help="SQLite database to copy and load, "
+                                 "instead of a seeded one. Its users "
+                                 "must be named as by seed_softdesk.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--seed-options',
+                            default='--users 200 --projects 100 '
+                                    '--contributors 1500 --issues 5000 '
+                                    '--comments 50000',
+                            help="Options of seed_softdesk.")
+        parser.add_argument('--output',
+                            help="JSON file receiving the report.")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'loadtest.sqlite3')
+            # A database of its own, without replica nor shard.
+            env = {**os.environ, 'DATABASE_NAME': database,
+                   'DATABASE_REPLICAS': '', 'DATABASE_SHARDS': '',
+                   'ASYNC_READ_VIEWS': str(int(options['server'] == 'asgi'))}
+            self.prepare_database(database, env, options)
+
+            port = loadtest.free_port()
+            process = loadtest.start_server(
+                self.server_command(options) + [str(port)], port,
+                settings.BASE_DIR, env
+            )
+            try:
+                users = self.login(port, options)
+                self.stdout.write(f"{len(users)} utilisateurs virtuels, "
+                                  f"{options['duration']:.0f} s de charge...")
+                result = loadtest.run_load(
+                    port, self.make_workload(users, mix), len(users),
+                    options['duration']
+                )
+                # The measures of a server that died under the load
+                # would only be its connection errors.
+                if process.poll() is not None:
+                    raise CommandError(
+                        f"Le serveur s'est arrêté pendant la charge : "
+                        f"{loadtest.server_output(process)}"
+                    )
+            finally:
+                loadtest.stop_server(process)
+
+        report = self.report(result)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+    @staticmethod
+    def parse_mix(value):
+        try:
+            mix = {name: float(weight) for name, weight in
+                   (item.split('=') for item in value.split(','))}
+        except ValueError:
+            raise CommandError("--mix attend nom=poids,nom=poids...")
+        unknown = set(mix) - set(SCENARIOS)
+        if unknown or not any(mix.values()):
+            raise CommandError(f"Scénarios possibles : "
+                               f"{', '.join(SCENARIOS)}.")
+        return mix
+
+    def prepare_database(self, database, env, options):
+        if options['database']:
+            copy_database(options['database'], database)
+            commands = [['migrate', '-v0']]
+        else:
+            commands = [
+                ['migrate', '-v0'],
+                ['seed_softdesk', '--seed', str(options['seed']),
+                 *options['seed_options'].split()],
+            ]
+        for command in commands:
+            self.stdout.write(f"manage.py {' '.join(command)}")
+            completed = subprocess.run(
+                [sys.executable, 'manage.py', *command],
+                cwd=settings.BASE_DIR, env=env, capture_output=True,
+                text=True
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr)
+
+    @staticmethod
+    def server_command(options):
+        workers = str(options['workers'])
+        if options['server'] == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError("uvicorn est requis : pip install "
+                                   "uvicorn")
+            return [sys.executable, '-m', 'uvicorn',
+                    'OC_projet_10.asgi:application', '--log-level',
+                    'warning', '--no-access-log', '--workers', workers,
+                    '--port']
+        if importlib.util.find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn',
+                    'OC_projet_10.wsgi:application', '--workers', workers,
+                    '--threads', '8', '--bind']
+        return [sys.executable, 'manage.py', 'runserver', '--noreload',
+                '--skip-checks']
+
+    def login(self, port, options):
+        """
+        Authenticate the virtual users and discover their projects and
+        issues, in parallel.
+        """
+        def login_user(index):
+            username = f'seed_user_{index:07}'
+            user = VirtualUser(
+                username,
+                loadtest.obtain_token(port, username, SEED_PASSWORD),
+                random.Random(options['seed'] + index)
+            )
+            user.discover(port)
+            return user
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            try:
+                return list(executor.map(login_user,
+                                         range(options['users'])))
+            except RuntimeError as error:
+                raise CommandError(str(error))
+
+    @staticmethod
+    def make_workload(users, mix):
+        """
+        Give the workload of loadtest.run_load: each thread plays one
+        virtual user, picking a scenario by its weight at every turn.
+        """
+        local = threading.local()
+        available = iter(users)
+        lock = threading.Lock()
+        names, weights = list(mix), list(mix.values())
+
+        def browse(user, connection, record):
+            loadtest.timed_request(connection, record, 'GET /projects/',
+                                   'GET', '/api/v1/projects/', user.token)
+            if user.projects:
+                project_id = user.rng.choice(user.projects)
+                loadtest.timed_request(
+                    connection, record, 'GET /projects/{id}/', 'GET',
+                    f'/api/v1/projects/{project_id}/', user.token
+                )
+
+        def issues(user, connection, record):
+            if not user.issues:
+                return browse(user, connection, record)
+            project_id, issue_id = user.rng.choice(user.issues)
+            offset = user.rng.choice((0, 0, 0, 20, 40))
+            loadtest.timed_request(
+                connection, record, 'GET /projects/{id}/issues/', 'GET',
+                f'/api/v1/projects/{project_id}/issues/'
+                f'?limit=20&offset={offset}', user.token
+            )
+            loadtest.timed_request(
+                connection, record, 'GET /projects/{id}/issues/{id}/', 'GET',
+                f'/api/v1/projects/{project_id}/issues/{issue_id}/',
+                user.token
+            )
+
+        def comment(user, connection, record):
+            if not user.issues:
+                return browse(user, connection, record)
+            project_id, issue_id = user.rng.choice(user.issues)
+            loadtest.timed_request(
+                connection, record,
+                'POST /projects/{id}/issues/{id}/comments/', 'POST',
+                f'/api/v1/projects/{project_id}/issues/{issue_id}/comments/',
+                user.token, {'content': 'Commentaire de charge.'}
+            )
+
+        def triage(user, connection, record):
+            if not user.own_issues:
+                return issues(user, connection, record)
+            project_id, issue_id = user.rng.choice(user.own_issues)
+            loadtest.timed_request(
+                connection, record, 'PATCH /projects/{id}/issues/{id}/',
+                'PATCH', f'/api/v1/projects/{project_id}/issues/{issue_id}/',
+                user.token,
+                {'status': user.rng.choice(['TO_DO', 'IN_PROGRESS',
+                                            'FINISHED'])}
+            )
+
+        scenarios = {'browse': browse, 'issues': issues, 'comment': comment,
+                     'triage': triage}
+
+        def workload(connection, record):
+            if not hasattr(local, 'user'):
+                with lock:
+                    local.user = next(available)
+            user = local.user
+            name = user.rng.choices(names, weights)[0]
+            scenarios[name](user, connection, record)
+
+        return workload
+
+    def report(self, result):
+        self.stdout.write(
+            f"{'endpoint':<44}{'requests':>9}{'req/s':>9}{'errors':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        report = {}
+        for endpoint in [*sorted(result.latencies), None]:
+            summary = result.summary(endpoint)
+            name = endpoint or 'total'
+            report[name] = summary
+            self.stdout.write(
+                f"{name:<44}{summary['requests']:>9}{summary['rps']:>9.1f}"
+                f"{summary['errors']:>8}{summary['p50']:>9.1f}"
+                f"{summary['p95']:>9.1f}{summary['p99']:>9.1f}"
+            )
+        return report
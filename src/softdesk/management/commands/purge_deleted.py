@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from softdesk import purge
+
+
+class Command(BaseCommand):
+    help = ("Purge the projects and the users deleted through the API "
+            "(settings.SOFT_DELETE) with their contributors, issues and "
+            "comments, in batches of short transactions. Their purges are "
+            "queued to softdesk_worker, this command purges what is "
+            "left.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.01,
+                            help="Seconds between two batches, left to "
+                                 "the other writers.")
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep purging, looking for deleted "
+                                 "objects every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            purge.purge_deleted(options['batch_size'], options['pause'],
+                                log=self.stdout.write)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
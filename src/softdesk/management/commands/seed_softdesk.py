@@ -0,0 +1,86 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk.seeding import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with a synthetic dataset: users, projects "
+            "of skewed sizes (a few mega-projects), contributors, issues "
+            "with a realistic mix of statuses, and a long tail of "
+            "comments. The same --seed gives the same dataset. The users "
+            f"are named <prefix>_user_<n>, their password is {SEED_PASSWORD}.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--contributors', type=int, default=5000,
+                            help="Total number of contributors, at least "
+                                 "one (the author) per project.")
+        parser.add_argument('--issues', type=int, default=20000,
+                            help="Total number of issues.")
+        parser.add_argument('--comments', type=int, default=200000,
+                            help="Total number of comments.")
+        parser.add_argument('--skew', type=float, default=1.2,
+                            help="Shape of the Pareto distributions of the "
+                                 "sizes: the lower, the bigger the "
+                                 "mega-projects and the busiest issues.")
+        parser.add_argument('--status-mix', default='30,20,50',
+                            help="Weights of the TO_DO, IN_PROGRESS and "
+                                 "FINISHED statuses.")
+        parser.add_argument('--days', type=int, default=365,
+                            help="Number of days the creation dates are "
+                                 "spread over, from 2024-01-01.")
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help="Number of rows per bulk_create.")
+        parser.add_argument('--prefix', default='seed',
+                            help="Prefix of the usernames.")
+
+    def handle(self, *args, **options):
+        try:
+            status_mix = [float(weight)
+                          for weight in options['status_mix'].split(',')]
+        except ValueError:
+            status_mix = []
+        if len(status_mix) != 3 or sum(status_mix) <= 0:
+            raise CommandError("--status-mix attend trois poids, "
+                               "ex. 30,20,50.")
+        sizes = ('users', 'projects', 'contributors', 'issues', 'comments')
+        negative = [size for size in sizes if options[size] < 0]
+        if negative:
+            raise CommandError(f"--{negative[0]} ne peut pas être négatif.")
+        if options['projects'] and not options['users']:
+            raise CommandError("Les projets ont besoin d'utilisateurs.")
+        if not options['projects'] and (options['contributors']
+                                        or options['issues']):
+            raise CommandError("Les contributeurs et les issues ont besoin "
+                               "de projets, passez --contributors 0 "
+                               "--issues 0.")
+        if not options['issues'] and options['comments']:
+            raise CommandError("Les commentaires ont besoin d'issues, "
+                               "passez --comments 0.")
+        if get_user_model().objects.filter(
+                username__startswith=f"{options['prefix']}_user_").exists():
+            raise CommandError(f"La base contient déjà des utilisateurs "
+                               f"{options['prefix']}_user_*, choisissez un "
+                               f"autre --prefix.")
+
+        seeder = Seeder(
+            random.Random(options['seed']),
+            users=options['users'],
+            projects=options['projects'],
+            contributors=options['contributors'],
+            issues=options['issues'],
+            comments=options['comments'],
+            skew=options['skew'],
+            status_mix=status_mix,
+            days=options['days'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            log=self.stdout.write,
+        )
+        seeder.run()
+        self.stdout.write(self.style.SUCCESS("Jeu de données créé."))
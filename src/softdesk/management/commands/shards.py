@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from softdesk import sharding
+from softdesk.models import Project, ProjectShard
+
+
+class Command(BaseCommand):
+    help = ("Manage the shards of the project data. 'sync' copies the users "
+            "and projects into the shards (run it after migrating a new "
+            "shard), 'status' counts the projects of each shard and 'move' "
+            "moves a project to another shard.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['sync', 'status', 'move'],
+        )
+        parser.add_argument(
+            'project_id',
+            nargs='?',
+            type=int,
+            help="Id of the project to move.",
+        )
+        parser.add_argument(
+            'target',
+            nargs='?',
+            help="Alias of the shard receiving the project.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_SHARDS:
+            raise CommandError(
+                "No shard configured, set DATABASE_SHARDS in the .env."
+            )
+        getattr(self, f"handle_{options['action']}")(**options)
+
+    def handle_sync(self, **options):
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS).all()
+        for alias in settings.DATABASE_SHARDS:
+            sharding.seed_id_sequences(alias)
+            for user in users.iterator():
+                sharding.mirror(user, [alias])
+            projects = Project.objects.using(DEFAULT_DB_ALIAS).filter(
+                projectshard__alias=alias
+            )
+            for project in projects.iterator():
+                sharding.mirror(project, [alias])
+            self.stdout.write(f"Shard '{alias}' synchronized.")
+
+    def handle_status(self, **options):
+        counts = dict(
+            ProjectShard.objects.using(DEFAULT_DB_ALIAS)
+            .values_list('alias')
+            .annotate(total=Count('project'))
+        )
+        total = Project.objects.using(DEFAULT_DB_ALIAS).count()
+        counts[DEFAULT_DB_ALIAS] = (
+            total - sum(counts.values()) + counts.get(DEFAULT_DB_ALIAS, 0)
+        )
+        for alias in sharding.shard_aliases():
+            self.stdout.write(f"{alias}: {counts.get(alias, 0)} project(s)")
+
+    def handle_move(self, project_id=None, target=None, **options):
+        if project_id is None or target is None:
+            raise CommandError("Usage: shards move <project_id> <target>")
+        if target not in sharding.shard_aliases():
+            raise CommandError(f"Unknown shard '{target}'.")
+        try:
+            source = sharding.move_project(project_id, target)
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {project_id} does not exist.")
+        self.stdout.write(
+            f"Project {project_id} moved from '{source}' to '{target}'."
+        )
@@ -0,0 +1,88 @@
+import json
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk.slow_queries import get_shape, read_log
+
+
+class Command(BaseCommand):
+    help = ("Aggregate the slow query log by SQL shape: number of runs, "
+            "total, mean, 95th percentile and maximum durations, and the "
+            "lines of code running them.")
+
+    sort_keys = ('total_ms', 'count', 'mean_ms', 'p95_ms', 'max_ms')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file',
+                            help="Slow query log to read, "
+                                 "settings.SLOW_QUERY_LOG by default.")
+        parser.add_argument('--top', type=int, default=10,
+                            help="Number of shapes to show.")
+        parser.add_argument('--sort', choices=self.sort_keys,
+                            default='total_ms')
+        parser.add_argument('--json', action='store_true',
+                            help="Print the aggregates in JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            aggregates = self.aggregate(read_log(options['file']))
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Journal illisible : {error}")
+        aggregates.sort(key=lambda item: item[options['sort']], reverse=True)
+        aggregates = aggregates[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(aggregates, indent=2))
+            return
+        if not aggregates:
+            self.stdout.write("Aucune requête lente.")
+            return
+        for item in aggregates:
+            self.stdout.write(self.style.SQL_KEYWORD(item['shape']))
+            self.stdout.write(
+                f"  {item['count']} exécutions, "
+                f"total {item['total_ms']:.1f} ms, "
+                f"moyenne {item['mean_ms']:.1f} ms, "
+                f"p95 {item['p95_ms']:.1f} ms, "
+                f"max {item['max_ms']:.1f} ms "
+                f"({', '.join(item['databases'])})"
+            )
+            for origin, runs in item['origins']:
+                self.stdout.write(f"  {runs:>5} × {origin}")
+            for step in item['plan'] or []:
+                self.stdout.write(f"        {step}")
+
+    @staticmethod
+    def aggregate(records):
+        shapes = defaultdict(lambda: {
+            'durations': [], 'databases': set(), 'origins': Counter(),
+            'plan': None,
+        })
+        for record in records:
+            shape = shapes[get_shape(record['sql'])]
+            shape['durations'].append(record['duration_ms'])
+            shape['databases'].add(record['database'])
+            origin = record['origin']
+            shape['origins'][
+                f"{origin['function']} ({origin['file']}:{origin['line']})"
+                if origin else '?'
+            ] += 1
+            shape['plan'] = record['plan'] or shape['plan']
+
+        aggregates = []
+        for sql, shape in shapes.items():
+            durations = sorted(shape['durations'])
+            total = sum(durations)
+            aggregates.append({
+                'shape': sql,
+                'count': len(durations),
+                'total_ms': round(total, 3),
+                'mean_ms': round(total / len(durations), 3),
+                'p95_ms': durations[int(0.95 * (len(durations) - 1))],
+                'max_ms': durations[-1],
+                'databases': sorted(shape['databases']),
+                'origins': shape['origins'].most_common(3),
+                'plan': shape['plan'],
+            })
+        return aggregates
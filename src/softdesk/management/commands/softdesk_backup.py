@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from softdesk import backup, sharding
+
+
+class Command(BaseCommand):
+    help = ("Back up the SQLite databases (the global one and the shards) "
+            "into a new directory with the online backup API of SQLite, "
+            "a few pages at a time while the API keeps serving. The "
+            "copies can be compressed, a manifest gives their SHA-256.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output',
+                            help="Directory of the backup, by default "
+                                 "backups/<date> next to manage.py.")
+        parser.add_argument('--database', action='append',
+                            choices=sharding.shard_aliases(),
+                            help="Database to back up, all by default. "
+                                 "Can be repeated.")
+        parser.add_argument('--compress', choices=list(backup.COMPRESSIONS),
+                            default='none')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help="Pages copied per step, -1 to copy the "
+                                 "database in one step.")
+        parser.add_argument('--sleep', type=float, default=0.01,
+                            help="Seconds between two steps, left to the "
+                                 "writers.")
+
+    def handle(self, *args, **options):
+        output = options['output'] or (
+            settings.BASE_DIR / 'backups'
+            / timezone.now().strftime('%Y%m%dT%H%M%S')
+        )
+        try:
+            backup.backup(output, options['database'], options['compress'],
+                          options['pages'], options['sleep'],
+                          log=self.stdout.write)
+        except (ValueError, FileExistsError) as error:
+            raise CommandError(str(error))
+        self.stdout.write(f"Sauvegarde : {output}")
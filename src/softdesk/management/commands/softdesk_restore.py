@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from softdesk import backup, sharding
+
+
+class Command(BaseCommand):
+    help = ("Restore a backup of softdesk_backup over the SQLite databases, "
+            "or over the test databases with --test, after checking the "
+            "checksums of its manifest.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory of the backup.")
+        parser.add_argument('--database', action='append',
+                            choices=sharding.shard_aliases(),
+                            help="Database to restore, all those of the "
+                                 "backup by default. Can be repeated.")
+        parser.add_argument('--test', action='store_true',
+                            help="Restore over the test databases, which "
+                                 "must be files (DATABASE_TEST_NAME), to "
+                                 "run the tests with --keepdb.")
+        parser.add_argument('--pages', type=int, default=1024,
+                            help="Pages copied per step, -1 to copy the "
+                                 "database in one step.")
+        parser.add_argument('--sleep', type=float, default=0.01,
+                            help="Seconds between two steps, left to the "
+                                 "readers.")
+        parser.add_argument('--noinput', '--no-input', action='store_false',
+                            dest='interactive',
+                            help="Do not ask for a confirmation.")
+
+    def handle(self, *args, **options):
+        try:
+            manifest = backup.read_manifest(options['directory'])
+        except FileNotFoundError as error:
+            raise CommandError(str(error))
+        aliases = options['database'] or [
+            alias for alias in manifest['databases']
+            if alias in sharding.shard_aliases()
+        ]
+
+        targets = {}
+        for alias in aliases:
+            connection = connections[alias]
+            if not options['test']:
+                targets[alias] = connection.settings_dict['NAME']
+                continue
+            name = connection.creation._get_test_db_name()
+            if connection.creation.is_in_memory_db(name):
+                raise CommandError(
+                    f"La base de test de {alias} est en mémoire, donnez-lui "
+                    f"un fichier (DATABASE_TEST_NAME dans le .env)."
+                )
+            targets[alias] = name
+
+        if options['interactive'] and not options['test']:
+            answer = input(
+                f"Les bases {', '.join(targets)} vont être remplacées par la "
+                f"sauvegarde du {manifest['created']}.\n"
+                f"Tapez 'yes' pour continuer : "
+            )
+            if answer != 'yes':
+                raise CommandError("Restauration annulée.")
+
+        connections.close_all()
+        try:
+            backup.restore(options['directory'], targets, options['pages'],
+                           options['sleep'], log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(str(error))
@@ -0,0 +1,82 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from softdesk import jobs
+
+
+class Command(BaseCommand):
+    help = ("Run the jobs of the in-database queue (see softdesk/jobs.py) "
+            "with a pool of threads, until SIGINT or SIGTERM. The running "
+            "jobs are finished before the worker stops.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4,
+                            help="Jobs run at the same time.")
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOB_POLL_INTERVAL,
+                            help="Seconds between two looks for due jobs "
+                                 "while the worker is idle.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Stop once no job is due.")
+
+    def handle(self, *args, **options):
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: self.stopping.set())
+
+        threads = options['threads']
+        running = {}
+        maintained = 0
+        self.stdout.write(f"Worker {self.worker}, {threads} threads.")
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            while not self.stopping.is_set():
+                for future in [future for future in running
+                               if future.done()]:
+                    del running[future]
+                try:
+                    # A third of the lock timeout: the locks are renewed
+                    # well before they expire.
+                    if (time.monotonic() - maintained
+                            > settings.JOB_LOCK_TIMEOUT / 3):
+                        self.maintain(running.values())
+                        maintained = time.monotonic()
+                    claimed = jobs.claim(self.worker, threads - len(running))
+                except OperationalError as error:
+                    # The database is locked by a long write, try again.
+                    self.stderr.write(str(error))
+                    claimed = []
+                for job in claimed:
+                    running[executor.submit(self.run, job)] = job
+                if not claimed:
+                    if options['burst'] and not running:
+                        break
+                    self.stopping.wait(options['poll_interval'])
+            self.stdout.write(f"Arrêt, {len(running)} job(s) à terminer.")
+
+    def maintain(self, running):
+        jobs.renew_locks(self.worker, [job.pk for job in running])
+        requeued = jobs.requeue_expired()
+        if requeued:
+            self.stdout.write(f"{requeued} job(s) expiré(s) remis en file.")
+        jobs.prune_done()
+
+    def run(self, job):
+        start = time.perf_counter()
+        try:
+            status = jobs.run(job)
+        finally:
+            # The connections of the threads of the pool are their own.
+            connections.close_all()
+        self.stdout.write(
+            f"job {job.pk} {job.name} : {job.JobStatus(status).name} "
+            f"({time.perf_counter() - start:.3f} s)"
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from softdesk.utils.sqlite import copy_database
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into the files of the read "
+            "replicas declared in settings.DATABASE_REPLICAS.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help="Keep refreshing the replicas every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                "No replica configured, set DATABASE_REPLICAS in the .env."
+            )
+        source = settings.DATABASES['default']['NAME']
+
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+                self.stdout.write(f"Replica '{alias}' synchronized.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('softdesk', '0007_rename_to_user_issue_assigned_to'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectShard',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='softdesk.project')),
+                ('alias', models.CharField(max_length=100)),
+            ],
+        ),
+    ]
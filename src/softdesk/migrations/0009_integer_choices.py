@@ -0,0 +1,87 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+# Codes of the choices when this migration was written.
+CHOICES = {
+    ('project', 'type'): {
+        'BACKEND': 1, 'FRONTEND': 2, 'IOS': 3, 'ANDROID': 4,
+    },
+    ('issue', 'priority'): {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3},
+    ('issue', 'type'): {'BUG': 1, 'FEATURE': 2, 'TASK': 3},
+    ('issue', 'status'): {'TO_DO': 1, 'IN_PROGRESS': 2, 'FINISHED': 3},
+}
+
+# Codes given to the empty or unknown names (the type of a project has
+# always been required).
+FALLBACKS = {
+    ('issue', 'priority'): None,
+    ('issue', 'type'): None,
+    ('issue', 'status'): '1',
+}
+
+
+def encode_choices(apps, schema_editor):
+    """
+    Replace the names of the choices by their codes, still as text: the
+    columns are converted to integers by the AlterField operations.
+    """
+    db = schema_editor.connection.alias
+    for (model_name, field), codes in CHOICES.items():
+        model = apps.get_model('softdesk', model_name)
+        rows = model.objects.using(db)
+        for name, code in codes.items():
+            rows.filter(**{field: name}).update(**{field: str(code)})
+        if (model_name, field) in FALLBACKS:
+            known = [str(code) for code in codes.values()]
+            (rows.exclude(**{f'{field}__in': known})
+             .update(**{field: FALLBACKS[model_name, field]}))
+
+
+def decode_choices(apps, schema_editor):
+    db = schema_editor.connection.alias
+    for (model_name, field), codes in CHOICES.items():
+        model = apps.get_model('softdesk', model_name)
+        rows = model.objects.using(db)
+        for name, code in codes.items():
+            rows.filter(**{field: str(code)}).update(**{field: name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('softdesk', '0008_projectshard'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_choices, decode_choices),
+        migrations.AlterField(
+            model_name='issue',
+            name='priority',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], null=True),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'To Do'), (2, 'In Progress'), (3, 'Finished')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='type',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Bug'), (2, 'Feature'), (3, 'Task')], null=True),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Back-end'), (2, 'Front-end'), (3, 'iOS'), (4, 'Android')]),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'priority', 'id'], name='issue_project_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'status', 'id'], name='issue_project_status_idx'),
+        ),
+    ]
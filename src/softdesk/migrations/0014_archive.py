@@ -0,0 +1,82 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('softdesk', '0013_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentRecord',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('time_created', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'softdesk_commentrecord',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='IssueRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(null=True)),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], null=True)),
+                ('type', models.PositiveSmallIntegerField(choices=[(1, 'Bug'), (2, 'Feature'), (3, 'Task')], null=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'To Do'), (2, 'In Progress'), (3, 'Finished')])),
+                ('time_created', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'softdesk_issuerecord',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssue',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('priority', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], null=True)),
+                ('type', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Bug'), (2, 'Feature'), (3, 'Task')], null=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'To Do'), (2, 'In Progress'), (3, 'Finished')])),
+                ('time_created', models.DateTimeField()),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='softdesk.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('time_created', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='softdesk.archivedissue')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedissue',
+            index=models.Index(fields=['project', 'time_created'], name='archivedissue_project_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedissue',
+            index=models.Index(fields=['project', 'priority', 'id'], name='archivedissue_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedissue',
+            index=models.Index(fields=['project', 'status', 'id'], name='archivedissue_status_idx'),
+        ),
+    ]
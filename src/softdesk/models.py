@@ -1,18 +1,22 @@
-import uuid
 from django.db import models
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 
+from softdesk.utils import utils
+
 
 class Project(models.Model):
     """
     Model representing a project.
+    The choices are stored as small integers, the API exposes them by
+    their names (e.g. 'BACKEND'). A project with a deleted_at date is
+    hidden, its purge is left to the purge_deleted command.
     """
-    class ProjectType(models.TextChoices):
-        BACKEND = 'BACKEND', 'Back-end'
-        FRONTEND = 'FRONTEND', 'Front-end'
-        IOS = 'IOS', 'iOS'
-        ANDROID = 'ANDROID', 'Android'
+    class ProjectType(models.IntegerChoices):
+        BACKEND = 1, 'Back-end'
+        FRONTEND = 2, 'Front-end'
+        IOS = 3, 'iOS'
+        ANDROID = 4, 'Android'
 
     author = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
@@ -25,26 +29,66 @@ class Project(models.Model):
         blank=True,
         null=True
     )
-    type = models.TextField(
+    type = models.PositiveSmallIntegerField(
         choices=ProjectType.choices
     )
     time_created = models.DateTimeField(
         auto_now_add=True
     )
+    deleted_at = models.DateTimeField(
+        blank=True,
+        null=True
+    )
 
     class Meta:
         """
-        Constraint to avoid double posting.
+        Constraint to avoid double posting, the deleted projects waiting
+        for their purge aside (see softdesk.purge). Indexes for the
+        projects ordered by creation, of every type or of one type, and
+        for the deleted ones.
         """
         constraints = [models.UniqueConstraint(
             fields=['author', 'title'],
+            condition=models.Q(deleted_at__isnull=True),
             name='unique_project'
         )]
+        indexes = [
+            models.Index(
+                fields=['time_created'],
+                name='project_time_created_idx'
+            ),
+            models.Index(
+                fields=['type', 'time_created'],
+                name='project_type_time_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='project_deleted_at_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.id} - {self.title}"
 
 
+class ProjectShard(models.Model):
+    """
+    Shard map, gives the database alias holding the contributors,
+    issues and comments of a project (see softdesk.sharding).
+    """
+    project = models.OneToOneField(
+        to=Project,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    alias = models.CharField(
+        max_length=100
+    )
+
+    def __str__(self):
+        return f"project-{self.project_id} - {self.alias}"
+
+
 class Contributor(models.Model):
     """
     Model representing a contributor of a project.
@@ -65,12 +109,19 @@ class Contributor(models.Model):
     class Meta:
         """
         Constraint to avoid adding a user as a contributor's project
-        twice.
+        twice. Index for the contributors of a project ordered by
+        creation.
         """
         constraints = [models.UniqueConstraint(
             fields=['user', 'project'],
             name='unique_contributor'
         )]
+        indexes = [
+            models.Index(
+                fields=['project', 'time_created'],
+                name='contributor_project_time_idx'
+            ),
+        ]
 
     def delete(self, *args, **kwargs):
         """
@@ -91,21 +142,24 @@ class Contributor(models.Model):
 class Issue(models.Model):
     """
     Model representing an issue of a project.
+    The choices are stored as small integers, the API exposes them by
+    their names (e.g. 'IN_PROGRESS'). The values of the priorities and
+    of the statuses follow their order.
     """
-    class IssuePriority(models.TextChoices):
-        LOW = 'LOW', 'Low'
-        MEDIUM = 'MEDIUM', 'Medium'
-        HIGH = 'HIGH', 'High'
+    class IssuePriority(models.IntegerChoices):
+        LOW = 1, 'Low'
+        MEDIUM = 2, 'Medium'
+        HIGH = 3, 'High'
 
-    class IssueType(models.TextChoices):
-        BUG = 'BUG', 'Bug'
-        FEATURE = 'FEATURE', 'Feature'
-        TASK = 'TASK', 'Task'
+    class IssueType(models.IntegerChoices):
+        BUG = 1, 'Bug'
+        FEATURE = 2, 'Feature'
+        TASK = 3, 'Task'
 
-    class IssueStatus(models.TextChoices):
-        TO_DO = 'TO_DO', 'To Do'
-        IN_PROGRESS = 'IN_PROGRESS', 'In Progress'
-        FINISHED = 'FINISHED', 'Finished'
+    class IssueStatus(models.IntegerChoices):
+        TO_DO = 1, 'To Do'
+        IN_PROGRESS = 2, 'In Progress'
+        FINISHED = 3, 'Finished'
 
     author = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
@@ -132,19 +186,19 @@ class Issue(models.Model):
         related_name='affected_issue'
     )
 
-    priority = models.TextField(
+    priority = models.PositiveSmallIntegerField(
         choices=IssuePriority.choices,
         blank=True,
         null=True
     )
-    type = models.TextField(
+    type = models.PositiveSmallIntegerField(
         choices=IssueType.choices,
         blank=True,
         null=True
     )
-    status = models.TextField(
+    status = models.PositiveSmallIntegerField(
         choices=IssueStatus.choices,
-        default='TO_DO'
+        default=IssueStatus.TO_DO
     )
 
     time_created = models.DateTimeField(
@@ -153,12 +207,37 @@ class Issue(models.Model):
 
     class Meta:
         """
-        Constraint to avoid double posting.
+        Constraint to avoid double posting. Indexes for the issues of a
+        project ordered by creation, by priority or by status, and for
+        the issues assigned to a user ordered by creation, of a status
+        or not.
         """
         constraints = [models.UniqueConstraint(
             fields=['author', 'project', 'title'],
             name='unique_issue'
         )]
+        indexes = [
+            models.Index(
+                fields=['project', 'time_created'],
+                name='issue_project_time_idx'
+            ),
+            models.Index(
+                fields=['project', 'priority', 'id'],
+                name='issue_project_priority_idx'
+            ),
+            models.Index(
+                fields=['project', 'status', 'id'],
+                name='issue_project_status_idx'
+            ),
+            models.Index(
+                fields=['assigned_to', 'status', 'time_created'],
+                name='issue_assigned_status_idx'
+            ),
+            models.Index(
+                fields=['assigned_to', 'time_created'],
+                name='issue_assigned_time_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.id} - {self.title}"
@@ -170,7 +249,7 @@ class Comment(models.Model):
     """
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=utils.uuid7,
         editable=False
     )
     author = models.ForeignKey(
@@ -187,5 +266,281 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        """
+        Indexes for the comments of an issue ordered by id, the ids
+        following the creation (UUID version 7), and for those created
+        since a date.
+        """
+        indexes = [
+            models.Index(
+                fields=['issue', 'id'],
+                name='comment_issue_id_idx'
+            ),
+            models.Index(
+                fields=['issue', 'time_created'],
+                name='comment_issue_time_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id}"
+
+
+class Job(models.Model):
+    """
+    Model representing a job of the in-database queue, run outside the
+    requests by the softdesk_worker command (see softdesk.jobs).
+    """
+    class JobStatus(models.IntegerChoices):
+        QUEUED = 1, 'Queued'
+        RUNNING = 2, 'Running'
+        DONE = 3, 'Done'
+        FAILED = 4, 'Failed'
+
+    name = models.CharField(
+        max_length=100
+    )
+    payload = models.JSONField(
+        default=dict
+    )
+    idempotency_key = models.CharField(
+        max_length=200,
+        unique=True,
+        blank=True,
+        null=True
+    )
+    status = models.PositiveSmallIntegerField(
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5
+    )
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        null=True
+    )
+    locked_at = models.DateTimeField(
+        blank=True,
+        null=True
+    )
+    last_error = models.TextField(
+        blank=True,
+        null=True
+    )
+    time_created = models.DateTimeField(
+        auto_now_add=True
+    )
+    time_finished = models.DateTimeField(
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        """
+        Index for the jobs due to run, and for the running jobs whose
+        lock expired.
+        """
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='job_status_run_after_idx'
+            ),
+            models.Index(
+                fields=['status', 'locked_at'],
+                name='job_status_locked_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.name}"
+
+
+class ArchivedIssue(models.Model):
+    """
+    Model representing an archived issue, FINISHED for long (see
+    softdesk.archive). It keeps the id and the fields of the issue.
+    """
+    id = models.BigIntegerField(
+        primary_key=True
+    )
+    author = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    project = models.ForeignKey(
+        to=Project,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    title = models.CharField(
+        max_length=100
+    )
+    description = models.TextField(
+        blank=True,
+        null=True
+    )
+    assigned_to = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=Issue.IssuePriority.choices,
+        blank=True,
+        null=True
+    )
+    type = models.PositiveSmallIntegerField(
+        choices=Issue.IssueType.choices,
+        blank=True,
+        null=True
+    )
+    status = models.PositiveSmallIntegerField(
+        choices=Issue.IssueStatus.choices
+    )
+    time_created = models.DateTimeField()
+
+    class Meta:
+        """
+        Indexes of the issues, for the archived issues of a project
+        ordered by creation, by priority or by status: the reads of the
+        issues and the archived issues (IssueRecord) merge them.
+        """
+        indexes = [
+            models.Index(
+                fields=['project', 'time_created'],
+                name='archivedissue_project_time_idx'
+            ),
+            models.Index(
+                fields=['project', 'priority', 'id'],
+                name='archivedissue_priority_idx'
+            ),
+            models.Index(
+                fields=['project', 'status', 'id'],
+                name='archivedissue_status_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.title}"
+
+
+class ArchivedComment(models.Model):
+    """
+    Model representing a comment of an archived issue. It keeps the id
+    and the fields of the comment.
+    """
+    id = models.UUIDField(
+        primary_key=True
+    )
+    author = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    issue = models.ForeignKey(
+        to=ArchivedIssue,
+        on_delete=models.CASCADE,
+        related_name='comments'
+    )
+    content = models.TextField()
+    time_created = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.id}"
+
+
+class IssueRecord(models.Model):
+    """
+    Model representing the issues and the archived issues, read from a
+    database view (UNION ALL of their tables, see softdesk.archive) by
+    the include_archived filter of the issues.
+    """
+    id = models.BigIntegerField(
+        primary_key=True
+    )
+    author = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    project = models.ForeignKey(
+        to=Project,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    title = models.CharField(
+        max_length=100
+    )
+    description = models.TextField(
+        null=True
+    )
+    assigned_to = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+'
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=Issue.IssuePriority.choices,
+        null=True
+    )
+    type = models.PositiveSmallIntegerField(
+        choices=Issue.IssueType.choices,
+        null=True
+    )
+    status = models.PositiveSmallIntegerField(
+        choices=Issue.IssueStatus.choices
+    )
+    time_created = models.DateTimeField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'softdesk_issuerecord'
+
+    def __str__(self):
+        return f"{self.id} - {self.title}"
+
+
+class CommentRecord(models.Model):
+    """
+    Model representing the comments and the archived comments, read
+    from a database view as IssueRecord.
+    """
+    id = models.UUIDField(
+        primary_key=True
+    )
+    author = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    issue = models.ForeignKey(
+        to=IssueRecord,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='comments'
+    )
+    content = models.TextField()
+    time_created = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'softdesk_commentrecord'
+
     def __str__(self):
         return f"{self.id}"
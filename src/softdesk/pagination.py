@@ -0,0 +1,239 @@
+import hashlib
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+from OC_projet_10 import metrics
+from softdesk import sharding
+
+
+class SoftDeskPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination of the API, with an async version of
+    paginate_queryset for the async read views. The offsets of the
+    pages are observed by the metrics.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        if page is not None:
+            self.observe_offset(view)
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        self.observe_offset(view)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [
+            obj async for obj in
+            queryset[self.offset:self.offset + self.limit]
+        ]
+
+    def observe_offset(self, view):
+        metrics.PAGINATION_OFFSET.labels(type(view).__name__).observe(
+            self.offset
+        )
+
+
+# Tables of the database views, by view (see softdesk.archive): the
+# counts of a view are invalidated along with those of its tables.
+VIEWS = {
+    'softdesk_issuerecord': ('softdesk_issue', 'softdesk_archivedissue'),
+    'softdesk_commentrecord': ('softdesk_comment',
+                               'softdesk_archivedcomment'),
+}
+
+
+def _generation_key(table):
+    return f'softdesk:count-generation:{table}'
+
+
+def invalidate_counts(model):
+    """
+    Invalidate the cached counts of the queries reading the table of a
+    model, or a view of it: its generation changes, and so the keys of
+    these counts. Called on every save and delete by the signals, and by
+    hand after the bulk writes, which send no signal.
+    """
+    table = model._meta.db_table
+    tables = [table] + [view for view, sources in VIEWS.items()
+                        if table in sources]
+    cache.set_many({_generation_key(table): uuid.uuid4().hex
+                    for table in tables}, None)
+
+
+def _count_key(queryset, generations):
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    signature = f'{queryset.db}:{sql}:{params!r}:{generations!r}'
+    return 'softdesk:count:' + hashlib.md5(signature.encode()).hexdigest()
+
+
+def _tables(queryset):
+    """
+    Give the keys of the generations of the tables read by a queryset,
+    subqueries included.
+    """
+    sql = str(queryset.query)
+    quote_name = connections[queryset.db].ops.quote_name
+    return sorted(
+        _generation_key(model._meta.db_table)
+        for model in apps.get_models()
+        if quote_name(model._meta.db_table) in sql
+    )
+
+
+def estimate_count(queryset):
+    """
+    Give the number of rows of a queryset estimated by the query
+    planner of PostgreSQL, or None with the other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return plan[0]['Plan']['Plan Rows']
+
+
+def count(queryset):
+    """
+    Count the rows of a queryset, up to settings.PAGINATION_COUNT_LIMIT.
+    Return (count, exact): past the limit, the count is estimated (None
+    if it cannot be) and exact is False. The result is cached for
+    settings.PAGINATION_COUNT_TIMEOUT seconds, or until a row of a table
+    read by the queryset is saved or deleted.
+    """
+    queryset = queryset.order_by()
+    tables = _tables(queryset)
+    key = _count_key(queryset, cache.get_many(tables))
+    result = cache.get(key)
+    metrics.record_cache_lookup('pagination_count', result is not None)
+    if result is None:
+        limit = settings.PAGINATION_COUNT_LIMIT
+        # A capped count reads at most limit + 1 rows.
+        result = (queryset[:limit + 1].count(), True)
+        if result[0] > limit:
+            result = (estimate_count(queryset), False)
+        cache.set(key, result, settings.PAGINATION_COUNT_TIMEOUT)
+    return result
+
+
+async def acount(queryset):
+    """
+    Async version of count().
+    """
+    queryset = queryset.order_by()
+    tables = _tables(queryset)
+    key = _count_key(queryset, await cache.aget_many(tables))
+    result = await cache.aget(key)
+    metrics.record_cache_lookup('pagination_count', result is not None)
+    if result is None:
+        limit = settings.PAGINATION_COUNT_LIMIT
+        result = (await queryset[:limit + 1].acount(), True)
+        if result[0] > limit:
+            result = (await sync_to_async(estimate_count)(queryset), False)
+        await cache.aset(key, result, settings.PAGINATION_COUNT_TIMEOUT)
+    return result
+
+
+class CachedCountPagination(SoftDeskPagination):
+    """
+    Pagination whose count is cached (see count()) instead of being run
+    along every page. Past settings.PAGINATION_COUNT_LIMIT rows, the
+    count is estimated, or null, and the response tells whether there
+    is a next page with has_more:
+
+        {"count": null, "has_more": true, "next": ..., "previous": ...,
+         "results": [...]}
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.observe_offset(view)
+        self.count, self.count_exact = count(queryset)
+        stop = self.offset + self.limit + (0 if self.count_exact else 1)
+        return self.get_page(list(queryset[self.offset:stop]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.observe_offset(view)
+        self.count, self.count_exact = await acount(queryset)
+        stop = self.offset + self.limit + (0 if self.count_exact else 1)
+        return self.get_page(
+            [obj async for obj in queryset[self.offset:stop]]
+        )
+
+    def get_page(self, rows):
+        """
+        Give the page of the rows read. Without an exact count, one more
+        row than the limit is read to know if there is a next page.
+        """
+        if self.count_exact:
+            if self.count > self.limit and self.template is not None:
+                self.display_page_controls = True
+            return rows
+        self.has_more = len(rows) > self.limit
+        self.estimated_count = self.count
+        # The links only need to know if there is a next page.
+        self.count = self.offset + len(rows)
+        return rows[:self.limit]
+
+    def get_paginated_response(self, data):
+        if self.count_exact:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.estimated_count,
+            'has_more': self.has_more,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class AssignedIssuePagination(CursorPagination):
+    """
+    Cursor pagination of the issues assigned to a user, the newest
+    first: a page is read from the position of its cursor along the
+    (assigned_to, ..., time_created) indexes, without count nor offset.
+    With sharding, the pages of every shard are merged (see
+    softdesk.sharding.ShardedQuerySet).
+    """
+    ordering = ('-time_created', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if settings.DATABASE_SHARDS:
+            queryset = sharding.ShardedQuerySet(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await sync_to_async(self.paginate_queryset)(
+            queryset, request, view
+        )
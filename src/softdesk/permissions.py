@@ -21,6 +21,13 @@ class IsProjectAuthor(BasePermission):
         """
         return view.current_project.author == request.user
 
+    async def ahas_permission(self, request, view):
+        """
+        Async version of has_permission, used by the async read views.
+        """
+        project = await view.aget_current_project()
+        return project.author_id == request.user.id
+
 
 class IsProjectContributor(BasePermission):
     """
@@ -34,6 +41,13 @@ class IsProjectContributor(BasePermission):
         """
         return request.user.id in view.current_project_contributors_id
 
+    async def ahas_permission(self, request, view):
+        """
+        Async version of has_permission, used by the async read views.
+        """
+        contributors_id = await view.aget_current_project_contributors_id()
+        return request.user.id in contributors_id
+
 
 class IsUserContributor(BasePermission):
     """
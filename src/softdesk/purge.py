@@ -0,0 +1,169 @@
+"""
+Soft deletion of the projects and the users, and their purge in bounded
+batches.
+
+Deleting a project or a user through the ORM collects every contributor,
+issue and comment depending on it in memory, then deletes them in one
+transaction holding the write lock of SQLite. With settings.SOFT_DELETE,
+the API only dates the deletion (deleted_at), which hides the object at
+once, and queues its purge (see softdesk.jobs). The purge deletes the
+dependent rows a batch at a time, each batch in a short transaction of
+its own, and the object itself last. The purge_deleted command purges
+what the queue left.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from softdesk import jobs, pagination, sharding
+from softdesk.models import (
+    Project, Contributor, Issue, Comment, ArchivedIssue, ArchivedComment
+)
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+
+def soft_delete_project(project):
+    """
+    Hide a project and queue its purge, run by softdesk_worker.
+    """
+    project.deleted_at = timezone.now()
+    project.save(update_fields=['deleted_at'])
+    jobs.enqueue(purge_project, {'project_id': project.pk},
+                 key=f'purge_project:{project.pk}')
+
+
+def soft_delete_user(user):
+    """
+    Deactivate and hide a user, and hide the projects they authored,
+    which are purged along with them by the queued purge of the user.
+    """
+    user.deleted_at = timezone.now()
+    user.is_active = False
+    user.save(update_fields=['deleted_at', 'is_active'])
+    projects = (Project.objects.using(DEFAULT_DB_ALIAS)
+                .filter(author=user, deleted_at__isnull=True))
+    if settings.DATABASE_SHARDS:
+        # The copies of the projects in the shards are hidden too, the
+        # lists read across the shards join them.
+        for project in projects:
+            project.deleted_at = user.deleted_at
+            sharding.mirror(project,
+                            [sharding.shard_for_project(project.pk)])
+    projects.update(deleted_at=user.deleted_at)
+    pagination.invalidate_counts(Project)
+    jobs.enqueue(purge_user, {'user_id': user.pk},
+                 key=f'purge_user:{user.pk}')
+
+
+def delete_in_batches(queryset, batch_size=500, pause=0):
+    """
+    Delete the rows of a queryset batch_size at a time, each batch in its
+    own transaction, sleeping pause seconds between the batches to let
+    the other writers in. The rows are deleted by their primary keys,
+    without the collector of the ORM nor the signals: the rows depending
+    on them must be deleted first. Return the number of deleted rows.
+    """
+    model = queryset.model
+    alias = queryset.db
+    connection = connections[alias]
+    pk = model._meta.pk
+    sql = (f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+           f"WHERE {connection.ops.quote_name(pk.column)} IN ")
+    total = 0
+    while True:
+        with transaction.atomic(using=alias):
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    sql + f"({', '.join(['%s'] * len(pks))})",
+                    [pk.get_db_prep_value(value, connection) for value in pks]
+                )
+        total += len(pks)
+        if pause:
+            time.sleep(pause)
+    if total:
+        pagination.invalidate_counts(model)
+    return total
+
+
+@jobs.task()
+def purge_project(project_id, batch_size=500, pause=0.01):
+    """
+    Delete a project: its comments, issues, archived or not, and
+    contributors in batches, in the shard holding them, then the
+    project, its entry of the shard map and its copy in its shard.
+    """
+    alias = sharding.shard_for_project(project_id)
+    for queryset in (
+        Comment.objects.using(alias).filter(issue__project_id=project_id),
+        Issue.objects.using(alias).filter(project_id=project_id),
+        ArchivedComment.objects.using(alias)
+        .filter(issue__project_id=project_id),
+        ArchivedIssue.objects.using(alias).filter(project_id=project_id),
+        Contributor.objects.using(alias).filter(project_id=project_id),
+    ):
+        delete_in_batches(queryset, batch_size, pause)
+    Project.objects.using(DEFAULT_DB_ALIAS).filter(pk=project_id).delete()
+
+
+@jobs.task()
+def purge_user(user_id, batch_size=500, pause=0.01):
+    """
+    Delete a user: the projects they authored, then in every shard the
+    issues they authored or are assigned to (as the CASCADE of the
+    foreign keys would), the comments of these issues and their own
+    comments, archived or not, and their contributions, in batches.
+    Then the user and their copies in the shards.
+    """
+    projects = list(Project.objects.using(DEFAULT_DB_ALIAS)
+                    .filter(author_id=user_id).values_list('pk', flat=True))
+    for project_id in projects:
+        purge_project(project_id, batch_size, pause)
+
+    issues = Q(author_id=user_id) | Q(assigned_to_id=user_id)
+    for alias in sharding.shard_aliases():
+        for queryset in (
+            Comment.objects.using(alias).filter(
+                Q(author_id=user_id) | Q(issue__author_id=user_id)
+                | Q(issue__assigned_to_id=user_id)
+            ),
+            Issue.objects.using(alias).filter(issues),
+            ArchivedComment.objects.using(alias).filter(
+                Q(author_id=user_id) | Q(issue__author_id=user_id)
+                | Q(issue__assigned_to_id=user_id)
+            ),
+            ArchivedIssue.objects.using(alias).filter(issues),
+            Contributor.objects.using(alias).filter(user_id=user_id),
+        ):
+            delete_in_batches(queryset, batch_size, pause)
+    User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).delete()
+
+
+def purge_deleted(batch_size=500, pause=0.01, log=logger.info):
+    """
+    Purge the soft deleted projects, then the soft deleted users, whose
+    queued purge did not run or failed. Return the number of purged
+    objects.
+    """
+    purged = 0
+    for model, purge in ((Project, purge_project), (User, purge_user)):
+        pks = list(model.objects.using(DEFAULT_DB_ALIAS)
+                   .filter(deleted_at__isnull=False)
+                   .order_by('deleted_at').values_list('pk', flat=True))
+        for pk in pks:
+            start = time.perf_counter()
+            purge(pk, batch_size, pause)
+            purged += 1
+            log(f"{model._meta.model_name} {pk} supprimé "
+                f"({time.perf_counter() - start:.1f} s)")
+    return purged
@@ -0,0 +1,50 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Only called for the types unknown to orjson and msgpack (Decimal, lazy
+# translations, ...), handled as by the JSONRenderer of DRF.
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson. The UUIDs, the datetimes and the choices
+    (str enums) are serialized natively, without going through Python.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # orjson only indents with 2 spaces, the indented responses
+        # (browsable API, 'indent' media type parameter) are left to
+        # JSONRenderer.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=self.options)
+        # Same escaping as JSONRenderer, the two characters are valid JSON
+        # but not valid JavaScript.
+        return (ret.replace('\u2028'.encode(), b'\\u2028')
+                .replace('\u2029'.encode(), b'\\u2029'))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer serializing the data in MessagePack, the datetimes being
+    serialized natively as timestamps.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, datetime=True, default=_default)
@@ -0,0 +1,355 @@
+"""
+Synthetic dataset of the SoftDesk schema for the load and scaling
+tests (see the seed_softdesk command).
+
+The sizes follow Pareto distributions: a few mega-projects gather most
+of the contributors and issues, and a few issues most of the comments.
+Everything, timestamps and comment ids included, is drawn from one
+random generator: the same seed gives the same dataset.
+"""
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from softdesk import pagination, sharding
+from softdesk.models import (
+    Project, ProjectShard, Contributor, Issue, Comment
+)
+from softdesk.utils import utils
+
+User = get_user_model()
+
+# Password of every seeded user.
+SEED_PASSWORD = 'S33D!U53R'
+
+WORDS = ('projet', 'ticket', 'erreur', 'écran', 'serveur', 'client',
+         'requête', 'version', 'test', 'page', 'bouton', 'liste', 'donnée',
+         'export', 'import', 'compte', 'mobile', 'lent', 'corrigé', 'revue')
+
+
+@contextmanager
+def explicit_timestamps():
+    """
+    Let the seeded rows keep the creation dates drawn for them instead
+    of the current date set by auto_now_add.
+    """
+    fields = [User._meta.get_field('created_time')] + [
+        model._meta.get_field('time_created')
+        for model in (Project, Contributor, Issue, Comment)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Seeder:
+    """
+    Generate users, projects, contributors, issues and comments with
+    batched bulk_create, in the shards of the projects when sharding is
+    enabled. The counts of contributors, issues and comments are totals
+    spread over the projects and the issues.
+    """
+    def __init__(self, rng, users, projects, contributors, issues,
+                 comments, skew=1.2, status_mix=(30, 20, 50), days=365,
+                 batch_size=50000, prefix='seed', log=print):
+        self.rng = rng
+        self.sizes = {'users': users, 'projects': projects,
+                      'contributors': contributors, 'issues': issues,
+                      'comments': comments}
+        self.skew = skew
+        self.status_mix = status_mix
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.end = self.start + timedelta(days=days)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.log = log
+
+    def allocate(self, total, weights, minimum=0):
+        """
+        Spread a total over len(weights) buckets in proportion to their
+        weights, each bucket getting at least `minimum`.
+        """
+        total = max(total - minimum * len(weights), 0)
+        if not weights or not total:
+            return [minimum] * len(weights)
+        scale = total / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        for index in self.rng.choices(range(len(weights)), weights,
+                                      k=total - sum(counts)):
+            counts[index] += 1
+        return [count + minimum for count in counts]
+
+    def pareto_weights(self, size):
+        return [self.rng.paretovariate(self.skew) for _ in range(size)]
+
+    def date_between(self, start, end=None):
+        end = end or self.end
+        return start + (end - start) * self.rng.random()
+
+    def sorted_dates(self, size):
+        return sorted(self.date_between(self.start) for _ in range(size))
+
+    def run(self):
+        self.started = time.perf_counter()
+        with explicit_timestamps():
+            users = self.create_users()
+            projects = self.create_projects(users)
+            members = self.create_contributors(users, projects)
+            issues = self.create_issues(projects, members)
+            self.create_comments(issues, members)
+        for model in (User, Project, ProjectShard, Contributor, Issue,
+                      Comment):
+            pagination.invalidate_counts(model)
+
+    def report(self, name, count):
+        elapsed = time.perf_counter() - self.started
+        self.log(f"{count} {name} ({elapsed:.1f} s)")
+
+    def create_users(self):
+        # Hashed once, with a fixed salt: every user shares it.
+        password = make_password(SEED_PASSWORD, salt=self.prefix)
+        dates = self.sorted_dates(self.sizes['users'])
+        users = [
+            User(username=f'{self.prefix}_user_{index:07}',
+                 password=password,
+                 email=f'{self.prefix}_user_{index:07}@example.com',
+                 date_of_birth=date(1960, 1, 1) + timedelta(
+                     days=self.rng.randrange(40 * 365)),
+                 can_be_contacted=self.rng.random() < 0.5,
+                 can_data_be_shared=self.rng.random() < 0.3,
+                 date_joined=joined, created_time=joined)
+            for index, joined in enumerate(dates)
+        ]
+        User.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            users, batch_size=self.batch_size
+        )
+        for alias in settings.DATABASE_SHARDS:
+            User.objects.using(alias).bulk_create(
+                users, batch_size=self.batch_size
+            )
+        self.report('users', len(users))
+        return users
+
+    def create_projects(self, users):
+        """
+        Create the projects, their authors drawn with skewed weights,
+        and their entries of the shard map.
+        """
+        author_weights = self.pareto_weights(len(users))
+        authors = self.rng.choices(users, author_weights,
+                                   k=self.sizes['projects'])
+        projects = [
+            Project(author=author, title=f'Projet {index}',
+                    description=self.sentence() if index % 3 else None,
+                    type=self.rng.choice(Project.ProjectType.values),
+                    time_created=created)
+            for index, (author, created) in enumerate(
+                zip(authors, self.sorted_dates(len(authors)))
+            )
+        ]
+        Project.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            projects, batch_size=self.batch_size
+        )
+        if settings.DATABASE_SHARDS:
+            self.distribute(projects)
+        # The size of a project, shared by its contributors and issues.
+        self.project_weights = self.pareto_weights(len(projects))
+        self.report('projects', len(projects))
+        return projects
+
+    def distribute(self, projects):
+        """
+        Record the shard of every project and copy it there.
+        """
+        shards = {}
+        for project in projects:
+            project.shard = sharding.choose_shard(project.pk)
+            shards.setdefault(project.shard, []).append(project)
+        ProjectShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            (ProjectShard(project=project, alias=project.shard)
+             for project in projects),
+            batch_size=self.batch_size
+        )
+        for alias, hosted in shards.items():
+            if alias == DEFAULT_DB_ALIAS:
+                continue
+            sharding.seed_id_sequences(alias)
+            Project.objects.using(alias).bulk_create(
+                hosted, batch_size=self.batch_size
+            )
+
+    @staticmethod
+    def shard_of(project):
+        return getattr(project, 'shard', DEFAULT_DB_ALIAS)
+
+    def create_contributors(self, users, projects):
+        """
+        Create the contributors, the author of every project among them
+        (as the signal of a saved project does). Return the users of
+        each project, who write its issues and comments.
+        """
+        counts = self.allocate(self.sizes['contributors'],
+                               self.project_weights, minimum=1)
+        members = {}
+        buffers = {}
+        total = 0
+        for project, count in zip(projects, counts):
+            users_ids = {project.author_id}
+            count = min(count, len(users))
+            while len(users_ids) < count:
+                users_ids.update(
+                    user.pk for user in
+                    self.rng.sample(users, count - len(users_ids))
+                )
+            members[project.pk] = sorted(users_ids)
+            rows = [
+                Contributor(user_id=user_id, project=project,
+                            time_created=self.date_between(
+                                project.time_created))
+                for user_id in members[project.pk]
+            ]
+            total += len(rows)
+            self.buffer(buffers, Contributor, self.shard_of(project), rows)
+        self.flush(buffers, Contributor)
+        self.report('contributors', total)
+        return members
+
+    def create_issues(self, projects, members):
+        """
+        Create the issues. Return (id, project id, creation date, shard)
+        of every issue, in the order of their creation.
+        """
+        counts = self.allocate(self.sizes['issues'], self.project_weights)
+        statuses = Issue.IssueStatus.values
+        priorities = [None, *Issue.IssuePriority.values]
+        types = [None, *Issue.IssueType.values]
+        issues = []
+        buffers = {}
+        for project, count in zip(projects, counts):
+            authors = members[project.pk]
+            rows = [
+                Issue(project=project,
+                      author_id=self.rng.choice(authors),
+                      assigned_to_id=(self.rng.choice(authors)
+                                      if self.rng.random() < 0.7 else None),
+                      title=f'Issue {index}',
+                      description=self.sentence(),
+                      priority=self.rng.choices(priorities,
+                                                (10, 30, 45, 15))[0],
+                      type=self.rng.choices(types, (10, 45, 30, 15))[0],
+                      status=self.rng.choices(statuses, self.status_mix)[0],
+                      time_created=self.date_between(project.time_created))
+                for index in range(count)
+            ]
+            issues += rows
+            self.buffer(buffers, Issue, self.shard_of(project), rows)
+        self.flush(buffers, Issue)
+        self.report('issues', len(issues))
+        return [(issue.pk, issue.project_id, issue.time_created,
+                 self.shard_of(issue.project)) for issue in issues]
+
+    def create_comments(self, issues, members):
+        """
+        Create the comments, a few issues getting most of them, their
+        ids ordered by their dates as those of the API (UUID version 7).
+        They are inserted as plain rows (see insert()), without model
+        instances.
+        """
+        counts = self.allocate(self.sizes['comments'],
+                               self.pareto_weights(len(issues)))
+        sentences = [self.sentence() for _ in range(1000)]
+        getrandbits = self.rng.getrandbits
+        choice = self.rng.choice
+        date_between = self.date_between
+        make_uuid7 = utils.make_uuid7
+        buffers = {}
+        total = 0
+        for issue, count in zip(issues, counts):
+            issue_id, project_id, created, alias = issue
+            if not count:
+                continue
+            authors = members[project_id]
+            buffer = buffers.setdefault(alias, [])
+            buffer += [
+                (make_uuid7(int(time_created.timestamp() * 1000),
+                            getrandbits(12), getrandbits(62)),
+                 issue_id, choice(authors), choice(sentences), time_created)
+                for time_created in (date_between(created)
+                                     for _ in range(count))
+            ]
+            total += count
+            if len(buffer) >= self.batch_size:
+                self.insert(Comment, alias, self.comment_fields, buffer)
+                buffer.clear()
+            if total % 1000000 < count:
+                self.report('comments', total)
+        for alias, buffer in buffers.items():
+            self.insert(Comment, alias, self.comment_fields, buffer)
+        self.report('comments', total)
+
+    comment_fields = ('id', 'issue', 'author', 'content', 'time_created')
+
+    @staticmethod
+    def insert(model, alias, field_names, rows):
+        """
+        Insert rows, tuples of the values of field_names, with one
+        executemany. Building and saving model instances would take most
+        of the time of the millions of comments.
+        """
+        if not rows:
+            return
+        connection = connections[alias]
+        quote_name = connection.ops.quote_name
+        fields = [model._meta.get_field(name) for name in field_names]
+        # Only the ids and the dates need to be adapted to the database.
+        adapters = {}
+        for index, field in enumerate(fields):
+            if field.get_internal_type() == 'DateTimeField':
+                adapters[index] = connection.ops.adapt_datetimefield_value
+            elif field.get_internal_type() == 'UUIDField':
+                adapters[index] = partial(field.get_db_prep_value,
+                                          connection=connection,
+                                          prepared=True)
+        values = []
+        for row in rows:
+            row = list(row)
+            for index, adapt in adapters.items():
+                row[index] = adapt(row[index])
+            values.append(row)
+        sql = (
+            f"INSERT INTO {quote_name(model._meta.db_table)} "
+            f"({', '.join(quote_name(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))})"
+        )
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.executemany(sql, values)
+
+    def sentence(self):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(4, 16)))
+
+    def buffer(self, buffers, model, alias, rows):
+        """
+        Add rows to the buffer of a shard, written every batch_size rows.
+        """
+        buffer = buffers.setdefault(alias, [])
+        buffer += rows
+        if len(buffer) >= self.batch_size:
+            model.objects.using(alias).bulk_create(buffer)
+            buffer.clear()
+
+    @staticmethod
+    def flush(buffers, model):
+        for alias, buffer in buffers.items():
+            if buffer:
+                model.objects.using(alias).bulk_create(buffer)
+            buffer.clear()
@@ -1,12 +1,39 @@
 from rest_framework.serializers import (
-    ModelSerializer, HyperlinkedIdentityField, PrimaryKeyRelatedField
+    ModelSerializer, HyperlinkedIdentityField, PrimaryKeyRelatedField,
+    ChoiceField
 )
 from rest_framework_nested.relations import NestedHyperlinkedIdentityField
 from myauth.serializers import UserSummarySerializer
+from softdesk import sharding
 from softdesk.models import Project, Issue, Contributor, Comment
 from myauth.models import User
 
 
+class ChoiceNameField(ChoiceField):
+    """
+    Field for the integer-coded choices (IntegerChoices) of the models,
+    exposed by their names (e.g. 'IN_PROGRESS'). A blank value is saved
+    as NULL.
+    """
+    def __init__(self, choices_class, **kwargs):
+        self.choices_class = choices_class
+        super().__init__(
+            choices=[(member.name, member.label) for member in choices_class],
+            **kwargs
+        )
+
+    def to_internal_value(self, data):
+        name = super().to_internal_value(data)
+        if name == '':
+            return None
+        return self.choices_class[name]
+
+    def to_representation(self, value):
+        if value is None:
+            return None
+        return self.choices_class(value).name
+
+
 class ContributorListSerializer(ModelSerializer):
     """
     Serializer for the Contributor model. Minimal info + a link to the
@@ -117,6 +144,7 @@ class ProjectDetailSerializer(ModelSerializer):
         lookup_url_kwarg='project_pk',
         read_only=True
     )
+    type = ChoiceNameField(Project.ProjectType, read_only=True)
 
     class Meta:
         model = Project
@@ -138,6 +166,8 @@ class ProjectPostSerializer(ModelSerializer):
     Serializer for the Project model. Serializer for creating a new
     Project or updating an existing one.
     """
+    type = ChoiceNameField(Project.ProjectType)
+
     class Meta:
         model = Project
         fields = [
@@ -266,6 +296,9 @@ class IssueDetailSerializer(ModelSerializer):
         read_only=True
     )
     assigned_to = UserSummarySerializer(read_only=True)
+    priority = ChoiceNameField(Issue.IssuePriority, read_only=True)
+    type = ChoiceNameField(Issue.IssueType, read_only=True)
+    status = ChoiceNameField(Issue.IssueStatus, read_only=True)
 
     class Meta:
         model = Issue
@@ -285,6 +318,40 @@ class IssueDetailSerializer(ModelSerializer):
         ]
 
 
+class AssignedIssueSerializer(ModelSerializer):
+    """
+    Serializer for the Issue model. An issue of the list of the issues
+    assigned to the user, across their projects, with a link to its
+    detailed view.
+    """
+    author = UserSummarySerializer(
+        read_only=True
+    )
+    issue_detail = NestedHyperlinkedIdentityField(
+        view_name='project-issue-detail',
+        parent_lookup_kwargs={'project_pk': 'project_id'},
+        lookup_field='pk',
+        read_only=True
+    )
+    priority = ChoiceNameField(Issue.IssuePriority, read_only=True)
+    type = ChoiceNameField(Issue.IssueType, read_only=True)
+    status = ChoiceNameField(Issue.IssueStatus, read_only=True)
+
+    class Meta:
+        model = Issue
+        fields = [
+            'id',
+            'author',
+            'project',
+            'title',
+            'priority',
+            'type',
+            'status',
+            'time_created',
+            'issue_detail',
+        ]
+
+
 class IssuePostSerializer(ModelSerializer):
     """
     Serializer for the Issue model. Serializer for creating a new issue
@@ -294,6 +361,19 @@ class IssuePostSerializer(ModelSerializer):
         queryset=User.objects.none(),
         allow_null=True,
     )
+    priority = ChoiceNameField(
+        Issue.IssuePriority,
+        required=False,
+        allow_null=True,
+        allow_blank=True
+    )
+    type = ChoiceNameField(
+        Issue.IssueType,
+        required=False,
+        allow_null=True,
+        allow_blank=True
+    )
+    status = ChoiceNameField(Issue.IssueStatus, required=False)
 
     class Meta:
         model = Issue
@@ -311,9 +391,16 @@ class IssuePostSerializer(ModelSerializer):
         Look for a project's contributors and give the list to the
         "assigned_to" field to limit the choices of designated users to
         the contributors of the project only.
+        The contributors live in the shard of the project, their ids are
+        fetched there before querying the users.
         """
         super().__init__(*args, **kwargs)
         project_pk = self.context['view'].kwargs['project_pk']
+        contributors_id = sharding.evaluate(
+            Contributor.objects
+            .filter(project_id=project_pk)
+            .values_list('user_id', flat=True)
+        )
         self.fields["assigned_to"].queryset = User.objects.filter(
-            contributor__project_id=project_pk
+            id__in=contributors_id
         )
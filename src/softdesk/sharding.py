@@ -0,0 +1,336 @@
+"""
+Horizontal sharding of the project data.
+
+The users, the projects and the shard map (ProjectShard) live in the
+global database ('default'). The contributors, issues and comments of a
+project live in the shard given by the shard map, 'default' being the
+shard of the projects created before sharding was enabled.
+
+Every shard holds the full schema and a read-only copy of the users and
+of the projects it hosts, kept up to date by the signals of
+softdesk.signals, so that foreign keys and joins keep working inside a
+shard. The source of truth of these rows stays the global database.
+"""
+import heapq
+from contextvars import ContextVar
+from itertools import chain, islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+SHARDED_MODELS = {
+    'contributor', 'issue', 'comment', 'archivedissue', 'archivedcomment',
+    'issuerecord', 'commentrecord'
+}
+
+# Ids of the autoincrement tables of the shard number N start at
+# N * SHARD_ID_SPAN so that a project can be moved between shards
+# without id collisions.
+SHARD_ID_SPAN = 10 ** 12
+
+# (project_id, alias) of the project targeted by the current request.
+_current_project_shard = ContextVar('current_project_shard', default=None)
+
+
+def shard_aliases():
+    """
+    Return the aliases of every database holding project data.
+    """
+    return [DEFAULT_DB_ALIAS, *settings.DATABASE_SHARDS]
+
+
+def is_sharded(model):
+    """
+    Check if the rows of a model are spread across the shards.
+    """
+    return (model._meta.app_label == 'softdesk'
+            and model._meta.model_name in SHARDED_MODELS)
+
+
+def choose_shard(project_id):
+    """
+    Give the shard where the data of a new project is stored.
+    """
+    if not settings.DATABASE_SHARDS:
+        return DEFAULT_DB_ALIAS
+    shards = settings.DATABASE_SHARDS
+    return shards[project_id % len(shards)]
+
+
+def shard_for_project(project_id):
+    """
+    Give the alias of the shard holding the data of a project.
+    """
+    if not settings.DATABASE_SHARDS or project_id is None:
+        return DEFAULT_DB_ALIAS
+    current = _current_project_shard.get()
+    if current is not None and current[0] == project_id:
+        return current[1]
+
+    from softdesk.models import ProjectShard
+    alias = (ProjectShard.objects.using(DEFAULT_DB_ALIAS)
+             .filter(project_id=project_id)
+             .values_list('alias', flat=True)
+             .first())
+    return alias or DEFAULT_DB_ALIAS
+
+
+async def ashard_for_project(project_id):
+    """
+    Async version of shard_for_project, used by the async read views.
+    """
+    if not settings.DATABASE_SHARDS or project_id is None:
+        return DEFAULT_DB_ALIAS
+
+    from softdesk.models import ProjectShard
+    alias = await (ProjectShard.objects.using(DEFAULT_DB_ALIAS)
+                   .filter(project_id=project_id)
+                   .values_list('alias', flat=True)
+                   .afirst())
+    return alias or DEFAULT_DB_ALIAS
+
+
+def set_current_project(project_pk):
+    """
+    Route the queries of the current context without instance hints
+    (e.g. Issue.objects.filter(...)) to the shard of a project. Return
+    a token to give back to reset_current_project().
+    """
+    try:
+        project_id = int(project_pk)
+    except (TypeError, ValueError):
+        return _current_project_shard.set(None)
+    return _current_project_shard.set(
+        (project_id, shard_for_project(project_id))
+    )
+
+
+async def aset_current_project(project_pk):
+    """
+    Async version of set_current_project, used by the async read views.
+    """
+    try:
+        project_id = int(project_pk)
+    except (TypeError, ValueError):
+        return _current_project_shard.set(None)
+    return _current_project_shard.set(
+        (project_id, await ashard_for_project(project_id))
+    )
+
+
+def reset_current_project(token):
+    _current_project_shard.reset(token)
+
+
+def current_shard():
+    """
+    Return the alias of the shard of the current request, if any.
+    """
+    current = _current_project_shard.get()
+    return current[1] if current is not None else None
+
+
+def shard_for_instance(instance):
+    """
+    Find the shard of a model instance given as a routing hint, return
+    None if the instance does not tell anything about the shard.
+    """
+    from softdesk.models import Project, Comment
+
+    if isinstance(instance, Project):
+        return shard_for_project(instance.pk)
+    if not is_sharded(type(instance)):
+        return None
+    if not instance._state.adding and instance._state.db:
+        return instance._state.db
+    if getattr(instance, 'project_id', None) is not None:
+        return shard_for_project(instance.project_id)
+    if isinstance(instance, Comment) and Comment.issue.is_cached(instance):
+        return shard_for_instance(instance.issue)
+    return None
+
+
+def shard_for_hints(hints):
+    """
+    Find the shard of a sharded model from the routing hints, falling
+    back on the shard of the current request.
+    """
+    instance = hints.get('instance')
+    alias = shard_for_instance(instance) if instance is not None else None
+    return alias or current_shard() or DEFAULT_DB_ALIAS
+
+
+def evaluate(queryset):
+    """
+    Evaluate a queryset on its own shard, to be used as the value of a
+    __in lookup on a model of the global database. Without sharding,
+    the queryset is left lazy and becomes a subquery.
+    """
+    if not settings.DATABASE_SHARDS:
+        return queryset
+    return list(queryset)
+
+
+def scatter_gather(queryset):
+    """
+    Run a read on every shard and chain the results. Without sharding,
+    the queryset is left lazy.
+    """
+    if not settings.DATABASE_SHARDS:
+        return queryset
+    return list(chain.from_iterable(
+        queryset.using(alias) for alias in shard_aliases()
+    ))
+
+
+class ShardedQuerySet:
+    """
+    A queryset read on every shard, whose slices merge the rows of the
+    shards in the order of the queryset. It is filtered, ordered and
+    sliced by the cursor pagination of the issues assigned to a user
+    (see softdesk.pagination.AssignedIssuePagination), its ordering
+    fields must be all ascending or all descending.
+    """
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def filter(self, *args, **kwargs):
+        return ShardedQuerySet(self.queryset.filter(*args, **kwargs))
+
+    def order_by(self, *fields):
+        return ShardedQuerySet(self.queryset.order_by(*fields))
+
+    def __getitem__(self, k):
+        """
+        Read the rows of the slice from every shard, each shard giving
+        its first k.stop rows, then merge them.
+        """
+        ordering = self.queryset.query.order_by
+        descending = ordering[0].startswith('-')
+        if any(field.startswith('-') != descending for field in ordering):
+            raise ValueError("Un ordre mixte ne peut pas être fusionné.")
+        key = attrgetter(*(field.lstrip('-') for field in ordering))
+        rows = heapq.merge(
+            *(self.queryset.using(alias)[:k.stop]
+              for alias in shard_aliases()),
+            key=key, reverse=descending
+        )
+        return list(islice(rows, k.start, k.stop))
+
+
+def mirror(instance, aliases):
+    """
+    Copy a row of the global database (a user or a project) into some
+    shards. The signals sent by the copy have raw=True.
+    """
+    db = instance._state.db
+    for alias in aliases:
+        if alias != DEFAULT_DB_ALIAS:
+            instance.save_base(using=alias, raw=True)
+    instance._state.db = db
+
+
+def seed_id_sequences(alias):
+    """
+    Start the ids of the sharded autoincrement tables of a shard at
+    N * SHARD_ID_SPAN, N being its position in settings.DATABASE_SHARDS.
+    """
+    from softdesk.models import Contributor, Issue
+
+    start = (settings.DATABASE_SHARDS.index(alias) + 1) * SHARD_ID_SPAN
+    with connections[alias].cursor() as cursor:
+        for model in (Contributor, Issue):
+            table = model._meta.db_table
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s", [table]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, start]
+                )
+            elif row[0] < start:
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                    [start, table]
+                )
+
+
+def move_project(project_id, target, batch_size=500):
+    """
+    Move the contributors, issues and comments of a project, archived
+    or not, to another shard and update the shard map. Writes made to
+    the project while it is moved are lost, the project should be idle.
+    """
+    from django.contrib.auth import get_user_model
+    from softdesk.models import (
+        Project, ProjectShard, Contributor, Issue, Comment, ArchivedIssue,
+        ArchivedComment
+    )
+    User = get_user_model()
+
+    source = shard_for_project(project_id)
+    if source == target:
+        return source
+    project = Project.objects.using(DEFAULT_DB_ALIAS).get(pk=project_id)
+
+    contributors = list(
+        Contributor.objects.using(source).filter(project_id=project_id)
+    )
+    issues = list(Issue.objects.using(source).filter(project_id=project_id))
+    comments = list(
+        Comment.objects.using(source).filter(issue__project_id=project_id)
+    )
+    archived_issues = list(
+        ArchivedIssue.objects.using(source).filter(project_id=project_id)
+    )
+    archived_comments = list(
+        ArchivedComment.objects.using(source)
+        .filter(issue__project_id=project_id)
+    )
+    user_ids = {project.author_id}
+    user_ids.update(contributor.user_id for contributor in contributors)
+    user_ids.update(issue.author_id
+                    for issue in chain(issues, archived_issues))
+    user_ids.update(issue.assigned_to_id
+                    for issue in chain(issues, archived_issues))
+    user_ids.update(comment.author_id
+                    for comment in chain(comments, archived_comments))
+    user_ids.discard(None)
+
+    with transaction.atomic(using=target):
+        users = User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids)
+        for user in users:
+            mirror(user, [target])
+        mirror(project, [target])
+        for model, rows in ((Contributor, contributors), (Issue, issues),
+                            (Comment, comments),
+                            (ArchivedIssue, archived_issues),
+                            (ArchivedComment, archived_comments)):
+            model.objects.using(target).bulk_create(
+                rows, batch_size=batch_size
+            )
+
+    ProjectShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        project_id=project_id,
+        defaults={'alias': target}
+    )
+
+    with transaction.atomic(using=source):
+        if source == DEFAULT_DB_ALIAS:
+            # The project itself stays in the global database.
+            (Comment.objects.using(source)
+             .filter(issue__project_id=project_id).delete())
+            (ArchivedComment.objects.using(source)
+             .filter(issue__project_id=project_id).delete())
+            (ArchivedIssue.objects.using(source)
+             .filter(project_id=project_id).delete())
+            Issue.objects.using(source).filter(project_id=project_id).delete()
+            (Contributor.objects.using(source)
+             .filter(project_id=project_id).delete())
+        else:
+            Project.objects.using(source).filter(pk=project_id).delete()
+    return source
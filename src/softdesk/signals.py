@@ -1,17 +1,123 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_save, pre_delete, post_delete, pre_migrate, post_migrate
+)
 from django.dispatch import receiver
-from softdesk.models import Project, Contributor
+from softdesk import archive, pagination, sharding, slow_queries
+from softdesk.models import Project, ProjectShard, Contributor
 
 
 @receiver(post_save, sender=Project)
-def assign_contributor(instance, created, **kwargs):
+def assign_shard(instance, created, raw, using, **kwargs):
+    """
+    Signal to record the shard of a new Project in the shard map and to
+    keep the copy of the Project in its shard up to date. Connected
+    before assign_contributor, which needs the shard.
+    """
+    if raw or using != DEFAULT_DB_ALIAS or not settings.DATABASE_SHARDS:
+        return
+    if created:
+        ProjectShard.objects.create(
+            project=instance,
+            alias=sharding.choose_shard(instance.pk)
+        )
+    sharding.mirror(instance, [sharding.shard_for_project(instance.pk)])
+
+
+@receiver(post_save, sender=Project)
+def assign_contributor(instance, created, raw, using, **kwargs):
     """
     Signal to automatically create a Contributor link between a Project
     and its Author after a Project is saved in the Database.
     """
-    if created:
+    if created and not raw and using == DEFAULT_DB_ALIAS:
         contributor = Contributor(
             user=instance.author,
             project=instance
         )
         contributor.save()
+
+
+@receiver(pre_delete, sender=Project)
+def remember_shard(instance, using, **kwargs):
+    """
+    Signal to remember the shard of a Project before its entry of the
+    shard map is deleted along with it.
+    """
+    if using == DEFAULT_DB_ALIAS and settings.DATABASE_SHARDS:
+        instance._shard_alias = sharding.shard_for_project(instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+def delete_project_shard_data(instance, using, **kwargs):
+    """
+    Signal to delete the copy of a Project from its shard, which
+    deletes its contributors, issues and comments.
+    """
+    alias = getattr(instance, '_shard_alias', DEFAULT_DB_ALIAS)
+    if using == DEFAULT_DB_ALIAS and alias != DEFAULT_DB_ALIAS:
+        Project.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def mirror_user(instance, raw, using, **kwargs):
+    """
+    Signal to copy a User in every shard after it is saved.
+    """
+    if not raw and using == DEFAULT_DB_ALIAS:
+        sharding.mirror(instance, settings.DATABASE_SHARDS)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_shard_data(instance, using, **kwargs):
+    """
+    Signal to delete a User from every shard, which deletes the
+    resources they created there.
+    """
+    if using == DEFAULT_DB_ALIAS:
+        for alias in settings.DATABASE_SHARDS:
+            (type(instance).objects.using(alias)
+             .filter(pk=instance.pk).delete())
+
+
+@receiver([post_save, post_delete])
+def invalidate_counts(sender, **kwargs):
+    """
+    Signal to invalidate the cached counts of the paginated lists (see
+    softdesk.pagination.CachedCountPagination) reading the table of a
+    saved or deleted instance.
+    """
+    pagination.invalidate_counts(sender)
+
+
+@receiver(connection_created)
+def install_slow_query_log(connection, **kwargs):
+    """
+    Signal to log the slow queries of every new connection (see
+    softdesk.slow_queries).
+    """
+    if slow_queries.log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_queries.log_slow_query)
+
+
+@receiver(pre_migrate)
+def drop_archive_views(app_config, using, **kwargs):
+    """
+    Signal to drop the views of the archived issues before the
+    migrations, SQLite failing to rebuild the tables they read (see
+    softdesk.archive).
+    """
+    if app_config.name == 'softdesk':
+        archive.drop_views(using)
+
+
+@receiver(post_migrate)
+def create_archive_views(app_config, using, **kwargs):
+    """
+    Signal to create the views of the archived issues again after the
+    migrations.
+    """
+    if app_config.name == 'softdesk':
+        archive.create_views(using)
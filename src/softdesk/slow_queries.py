@@ -0,0 +1,159 @@
+"""
+Slow query log: every query lasting settings.SLOW_QUERY_THRESHOLD
+seconds or more is written as a JSON line to settings.SLOW_QUERY_LOG
+(rotated past settings.SLOW_QUERY_LOG_MAX_BYTES), with its parameters
+redacted, its plan and the line of the SoftDesk code running it. The
+log is aggregated by the slow_queries command.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from django.apps import apps
+from django.conf import settings
+
+logger = logging.getLogger('softdesk.slow_queries')
+logger.propagate = False
+_handler_lock = threading.Lock()
+
+# The apps whose code the queries are attributed to.
+ATTRIBUTED_APPS = ('softdesk', 'myauth')
+
+
+def _get_logger():
+    """
+    Give the logger of the slow queries, writing to SLOW_QUERY_LOG once
+    the settings are loaded.
+    """
+    if not logger.handlers:
+        with _handler_lock:
+            if not logger.handlers:
+                os.makedirs(os.path.dirname(settings.SLOW_QUERY_LOG),
+                            exist_ok=True)
+                handler = RotatingFileHandler(
+                    settings.SLOW_QUERY_LOG,
+                    maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                    encoding='utf-8',
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+    return logger
+
+
+def redact(value):
+    """
+    Hide the strings and bytes of the parameters (passwords, e-mails,
+    contents), keep the numbers, booleans and None.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (str, bytes, memoryview)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def get_origin():
+    """
+    Give the innermost frame of the code of ATTRIBUTED_APPS in the
+    current stack, e.g. IssuePostSerializer.__init__ in
+    softdesk/serializers.py, or None.
+    """
+    directories = tuple(
+        apps.get_app_config(label).path + os.sep for label in ATTRIBUTED_APPS
+    )
+    own_file = __file__
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(directories) and filename != own_file:
+            return {
+                'function': frame.f_code.co_qualname,
+                'file': os.path.relpath(filename, settings.BASE_DIR),
+                'line': frame.f_lineno,
+            }
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """
+    Give the plan of a SELECT, one line per step, or None. The EXPLAIN
+    goes through the cursor of the database driver, not through the
+    execute wrappers: it is neither logged nor counted in the queries
+    of the request.
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.cursor.fetchall()
+    except connection.Database.Error:
+        return None
+    # The detail of the step is the last column (SQLite), or the only one.
+    return [str(row[-1]) for row in rows]
+
+
+def get_shape(sql):
+    """
+    Give the shape of an SQL query, the queries differing only by their
+    numbers (LIMIT, OFFSET) or the length of their IN lists share it.
+    """
+    sql = re.sub(r'%s(?:, %s)+', '%s, ...', sql)
+    sql = re.sub(r'\b\d+\b', 'N', sql)
+    return ' '.join(sql.split())
+
+
+def read_log(path=None):
+    """
+    Yield the records of the slow query log, its rotated files first.
+    """
+    path = str(path or settings.SLOW_QUERY_LOG)
+    paths = [f'{path}.{index}'
+             for index in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)]
+    for name in [*paths, path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of the connections, installed by a signal of
+    softdesk.signals.
+    """
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+    if duration < settings.SLOW_QUERY_THRESHOLD:
+        return result
+
+    connection = context['connection']
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'database': connection.alias,
+        'duration_ms': round(duration * 1000, 3),
+        'sql': sql,
+        'params': None if many else redact(params),
+        'many': many,
+        'plan': None if many else explain(connection, sql, params),
+        'origin': get_origin(),
+    }
+    _get_logger().info(json.dumps(record, default=str))
+    return result
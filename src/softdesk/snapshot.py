@@ -0,0 +1,170 @@
+"""
+Snapshot of a project: the project, its contributors, its issues and
+their comments in one document.
+
+The document is built with four queries, one per table, whose rows are
+stitched together in memory by id, instead of going through the nested
+serializers (and their per-issue queries). The issues and the comments
+are read in one transaction, one read snapshot with SQLite, so that a
+comment written (or an issue deleted, or archived) between the two
+queries does not leave a comment without its issue. A streamed snapshot
+reads them by chunks of issues, each in a short transaction of its own:
+a slow client never holds a read transaction, and the writers, while
+its response is sent.
+"""
+import orjson
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.fields import DateTimeField
+
+from softdesk.models import Project, Contributor, Issue, Comment
+
+
+format_datetime = DateTimeField().to_representation
+
+PROJECT_FIELDS = ('id', 'title', 'description', 'type', 'time_created',
+                  'author_id', 'author__username')
+CONTRIBUTOR_FIELDS = ('id', 'time_created', 'user_id', 'user__username')
+ISSUE_FIELDS = ('id', 'title', 'description', 'priority', 'type', 'status',
+                'time_created', 'author_id', 'author__username',
+                'assigned_to_id', 'assigned_to__username')
+COMMENT_FIELDS = ('id', 'issue_id', 'content', 'time_created', 'author_id',
+                  'author__username')
+
+# Number of issues read, with their comments, per transaction by stream().
+STREAM_CHUNK_SIZE = 500
+
+# {field: {code: name}} of the integer-coded choices.
+PROJECT_CHOICES = {
+    'type': dict(zip(Project.ProjectType.values, Project.ProjectType.names)),
+}
+ISSUE_CHOICES = {
+    field: dict(zip(choices_class.values, choices_class.names))
+    for field, choices_class in (('priority', Issue.IssuePriority),
+                                 ('type', Issue.IssueType),
+                                 ('status', Issue.IssueStatus))
+}
+
+
+def _pop_user(row, field):
+    user_id = row.pop(f'{field}_id')
+    username = row.pop(f'{field}__username')
+    if user_id is None:
+        return None
+    return {'id': user_id, 'username': username}
+
+
+def _shape(row, *user_fields, choices=None):
+    """
+    Format a row of values() as in the API: datetimes in the current
+    time zone, users nested as in UserSummarySerializer, choices by
+    their names.
+    """
+    row['time_created'] = format_datetime(row['time_created'])
+    for field in user_fields:
+        row[field] = _pop_user(row, field)
+    for field, names in (choices or {}).items():
+        row[field] = names.get(row[field])
+    return row
+
+
+def get_querysets(project_id, since=None):
+    """
+    Give the querysets of the contributors, issues and comments of a
+    project. With since, only the contributors and the comments created
+    since then are kept, and the issues created or commented since then.
+    """
+    contributors = Contributor.objects.filter(project_id=project_id)
+    issues = Issue.objects.filter(project_id=project_id)
+    comments = Comment.objects.filter(issue__project_id=project_id)
+    if since is not None:
+        contributors = contributors.filter(time_created__gte=since)
+        issues = issues.filter(
+            Q(time_created__gte=since) | Q(comments__time_created__gte=since)
+        ).distinct()
+        comments = comments.filter(time_created__gte=since)
+
+    querysets = (
+        contributors.values(*CONTRIBUTOR_FIELDS).order_by('id'),
+        issues.values(*ISSUE_FIELDS).order_by('id'),
+        comments.values(*COMMENT_FIELDS).order_by('issue_id', 'id'),
+    )
+    # The database (shard, replica) is chosen now: a streamed snapshot
+    # reads its rows once the view returned.
+    return [queryset.using(queryset.db) for queryset in querysets]
+
+
+def get_head(project_id, contributors):
+    """
+    Give the project and its contributors, or None if the project does
+    not exist.
+    """
+    project = (Project.objects.filter(pk=project_id, deleted_at__isnull=True)
+               .values(*PROJECT_FIELDS).first())
+    if project is None:
+        return None
+    project = _shape(project, 'author', choices=PROJECT_CHOICES)
+    project['contributors'] = [
+        _shape(row, 'user') for row in contributors
+    ]
+    return project
+
+
+def _issue(row):
+    issue = _shape(row, 'author', 'assigned_to', choices=ISSUE_CHOICES)
+    issue['comments'] = []
+    return issue
+
+
+def build(head, issues, comments):
+    """
+    Build the whole snapshot.
+    """
+    issues_by_id = {}
+    with transaction.atomic(using=issues.db):
+        for row in issues:
+            issue = _issue(row)
+            issues_by_id[issue['id']] = issue
+        for row in comments:
+            issue = issues_by_id.get(row.pop('issue_id'))
+            if issue is not None:
+                issue['comments'].append(_shape(row, 'author'))
+    return {**head, 'issues': list(issues_by_id.values())}
+
+
+def read_chunk(issues, comments, after=None):
+    """
+    Read the next STREAM_CHUNK_SIZE issues (ordered by id) after the id
+    after, with their comments, in one transaction. Return them built.
+    """
+    if after is not None:
+        issues = issues.filter(id__gt=after)
+    with transaction.atomic(using=issues.db):
+        chunk = [_issue(row) for row in issues[:STREAM_CHUNK_SIZE]]
+        issues_by_id = {issue['id']: issue for issue in chunk}
+        if issues_by_id:
+            for row in comments.filter(issue_id__in=list(issues_by_id)):
+                issue = issues_by_id[row.pop('issue_id')]
+                issue['comments'].append(_shape(row, 'author'))
+    return chunk
+
+
+def stream(head, issues, comments):
+    """
+    Yield the snapshot in JSON, issue by issue. The issues are read by
+    chunks (see read_chunk()), the whole snapshot is never held in
+    memory, and no transaction stays open while the chunks are sent.
+    """
+    # The head without its closing brace.
+    yield orjson.dumps(head)[:-1] + b',"issues":['
+
+    chunk = read_chunk(issues, comments)
+    separator = b''
+    while chunk:
+        for issue in chunk:
+            yield separator + orjson.dumps(issue)
+            separator = b','
+        if len(chunk) < STREAM_CHUNK_SIZE:
+            break
+        chunk = read_chunk(issues, comments, after=chunk[-1]['id'])
+    yield b']}'
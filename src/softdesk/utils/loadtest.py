@@ -0,0 +1,213 @@
+"""
+Tools to run load tests against a local server: start and stop a
+server in a subprocess, authenticate through the API and replay
+requests from several threads while recording their latency.
+"""
+import http.client
+import json
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+
+def free_port():
+    """
+    Return a TCP port free on the loopback interface.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, cwd, env=None, timeout=30):
+    """
+    Start a server in a subprocess and wait until it accepts
+    connections on port. Its output goes to a temporary file rather
+    than a pipe: a pipe nobody reads while the load runs fills up with
+    the request logs and blocks the server.
+    """
+    output = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env,
+        stdout=subprocess.DEVNULL, stderr=output
+    )
+    process.output = output
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            message = server_output(process)
+            output.close()
+            raise RuntimeError(f"Server {command[0]} exited: {message}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f"Server did not start within {timeout}s.")
+
+
+def server_output(process, size=4096):
+    """
+    Return the end of what a server started by start_server() wrote.
+    """
+    output = process.output
+    output.seek(max(output.seek(0, 2) - size, 0))
+    return output.read().decode(errors='replace')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    process.output.close()
+
+
+def request(connection, method, path, token=None, body=None):
+    """
+    Send a request on a keep-alive connection, return the status and
+    the body of the response.
+    """
+    headers = {'Accept': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if body is not None:
+        body = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def obtain_token(port, username, password):
+    """
+    Authenticate a user through the token endpoint of the API.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        status, body = request(
+            connection, 'POST', '/api/v1/token/',
+            body={'username': username, 'password': password}
+        )
+    finally:
+        connection.close()
+    if status != 200:
+        raise RuntimeError(f"Authentication of {username} failed: {status}")
+    return json.loads(body)['access']
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1,
+                      round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+class LoadResult:
+    """
+    Latencies (in seconds) and errors recorded per endpoint during a
+    load test.
+    """
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def merge(self, latencies, errors):
+        with self._lock:
+            for endpoint, values in latencies.items():
+                self.latencies[endpoint].extend(values)
+            for endpoint, count in errors.items():
+                self.errors[endpoint] += count
+
+    def summary(self, endpoint=None):
+        """
+        Return the throughput and latency percentiles (in ms) of one
+        endpoint, or of all of them.
+        """
+        if endpoint is None:
+            values = [v for vs in self.latencies.values() for v in vs]
+            errors = sum(self.errors.values())
+        else:
+            values = self.latencies[endpoint]
+            errors = self.errors[endpoint]
+        return {
+            'requests': len(values),
+            'errors': errors,
+            'rps': len(values) / self.duration if self.duration else 0.0,
+            'p50': percentile(values, 50) * 1000,
+            'p95': percentile(values, 95) * 1000,
+            'p99': percentile(values, 99) * 1000,
+        }
+
+
+def run_load(port, workload, concurrency, duration):
+    """
+    Run workload(connection, record) in a loop from concurrency threads
+    for duration seconds. Each thread has its own keep-alive
+    connection, record(endpoint, latency, ok) stores a measure.
+    """
+    result = LoadResult()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        latencies, errors = defaultdict(list), defaultdict(int)
+
+        def record(endpoint, latency, ok):
+            latencies[endpoint].append(latency)
+            if not ok:
+                errors[endpoint] += 1
+
+        connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                timeout=30)
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    workload(connection, record)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = http.client.HTTPConnection(
+                        '127.0.0.1', port, timeout=30
+                    )
+                    record('connection errors', 0.0, False)
+        finally:
+            connection.close()
+            result.merge(latencies, errors)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.duration = time.monotonic() - start
+    return result
+
+
+def timed_request(connection, record, endpoint, method, path, token=None,
+                  body=None):
+    """
+    Send a request and record its latency under endpoint. Return the
+    status and the body of the response.
+    """
+    start = time.perf_counter()
+    status, content = request(connection, method, path, token, body)
+    record(endpoint, time.perf_counter() - start, status < 400)
+    return status, content
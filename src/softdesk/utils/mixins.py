@@ -0,0 +1,248 @@
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from OC_projet_10 import db_routers, metrics, middleware
+from softdesk import sharding
+from softdesk.utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class ServerTimingMixin:
+    """
+    Mixin for the API viewsets, measuring the authentication, the
+    permission checks, the queryset (filtering, pagination, object
+    lookup) and the rest of the view, mostly the serialization, for the
+    Server-Timing header (see
+    OC_projet_10.middleware.ServerTimingMiddleware).
+    """
+    def perform_authentication(self, request):
+        with middleware.measure('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with middleware.measure('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with middleware.measure('perm'):
+            super().check_object_permissions(request, obj)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        middleware.begin_phase('view')
+
+    def filter_queryset(self, queryset):
+        with middleware.measure('queryset'):
+            return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        with middleware.measure('queryset'):
+            return super().paginate_queryset(queryset)
+
+    def get_object(self):
+        with middleware.measure('queryset'):
+            return super().get_object()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        middleware.end_view()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaRoutingMixin:
+    """
+    Mixin for the API viewsets. The reads of the actions listed in
+    replica_actions are sent to the read replicas, unless the user
+    wrote something in the last seconds, in which case every request of
+    the user is served by the primary.
+    """
+    replica_actions = ('list', 'retrieve')
+    _replica_token = None
+
+    def perform_authentication(self, request):
+        """
+        Choose the database once the user is known, before the
+        permissions are checked so that their lookups are routed too.
+        """
+        super().perform_authentication(request)
+        use_replica = (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and not db_routers.is_pinned_to_primary(request.user)
+        )
+        self._replica_token = db_routers.set_replica_reads(use_replica)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Pin the user to the primary after a successful write.
+        """
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            db_routers.pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.reset_replica_reads()
+
+    def reset_replica_reads(self):
+        """
+        Restore the default routing of the reads.
+        """
+        if self._replica_token is not None:
+            db_routers.reset_replica_reads(self._replica_token)
+            self._replica_token = None
+
+
+class ShardRoutingMixin:
+    """
+    Mixin for the viewsets of the project resources. The queries of
+    the request are sent to the shard of the project found in the
+    shard_project_kwarg URL kwarg.
+    """
+    shard_project_kwarg = 'project_pk'
+    _shard_token = None
+
+    def initial(self, request, *args, **kwargs):
+        project_pk = self.kwargs.get(self.shard_project_kwarg)
+        if project_pk is not None:
+            self._shard_token = sharding.set_current_project(project_pk)
+        super().initial(request, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.reset_shard()
+
+    def reset_shard(self):
+        """
+        Stop routing the queries to the shard of the project.
+        """
+        if self._shard_token is not None:
+            sharding.reset_current_project(self._shard_token)
+            self._shard_token = None
+
+
+class SingleFlightMixin:
+    """
+    Mixin for the viewsets of the project resources. Concurrent GET
+    requests of the actions listed in single_flight_actions that would
+    get the same response are coalesced inside a worker: one of them
+    runs the queries and renders the response, the others get the same
+    bytes.
+    """
+    single_flight_actions = ('list', 'retrieve')
+    # Query parameters filtering the results according to the user.
+    user_dependent_params = ('my_projects',)
+    single_flight = SingleFlight()
+    async_single_flight = AsyncSingleFlight()
+
+    @classmethod
+    def checks_objects(cls, permission):
+        """
+        Check if a permission, or an operand of a composed permission
+        (A | B, A & B), checks the objects with has_object_permission.
+        """
+        operands = [getattr(permission, name) for name in ('op1', 'op2')
+                    if hasattr(permission, name)]
+        if len(operands) == 2:
+            return any(cls.checks_objects(operand) for operand in operands)
+        return (type(permission).has_object_permission
+                is not BasePermission.has_object_permission)
+
+    def get_single_flight_key(self, request):
+        """
+        Every request reaching the action passed has_permission, but the
+        object permissions are only checked by get_object(), inside the
+        handler run by the leader alone: the actions whose permissions
+        check the objects are never coalesced. The response of the
+        others only depends on the URL, on the media type, on the
+        database read (replica or primary) and, for some filters, on the
+        user. Return None for the requests that are not coalesced.
+        """
+        if (request.method != 'GET'
+                or self.action not in self.single_flight_actions
+                or request.accepted_renderer.format == 'api'
+                or any(self.checks_objects(permission)
+                       for permission in self.get_permissions())):
+            return None
+        key = (
+            type(self).__name__,
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+            db_routers.replica_reads_enabled(),
+        )
+        if any(param in request.query_params
+               for param in self.user_dependent_params):
+            key += (request.user.pk,)
+        return key
+
+    def render_shared_response(self, response):
+        """
+        Render the response of the leader, its bytes are handed to the
+        waiters.
+        """
+        response.accepted_renderer = self.request.accepted_renderer
+        response.accepted_media_type = self.request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        return response.render()
+
+    @staticmethod
+    def is_shareable(response):
+        return response.status_code == 200
+
+    @staticmethod
+    def copy_shared_response(response):
+        return HttpResponse(
+            response.content,
+            status=response.status_code,
+            content_type=response['Content-Type'],
+        )
+
+    def coalesce(self, handler, request, *args, **kwargs):
+        key = self.get_single_flight_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        response, shared = self.single_flight.do(
+            key,
+            lambda: self.render_shared_response(
+                handler(request, *args, **kwargs)
+            ),
+            timeout=settings.SINGLE_FLIGHT_TIMEOUT,
+            shareable=self.is_shareable,
+        )
+        metrics.record_cache_lookup('single_flight', shared)
+        return self.copy_shared_response(response) if shared else response
+
+    async def acoalesce(self, handler, request, *args, **kwargs):
+        key = self.get_single_flight_key(request)
+        if key is None:
+            return await handler(request, *args, **kwargs)
+
+        async def compute():
+            return self.render_shared_response(
+                await handler(request, *args, **kwargs)
+            )
+
+        response, shared = await self.async_single_flight.do(
+            key, compute,
+            timeout=settings.SINGLE_FLIGHT_TIMEOUT,
+            shareable=self.is_shareable,
+        )
+        metrics.record_cache_lookup('single_flight', shared)
+        return self.copy_shared_response(response) if shared else response
+
+    def list(self, request, *args, **kwargs):
+        return self.coalesce(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.coalesce(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acoalesce(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acoalesce(
+            super().aretrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,86 @@
+"""
+Single-flight: concurrent calls sharing the same key are coalesced into
+one computation, whose result is handed to every caller waiting for it.
+Calls are only coalesced inside a worker process.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self, event):
+        self.event = event
+        self.value = None
+        self.shared = False
+
+
+class SingleFlight:
+    """
+    Single-flight of the threads of a process. The result of the leader
+    is only handed to the waiters when shareable(result) is true. When
+    the leader fails, returns an unshareable result or takes more than
+    timeout seconds, the waiters run the computation themselves.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None, shareable=None):
+        """
+        Return (result, shared), shared being true for the callers who
+        got the result of another one.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(threading.Event())
+
+        if not leader:
+            if call.event.wait(timeout) and call.shared:
+                return call.value, True
+            return fn(), False
+
+        try:
+            call.value = fn()
+            call.shared = shareable is None or shareable(call.value)
+            return call.value, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """
+    Single-flight of the tasks of an event loop, see SingleFlight. The
+    calls of different event loops are never coalesced.
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, timeout=None, shareable=None):
+        """
+        Return (result, shared), fn being a coroutine function.
+        """
+        key = (asyncio.get_running_loop(), key)
+        call = self._calls.get(key)
+        if call is not None:
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(call.event.wait()), timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+            if call.event.is_set() and call.shared:
+                return call.value, True
+            return await fn(), False
+
+        call = self._calls[key] = _Call(asyncio.Event())
+        try:
+            call.value = await fn()
+            call.shared = shareable is None or shareable(call.value)
+            return call.value, False
+        finally:
+            del self._calls[key]
+            call.event.set()
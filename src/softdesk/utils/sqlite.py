@@ -0,0 +1,74 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _backup(src, dst, pages, sleep, progress):
+    """
+    Copy a database with the backup API, pages pages per step. A write
+    to the source by another connection restarts the copy from the
+    start: the number of pages per step is then multiplied by 4, so that
+    the copy ends even under a steady flow of writes, down to a single
+    step holding the source for the whole copy.
+    """
+    while True:
+        remaining = None
+
+        def watch(status, left, total):
+            nonlocal remaining
+            if remaining is not None and left >= remaining and pages > 0:
+                raise _Restarted
+            remaining = left
+            if progress is not None:
+                progress(status, left, total)
+
+        try:
+            src.backup(dst, pages=pages, sleep=sleep, progress=watch)
+            return
+        except _Restarted:
+            pages *= 4
+
+
+def copy_database(source, target, pages=-1, sleep=0.25, progress=None):
+    """
+    Copy a live SQLite database into another file with the online
+    backup API of SQLite. The copy is written next to the target then
+    moved in place, so that the readers of the target never see a
+    partially copied database.
+    With pages > 0, the pages are copied pages at a time, the source
+    being unlocked for sleep seconds between the steps so that its
+    writers are not held up.
+    """
+    target = Path(target)
+    tmp_target = target.with_name(f'.{target.name}.tmp')
+    tmp_target.unlink(missing_ok=True)
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(tmp_target)
+    try:
+        _backup(src, dst, pages, sleep, progress)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_target, target)
+
+
+def restore_database(source, target, pages=-1, sleep=0.25, progress=None):
+    """
+    Copy a SQLite database file over another database in place, with the
+    online backup API: unlike a copy of the file, the journal of the
+    target and its open connections stay consistent, they read the
+    restored database from their next transaction.
+    """
+    src = sqlite3.connect(f'{Path(source).resolve().as_uri()}?mode=ro',
+                          uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        _backup(src, dst, pages, sleep, progress)
+    finally:
+        dst.close()
+        src.close()
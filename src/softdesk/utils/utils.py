@@ -1,3 +1,11 @@
+import os
+import threading
+import time
+import uuid
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
 
 def flatten_tuple_of_keys(data):
     """
@@ -12,3 +20,39 @@ def flatten_tuple_of_keys(data):
         else:
             flatten_dict[key] = value
     return flatten_dict
+
+
+def make_uuid7(ms, rand_a, rand_b):
+    """
+    Build a UUID version 7 (RFC 9562): a 48 bits unix timestamp in
+    milliseconds, then 12 bits (rand_a) and 62 bits (rand_b) filling
+    the rest around the version and variant bits.
+    """
+    return uuid.UUID(int=(
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (rand_a & 0xFFF) << 64
+        | 0b10 << 62
+        | rand_b & 0x3FFF_FFFF_FFFF_FFFF
+    ))
+
+
+def uuid7():
+    """
+    Give a new UUID version 7. The ids follow the time they are made
+    at, and rand_a counts those made in the same millisecond: the ids of
+    a process are strictly increasing, even when the clock goes back.
+    """
+    global _uuid7_last
+    ms = time.time_ns() // 1_000_000
+    with _uuid7_lock:
+        last_ms, counter = _uuid7_last
+        if ms > last_ms:
+            # A random start, half the counter left for the millisecond.
+            counter = int.from_bytes(os.urandom(2)) & 0x7FF
+        else:
+            ms, counter = last_ms, counter + 1
+            if counter > 0xFFF:
+                ms, counter = ms + 1, 0
+        _uuid7_last = (ms, counter)
+    return make_uuid7(ms, counter, int.from_bytes(os.urandom(8)))
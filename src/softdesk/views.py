@@ -1,18 +1,27 @@
+from django.conf import settings
 from django.db import IntegrityError
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from django_filters import rest_framework as filters
 
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 
-from softdesk.models import Project, Contributor, Issue, Comment
+from softdesk.models import (
+    Project, Contributor, Issue, Comment, IssueRecord
+)
 from softdesk.serializers import (
     ProjectListSerializer, ProjectDetailSerializer, ProjectPostSerializer,
     ContributorListSerializer, ContributorDetailSerializer,
     ContributorPostSerializer,
     IssueListSerializer, IssueDetailSerializer, IssuePostSerializer,
+    AssignedIssueSerializer,
     CommentListSerializer, CommentDetailSerializer, CommentPostSerializer,
 )
 from softdesk.permissions import (
@@ -20,21 +29,34 @@ from softdesk.permissions import (
 )
 from myauth.permissions import IsAdminAuthenticated
 from softdesk.filters import (
-    ProjectFilterSet, IssueFilterSet, ContributorFilterSet, CommentFilterSet
+    ProjectFilterSet, IssueFilterSet, IssueRecordFilterSet,
+    AssignedIssueFilterSet, ContributorFilterSet, CommentFilterSet
 )
 
+from softdesk import purge, snapshot
+from softdesk.async_views import AsyncReadMixin
+from softdesk.pagination import (
+    AssignedIssuePagination, CachedCountPagination
+)
 from softdesk.utils import utils
+from softdesk.utils.mixins import (
+    ReplicaRoutingMixin, ServerTimingMixin, ShardRoutingMixin,
+    SingleFlightMixin
+)
 
 
-class UtilityViewSet(ModelViewSet):
+class UtilityViewSet(ServerTimingMixin, SingleFlightMixin, AsyncReadMixin,
+                     ShardRoutingMixin, ReplicaRoutingMixin, ModelViewSet):
     """
     This class is inherited by the classes that represent our API
     resources endpoints. The serializer_map, permission_map and
     eventually default_permissions must be implemented in children
-    classes.
+    classes. The query_budget_map gives the maximum number of queries
+    of the actions (see OC_projet_10.middleware.QueryBudgetMiddleware).
     """
     serializer_map = {}
     permission_map = {}
+    query_budget_map = {}
     default_permissions = []
     _project_cache = None
     _project_contributors_id_cache = None
@@ -46,8 +68,9 @@ class UtilityViewSet(ModelViewSet):
     def __init_subclass__(cls, **kwargs):
         """
         This method is overwritten after initialization in children
-        classes to transform tuple keys in serializer_map and
-        permission_map into proper keys with similar values.
+        classes to transform tuple keys in serializer_map,
+        permission_map and query_budget_map into proper keys with
+        similar values.
         It also creates a map for view_name based on cls.__name__,
         it is used to dynamically modify name displayed by DRF web
         interface.
@@ -55,6 +78,9 @@ class UtilityViewSet(ModelViewSet):
         super().__init_subclass__(**kwargs)
         cls.serializer_map = utils.flatten_tuple_of_keys(cls.serializer_map)
         cls.permission_map = utils.flatten_tuple_of_keys(cls.permission_map)
+        cls.query_budget_map = utils.flatten_tuple_of_keys(
+            cls.query_budget_map
+        )
 
         if 'ViewSet' in cls.__name__:
             cls.stripped_class_name = cls.__name__.replace('ViewSet', '')
@@ -107,7 +133,9 @@ class UtilityViewSet(ModelViewSet):
         """
         if self._project_cache is None:
             pk = self.kwargs.get('project_pk') or self.kwargs.get('pk')
-            self._project_cache = get_object_or_404(Project, pk=pk)
+            self._project_cache = get_object_or_404(
+                Project, pk=pk, deleted_at__isnull=True
+            )
         return self._project_cache
 
     @property
@@ -125,6 +153,33 @@ class UtilityViewSet(ModelViewSet):
             }
         return self._project_contributors_id_cache
 
+    async def aget_current_project(self):
+        """
+        Async version of current_project, used by the async read views.
+        """
+        if self._project_cache is None:
+            pk = self.kwargs.get('project_pk') or self.kwargs.get('pk')
+            try:
+                self._project_cache = await Project.objects.aget(
+                    pk=pk, deleted_at__isnull=True
+                )
+            except Project.DoesNotExist:
+                raise Http404
+        return self._project_cache
+
+    async def aget_current_project_contributors_id(self):
+        """
+        Async version of current_project_contributors_id, used by the
+        async read views.
+        """
+        if self._project_contributors_id_cache is None:
+            project = await self.aget_current_project()
+            self._project_contributors_id_cache = {
+                user_id async for user_id in
+                project.contributors.values_list('user_id', flat=True)
+            }
+        return self._project_contributors_id_cache
+
     def get_view_name(self):
         """
         Modify displayed name of view on DRF web interface.
@@ -159,6 +214,10 @@ class ProjectViewSet(UtilityViewSet):
     PATCH or PUT /api/v1/projects/{{pk}}/
     - To delete a project (author only):
     DELETE /api/v1/projects/{{pk}}/
+    - To get the project with its contributors, issues and comments
+    (contributors only, ?since=<datetime> for what changed since,
+    ?stream=true to stream the document):
+    GET /api/v1/projects/{{pk}}/snapshot/
 
     If you want to see the list of all the users, please refer to the
     [users endpoint](/api/v1/users/).
@@ -169,8 +228,16 @@ class ProjectViewSet(UtilityViewSet):
         'retrieve': ProjectDetailSerializer,
         ('create', 'update', 'partial_update'): ProjectPostSerializer,
     }
+    query_budget_map = {
+        'list': 4,
+        'retrieve': 8,
+        'snapshot': 9,
+        'create': 10,
+        ('update', 'partial_update'): 7,
+        'destroy': 20,
+    }
     permission_map = {
-        'retrieve': [
+        ('retrieve', 'snapshot'): [
             IsProjectContributor
             | IsAdminAuthenticated
         ],
@@ -180,12 +247,62 @@ class ProjectViewSet(UtilityViewSet):
         ]
     }
     filterset_class = ProjectFilterSet
+    pagination_class = CachedCountPagination
+    shard_project_kwarg = 'pk'
+    replica_actions = ('list', 'retrieve', 'snapshot')
 
     def get_queryset(self):
-        return (Project.objects.all()
-                .select_related("author")
-                .prefetch_related("contributors__user")
-                ).order_by('time_created')
+        """
+        The contributors are only displayed by the detailed view, they
+        are not prefetched for the list (they may live in several
+        shards). The deleted projects waiting for their purge are
+        hidden.
+        """
+        queryset = (Project.objects.filter(deleted_at__isnull=True)
+                    .select_related("author")
+                    ).order_by('time_created')
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related("contributors__user")
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def snapshot(self, request, pk=None):
+        """
+        Return the project, its contributors, its issues and their
+        comments in one document, built with four queries (see
+        softdesk/snapshot.py).
+        """
+        since = self.get_since()
+        contributors, issues, comments = snapshot.get_querysets(pk, since)
+        head = snapshot.get_head(pk, contributors)
+        if head is None:
+            raise Http404
+
+        if request.query_params.get('stream') in ('true', '1'):
+            return StreamingHttpResponse(
+                snapshot.stream(head, issues, comments),
+                content_type='application/json'
+            )
+        return Response(snapshot.build(head, issues, comments))
+
+    def get_since(self):
+        """
+        Parse the since query parameter of the snapshot.
+        """
+        since = self.request.query_params.get('since')
+        if since is None:
+            return None
+        try:
+            parsed = parse_datetime(since)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError(
+                {'since': "Date invalide, format attendu : ISO 8601."}
+            )
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
 
     def perform_create(self, serializer):
         """
@@ -202,6 +319,17 @@ class ProjectViewSet(UtilityViewSet):
                 {'error': "Vous avez déjà créé un projet avec ce nom."}
             )
 
+    def perform_destroy(self, instance):
+        """
+        With settings.SOFT_DELETE, hide the project and queue the
+        deletion of its contributors, issues and comments, run by the
+        softdesk_worker command (see softdesk/purge.py).
+        """
+        if settings.SOFT_DELETE:
+            purge.soft_delete_project(instance)
+        else:
+            super().perform_destroy(instance)
+
 
 class ContributorViewSet(UtilityViewSet):
     """
@@ -233,6 +361,12 @@ class ContributorViewSet(UtilityViewSet):
         'retrieve': ContributorDetailSerializer,
         'create': ContributorPostSerializer,
     }
+    query_budget_map = {
+        'list': 7,
+        'retrieve': 6,
+        'create': 9,
+        'destroy': 10,
+    }
     permission_map = {
         'create': [
             IsProjectAuthor
@@ -312,6 +446,13 @@ class IssueViewSet(UtilityViewSet):
         'retrieve': IssueDetailSerializer,
         ('create', 'update', 'partial_update'): IssuePostSerializer,
     }
+    query_budget_map = {
+        'list': 9,
+        'retrieve': 8,
+        'create': 10,
+        ('update', 'partial_update'): 9,
+        'destroy': 11,
+    }
     permission_map = {
         ('update', 'partial_update'): [
             IsResourceAuthor
@@ -324,12 +465,27 @@ class IssueViewSet(UtilityViewSet):
         ]
     }
     default_permissions = [IsProjectContributor | IsAdminAuthenticated]
-    filterset_class = IssueFilterSet
+
+    def reads_archived(self):
+        """
+        Check if the list or the detail is read with include_archived=true,
+        through IssueRecord, the archived issues included.
+        """
+        return (self.action in ('list', 'retrieve')
+                and IssueFilterSet.includes_archived(self.request))
+
+    @property
+    def filterset_class(self):
+        if self.reads_archived():
+            return IssueRecordFilterSet
+        return IssueFilterSet
 
     def get_queryset(self):
-        return (Issue.objects
+        model = IssueRecord if self.reads_archived() else Issue
+        return (model.objects
                 .filter(project_id=self.kwargs['project_pk'])
                 .select_related("author")
+                .select_related('assigned_to')
                 .select_related('project')
                 .prefetch_related("comments__author")).order_by('time_created')
 
@@ -389,6 +545,13 @@ class CommentViewSet(UtilityViewSet):
         'retrieve': CommentDetailSerializer,
         ('create', 'update', 'partial_update'): CommentPostSerializer,
     }
+    query_budget_map = {
+        'list': 7,
+        'retrieve': 6,
+        'create': 8,
+        ('update', 'partial_update'): 6,
+        'destroy': 7,
+    }
     permission_map = {
         ('update', 'partial_update'): [
             IsResourceAuthor
@@ -409,7 +572,7 @@ class CommentViewSet(UtilityViewSet):
                 .select_related('author')
                 .select_related('issue')
                 .select_related('issue__project')
-                ).order_by('time_created')
+                ).order_by('pk')
 
     def perform_create(self, serializer):
         """
@@ -419,3 +582,33 @@ class CommentViewSet(UtilityViewSet):
         issue = Issue.objects.get(pk=self.kwargs['issue_pk'])
         author = self.request.user
         serializer.save(issue=issue, author=author)
+
+
+class AssignedIssueViewSet(UtilityViewSet):
+    """
+    The Issue resource, from the point of view of the user: the issues
+    assigned to them across all their projects, the newest first, in
+    one query read along the (assigned_to, ..., time_created) indexes.
+
+    An example of usage:
+
+    - To retrieve the issues assigned to the user, of a status and a
+    priority or not:
+    GET /api/v1/me/issues/?status=IN_PROGRESS&priority=HIGH
+    - The next pages are given by the cursors of the next and previous
+    links.
+    """
+    serializer_class = AssignedIssueSerializer
+    pagination_class = AssignedIssuePagination
+    filterset_class = AssignedIssueFilterSet
+    query_budget_map = {
+        'list': 3,
+    }
+    # The list depends on the user, it is never shared.
+    single_flight_actions = ()
+
+    def get_queryset(self):
+        return (Issue.objects
+                .filter(assigned_to=self.request.user,
+                        project__deleted_at__isnull=True)
+                .select_related('author'))